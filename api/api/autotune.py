@@ -0,0 +1,237 @@
+"""
+Host autotuner: uvicorn workers and XGBoost threads.
+
+    python -m api.autotune [--duration 5] [--output tuning.json]
+
+For every candidate setting, starts the API with `python -m api.serve` on a
+local port and replays STANDARD_REQUESTS at increasing concurrency. It
+records the throughput and latency curve, then writes the candidate with
+the best peak throughput to the tuning config. If another candidate is
+within TIE_MARGIN of that throughput, the one with the lower latency at
+concurrency 1 wins. `python -m api.serve` reads the config at startup.
+
+The runs disable the simulation cache and the job workers, so the numbers
+measure the prediction capacity of the host. Run it on the target host,
+with nothing else loading the machine.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from api.tuning import TUNING_CONFIG_PATH
+
+# Standard workload: the cases of utils.cbpwin_compare.STANDARD_CORPUS as /predict requests
+STANDARD_REQUESTS = [
+    {"hardness_value": 650, "target_depth": 0.57, "recipe_temperature": 920, "recipe_carbon_max": 1.32,
+     "recipe_carbon_flow": 11.86, "carbon_percentage": 0.2},
+    {"hardness_value": 550, "target_depth": 0.7, "recipe_temperature": 960, "recipe_carbon_max": 1.8,
+     "recipe_carbon_flow": 15.4, "carbon_percentage": 0.18},
+    {"hardness_value": 550, "target_depth": 0.95, "recipe_temperature": 900, "recipe_carbon_max": 1.34,
+     "recipe_carbon_flow": 10.0, "carbon_percentage": 0.2},
+    {"hardness_value": 550, "target_depth": 1.12, "recipe_temperature": 960, "recipe_carbon_max": 1.8,
+     "recipe_carbon_flow": 15.36, "carbon_percentage": 0.2},
+    {"hardness_value": 600, "target_depth": 1.6, "recipe_temperature": 940, "recipe_carbon_max": 1.5,
+     "recipe_carbon_flow": 13.0, "carbon_percentage": 0.16},
+]
+for _request in STANDARD_REQUESTS:
+    _request.update({"load_weight": 100, "weight": 1, "is_weight_unknown": 0})
+
+# Candidates within this fraction of the best peak throughput are ties
+TIE_MARGIN = 0.05
+
+
+def candidate_settings(cpu_count, workers=None, nthreads=None):
+    """
+    Search space: worker counts in powers of two up to the core count; for
+    each, 1 XGBoost thread or the worker's share of the cores. The pipelined
+    final phases are not a candidate: they are slower than the sequential
+    simulation on the hosts measured (benchmarks/pipeline.py).
+    """
+    if workers is None:
+        workers = sorted({w for w in (1, 2, 4, 8, 16, 32, 64) if w <= cpu_count} | {cpu_count})
+    candidates = []
+    for w in workers:
+        share = max(1, cpu_count // w)
+        for nthread in (nthreads if nthreads is not None else sorted({1, share})):
+            candidates.append({
+                "WEB_CONCURRENCY": w,
+                "XGBOOST_NTHREAD": nthread,
+            })
+    return candidates
+
+
+def concurrency_levels(max_concurrency):
+    levels = [1]
+    while levels[-1] * 2 <= max_concurrency:
+        levels.append(levels[-1] * 2)
+    return levels
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(settings, port, timeout=120.0):
+    env = dict(os.environ, **{name: str(value) for name, value in settings.items()})
+    env.update({"JOB_WORKERS": "0", "SIMULATION_CACHE_SIZE": "0", "SIMULATION_LOG": "0",
+                "TUNING_CONFIG_PATH": "", "JOB_DB_PATH": os.path.join(tempfile.mkdtemp(), "jobs.db")})
+    process = subprocess.Popen(
+        [sys.executable, "-m", "api.serve", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return process, env["JOB_DB_PATH"]
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API did not start")
+
+
+def _stop_server(process, db_path):
+    process.terminate()
+    process.wait()
+    shutil.rmtree(os.path.dirname(db_path), ignore_errors=True)
+
+
+def _client_loop(port, offset, deadline, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    i = offset
+    while time.perf_counter() < deadline:
+        body = json.dumps(STANDARD_REQUESTS[i % len(STANDARD_REQUESTS)])
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/predict", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except OSError:
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(1)
+
+
+def measure(port, concurrency, duration):
+    """One point of the curve: `concurrency` keep-alive clients for `duration` seconds"""
+    latencies, errors = [], []
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=_client_loop, args=(port, i, start + duration, latencies, errors))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[int(q * (len(latencies) - 1))] * 1e3 if latencies else None
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": len(latencies) / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1e3 if latencies else None,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+    }
+
+
+def tune_candidate(settings, levels, duration):
+    port = _free_port()
+    process, db_path = _start_server(settings, port)
+    try:
+        # Warm-up: every worker loads the model and imports the engines
+        measure(port, settings["WEB_CONCURRENCY"], min(duration, 2.0))
+        curve = [measure(port, concurrency, duration) for concurrency in levels]
+    finally:
+        _stop_server(process, db_path)
+    return {
+        "settings": settings,
+        "curve": curve,
+        "peak_throughput_rps": max(point["throughput_rps"] for point in curve),
+    }
+
+
+def choose(measurements):
+    best = max(m["peak_throughput_rps"] for m in measurements)
+    near = [m for m in measurements if m["peak_throughput_rps"] >= (1 - TIE_MARGIN) * best]
+    return min(near, key=lambda m: m["curve"][0]["p50_ms"] or float("inf"))
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=TUNING_CONFIG_PATH)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per point of the curve")
+    parser.add_argument("--max-concurrency", type=int, help="default: twice the core count, at least 4")
+    parser.add_argument("--workers", type=_int_list, help="comma-separated worker counts to try")
+    parser.add_argument("--nthreads", type=_int_list, help="comma-separated XGBoost thread counts")
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    levels = concurrency_levels(args.max_concurrency or max(4, 2 * cpu_count))
+    candidates = candidate_settings(cpu_count, args.workers, args.nthreads)
+    print(f"{len(candidates)} candidates on {cpu_count} cores, concurrency {levels}, "
+          f"{args.duration:g}s per point")
+
+    measurements = []
+    for settings in candidates:
+        result = tune_candidate(settings, levels, args.duration)
+        measurements.append(result)
+        curve = "  ".join(f"c{p['concurrency']}: {p['throughput_rps']:.1f} rps p95 {p['p95_ms'] or 0:.0f} ms"
+                          for p in result["curve"])
+        print(f"{json.dumps(settings)}\n    {curve}")
+
+    chosen = choose(measurements)
+    config = {
+        "settings": chosen["settings"],
+        "host": {
+            "hostname": platform.node(),
+            "cpu_count": cpu_count,
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "tuned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "workload": {"requests": STANDARD_REQUESTS, "duration_s": args.duration, "concurrency": levels},
+        "measurements": measurements,
+    }
+    with open(args.output, "w") as f:
+        json.dump(config, f, indent=2)
+    print(f"Recommended: {json.dumps(chosen['settings'])} "
+          f"({chosen['peak_throughput_rps']:.1f} rps peak), written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
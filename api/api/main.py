@@ -1,9 +1,32 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from api.routers.predict import router as predict_router
+from api.routers.predict import router as predict_router, predictor
+from api.routers.jobs import router as jobs_router, get_job_queue
+from api.routers.health import router as health_router
+from api.services.binary_transport import BinaryPredictServer, PREDICT_SOCKET_PATH
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue = get_job_queue()
+    job_queue.start_workers()
+    # Binary protocol on a Unix socket, next to the JSON routes (opt-in)
+    binary_server = BinaryPredictServer(predictor) if PREDICT_SOCKET_PATH else None
+    if binary_server is not None:
+        await binary_server.start()
+    yield
+    if binary_server is not None:
+        await binary_server.stop()
+    job_queue.stop_workers()
+
 
 app = FastAPI(
     title="ECM Recipe Prediction API",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 app.include_router(predict_router)
+app.include_router(jobs_router)
+app.include_router(health_router)
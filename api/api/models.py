@@ -1,4 +1,36 @@
-from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, PositiveFloat
+
+
+class ProfileOptions(BaseModel):
+    dtype: Literal["float32", "float64"] = "float32"
+    trim: bool = True
+    stride: int = Field(1, ge=1)
+    cycles: Literal["last", "all"] = "last"
+
+
+class ProfilePayload(BaseModel):
+    step: int
+    dtype: str
+    count: int
+    stride: int
+    layer_thickness_mm: float
+    data: str
+
+
+class RefineOptions(BaseModel):
+    tolerance_mm: float = Field(0.01, gt=0)
+    max_iterations: int = Field(8, ge=1, le=50)
+
+
+class Refinement(BaseModel):
+    refined_recipe: list
+    raw_depth: float
+    refined_depth: float
+    iterations: int
+    converged: bool
+
 
 class PredictRequest(BaseModel):
     hardness_value: float
@@ -10,8 +42,56 @@ class PredictRequest(BaseModel):
     recipe_carbon_max: float
     recipe_carbon_flow: float
     carbon_percentage: float
+    profiles: Optional[ProfileOptions] = None
+    refine: Optional[RefineOptions] = None
 
 
 class PredictResponse(BaseModel):
     predicted_features: dict
     reconstructed_recipe: list
+    profiles: Optional[List[ProfilePayload]] = None
+    refinement: Optional[Refinement] = None
+
+
+class PredictBatchRequest(BaseModel):
+    items: List[PredictRequest] = Field(..., min_length=1)
+
+
+SensitivityInput = Literal["recipe_temperature", "recipe_carbon_max", "recipe_carbon_flow",
+                           "carbon_percentage", "target_depth"]
+
+
+class SensitivityRequest(BaseModel):
+    base: PredictRequest
+    inputs: List[SensitivityInput] = ["recipe_temperature", "recipe_carbon_max", "recipe_carbon_flow",
+                                      "carbon_percentage", "target_depth"]
+    relative_step: float = Field(0.02, gt=0, lt=1)
+    steps: Dict[SensitivityInput, PositiveFloat] = {}
+    method: Literal["central", "forward"] = "central"
+
+
+class SensitivityResponse(BaseModel):
+    predicted_features: dict
+    reconstructed_recipe: list
+    steps: Dict[str, float]
+    sensitivities: Dict[str, Dict[str, float]]
+
+
+class JobSubmitRequest(BaseModel):
+    kind: Literal["predict", "simulate", "predict_batch", "sweep"] = "predict"
+    priority: Literal["interactive", "bulk"] = "bulk"
+    params: dict
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    priority: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    queue_position: Optional[int] = None
+    result: Optional[Any] = None
+    result_url: Optional[str] = None
+    error: Optional[str] = None
@@ -0,0 +1,200 @@
+"""
+Cache-affinity front proxy for several API replicas.
+
+Each replica keeps its own simulation cache (utils/simulation_cache.py).
+With random or round-robin balancing, the requests of one trajectory
+(temperature, carbon flow, carbon max / min, initial carbon) are spread
+over every replica, and each cache only sees part of the working set.
+This proxy consistent-hashes the canonical trajectory key onto a ring of
+replicas, so a trajectory always lands on the same one; adding or losing
+a replica only moves the keys of that replica.
+
+    API_REPLICAS=http://127.0.0.1:8001,http://127.0.0.1:8002 \\
+        uvicorn api.proxy:app --port 8000
+
+Routing:
+    - an X-Trajectory-Key header, when present, is used as the key as is
+    - POST /predict: trajectory of the request body
+    - POST /predict/batch: trajectory of the first item
+    - /jobs...: one fixed key, since job ids live in the replica's job store
+    - anything else: the path
+
+Unhealthy replicas (failed GET /health polls, or a refused connection)
+are skipped: the request goes to the next replica on the ring.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from utils.simulation_cache import trajectory_key
+
+API_REPLICAS = [url.strip().rstrip("/") for url in os.environ.get("API_REPLICAS", "").split(",") if url.strip()]
+PROXY_VIRTUAL_NODES = int(os.environ.get("PROXY_VIRTUAL_NODES", "64"))
+PROXY_HEALTH_INTERVAL = float(os.environ.get("PROXY_HEALTH_INTERVAL", "2.0"))
+PROXY_TIMEOUT = float(os.environ.get("PROXY_TIMEOUT", "120"))
+
+TRAJECTORY_HEADER = "x-trajectory-key"
+JOBS_KEY = "jobs"
+
+# Hop-by-hop and recomputed headers, never forwarded
+_SKIPPED_HEADERS = {"host", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes"""
+
+    def __init__(self, nodes, virtual_nodes=PROXY_VIRTUAL_NODES):
+        self.nodes = list(nodes)
+        points = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(virtual_nodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def nodes_for(self, key):
+        """Distinct nodes in ring order, starting at the owner of key"""
+        if not self._hashes:
+            return []
+        start = bisect.bisect(self._hashes, self._hash(key))
+        ordered = []
+        for i in range(len(self._owners)):
+            node = self._owners[(start + i) % len(self._owners)]
+            if node not in ordered:
+                ordered.append(node)
+                if len(ordered) == len(self.nodes):
+                    break
+        return ordered
+
+
+def predict_routing_key(item):
+    """Canonical trajectory key of a PredictRequest body (same params as PredictorService)"""
+    carbon_max = float(item["recipe_carbon_max"])
+    return repr(trajectory_key({
+        "temperature": item["recipe_temperature"],
+        "carbon_flow": item["recipe_carbon_flow"],
+        "carbon_max": carbon_max,
+        "carbon_min": 0.7 * carbon_max,
+        "initial_carbon": item["carbon_percentage"],
+    }))
+
+
+def routing_key(path, headers, body):
+    if TRAJECTORY_HEADER in headers:
+        return headers[TRAJECTORY_HEADER]
+    if path.startswith("/jobs"):
+        return JOBS_KEY
+    try:
+        if path == "/predict":
+            return predict_routing_key(json.loads(body))
+        if path == "/predict/batch":
+            return predict_routing_key(json.loads(body)["items"][0])
+    except (ValueError, KeyError, IndexError, TypeError):
+        pass  # Malformed body: any replica will answer the 422
+    return path
+
+
+class AffinityProxy:
+    def __init__(self, replicas=API_REPLICAS, virtual_nodes=PROXY_VIRTUAL_NODES,
+                 health_interval=PROXY_HEALTH_INTERVAL, timeout=PROXY_TIMEOUT):
+        self.ring = HashRing(replicas, virtual_nodes)
+        self.healthy = set(replicas)
+        self.health_interval = health_interval
+        self.client = httpx.AsyncClient(timeout=timeout)
+        self._health_task = None
+
+    async def start(self):
+        await self.check_health()
+        self._health_task = asyncio.ensure_future(self._poll_health())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        await self.client.aclose()
+
+    async def check_health(self):
+        async def probe(replica):
+            try:
+                response = await self.client.get(f"{replica}/health", timeout=self.health_interval)
+                return replica, response.status_code == 200
+            except httpx.HTTPError:
+                return replica, False
+
+        for replica, ok in await asyncio.gather(*(probe(r) for r in self.ring.nodes)):
+            if ok and replica not in self.healthy:
+                logger.info("Replica %s is back", replica)
+            if not ok and replica in self.healthy:
+                logger.warning("Replica %s is unhealthy", replica)
+            (self.healthy.add if ok else self.healthy.discard)(replica)
+
+    async def _poll_health(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+    def candidates(self, key):
+        """Healthy replicas in ring order; all of them if none looks healthy"""
+        ordered = self.ring.nodes_for(key)
+        return [r for r in ordered if r in self.healthy] or ordered
+
+    async def forward(self, request: Request):
+        body = await request.body()
+        path = request.url.path
+        headers = {k: v for k, v in request.headers.items() if k not in _SKIPPED_HEADERS}
+        key = routing_key(path, request.headers, body)
+
+        for replica in self.candidates(key):
+            try:
+                upstream = await self.client.request(
+                    request.method, f"{replica}{path}", params=request.query_params,
+                    headers=headers, content=body
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # Not delivered: safe to retry on the next replica of the ring
+                logger.warning("Replica %s refused the connection, failing over", replica)
+                self.healthy.discard(replica)
+                continue
+            response_headers = {k: v for k, v in upstream.headers.items() if k not in _SKIPPED_HEADERS}
+            response_headers["X-Replica"] = replica
+            return Response(upstream.content, status_code=upstream.status_code, headers=response_headers)
+
+        return JSONResponse({"detail": "No replica available"}, status_code=503)
+
+
+proxy = AffinityProxy()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await proxy.start()
+    yield
+    await proxy.stop()
+
+
+app = FastAPI(title="ECM Recipe Prediction API proxy", lifespan=lifespan)
+
+
+@app.get("/health")
+def health():
+    replicas = {replica: replica in proxy.healthy for replica in proxy.ring.nodes}
+    return {"status": "ok" if any(replicas.values()) else "unavailable", "replicas": replicas}
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def forward(request: Request):
+    return await proxy.forward(request)
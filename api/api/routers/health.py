@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from utils.util import simulation_cache
+
+router = APIRouter()
+
+
+@router.get("/health")
+def health():
+    """Liveness probe for the front proxy, with this replica's simulation cache counters"""
+    return {"status": "ok", "simulation_cache": simulation_cache.stats()}
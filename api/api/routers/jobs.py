@@ -0,0 +1,81 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse
+from api.models import JobSubmitRequest, JobResponse
+from api.services.columnar import columnar_response, columns_to_json, negotiate
+from api.services.jobs import COLUMNAR_KINDS, JobQueue, STATUS_DONE
+
+router = APIRouter()
+_job_queue = None
+
+
+def get_job_queue():
+    """
+    The app's job queue (JOB_DB_PATH), created on first use: importing the
+    app does not touch the queue file, the lifespan hook creates it at startup.
+    """
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
+
+
+def _job_response(job):
+    """
+    Status of a job. Columnar results can be large and are left out: they are
+    fetched once from result_url instead of on every poll.
+    """
+    if job["kind"] in COLUMNAR_KINDS:
+        job = {**job, "result": None}
+        if job["status"] == STATUS_DONE:
+            job["result_url"] = f"/jobs/{job['id']}/result"
+    return JobResponse(**job)
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+def submit_job(req: JobSubmitRequest):
+    job_queue = get_job_queue()
+    job_id = job_queue.submit(req.kind, req.params, req.priority)
+    return _job_response(job_queue.get(job_id))
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, accept: Optional[str] = Header(None)):
+    """
+    Result of a finished job. Columnar results (predict_batch, sweep) can be
+    requested as an Arrow IPC stream or a Parquet file through Accept.
+    """
+    fmt = negotiate(accept)
+    job_queue = get_job_queue()
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != STATUS_DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    if job["kind"] in COLUMNAR_KINDS:
+        columns = job_queue.result_columns(job_id)
+        json_content = {"columns": columns_to_json(columns)} if fmt == "json" else None
+        return columnar_response(columns, fmt, json_content=json_content)
+    if fmt != "json":
+        raise HTTPException(status_code=406, detail=f"'{job['kind']}' results are only available as JSON")
+    return JSONResponse(job["result"])
+
+
+@router.delete("/jobs/{job_id}", response_model=JobResponse)
+def cancel_job(job_id: str):
+    job_queue = get_job_queue()
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return _job_response(job_queue.get(job_id))
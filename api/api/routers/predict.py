@@ -1,6 +1,16 @@
-from fastapi import APIRouter
-from api.models import PredictRequest, PredictResponse
-from api.services.predictor import PredictorService
+from typing import Optional
+
+from fastapi import APIRouter, Header
+from api.models import (
+    PredictBatchRequest,
+    PredictRequest,
+    PredictResponse,
+    SensitivityRequest,
+    SensitivityResponse
+)
+from api.services.columnar import columnar_response, negotiate
+from api.services.predictor import OUTPUT_NAMES, PredictorService
+from utils.cbpwin_observers import ProfileRecorder
 
 router = APIRouter()
 predictor = PredictorService()
@@ -8,8 +18,46 @@ predictor = PredictorService()
 
 @router.post("/predict", response_model=PredictResponse)
 def predict_recipe(req: PredictRequest):
-    predicted, recipe = predictor.predict(req)
+    # Carbon profiles are opt-in: no recorder, no profile work in the engine
+    recorder = ProfileRecorder(**req.profiles.model_dump()) if req.profiles else None
+    predicted, recipe = predictor.predict(req, [recorder] if recorder else [])
+    refinement = predictor.refine(req, recipe, **req.refine.model_dump()) if req.refine else None
     return PredictResponse(
         predicted_features=predicted,
-        reconstructed_recipe=recipe
+        reconstructed_recipe=recipe,
+        profiles=recorder.payloads() if recorder else None,
+        refinement=refinement
     )
+
+
+@router.post("/predict/batch")
+def predict_batch(req: PredictBatchRequest, accept: Optional[str] = Header(None)):
+    """
+    Batch prediction. JSON by default ({"results": [PredictResponse, ...]});
+    one row per item as Arrow IPC (stream or file) or Parquet when requested
+    in Accept.
+    """
+    fmt = negotiate(accept)
+    columns = predictor.predict_batch(req.items)
+    if fmt != "json":
+        return columnar_response(columns, fmt)
+
+    results = [
+        {
+            "predicted_features": {name: float(columns[name][k]) for name in OUTPUT_NAMES},
+            "reconstructed_recipe": recipe,
+        }
+        for k, recipe in enumerate(columns["reconstructed_recipe"])
+    ]
+    return columnar_response(columns, fmt, json_content={"results": results})
+
+
+@router.post("/predict/sensitivity", response_model=SensitivityResponse)
+def predict_sensitivity(req: SensitivityRequest):
+    """
+    Derivatives of the predicted outputs with respect to the process inputs
+    around req.base, by finite differences over one batch of simulations
+    and one model call.
+    """
+    return predictor.sensitivity(req.base, list(dict.fromkeys(req.inputs)), req.relative_step, req.steps,
+                                 req.method)
@@ -0,0 +1,60 @@
+"""
+Production entry point: applies the host tuning config, then runs uvicorn.
+
+    python -m api.serve [--host 0.0.0.0] [--port 8000]
+
+The number of uvicorn workers comes from WEB_CONCURRENCY (tuning config or
+environment), 1 by default. With several workers, this process runs the job
+worker pool for all of them (the uvicorn workers get JOB_WORKERS=0). Each
+uvicorn worker keeps its own simulation cache.
+"""
+
+import argparse
+import logging
+import os
+
+import uvicorn
+
+from api.tuning import TUNING_CONFIG_PATH, apply_tuning
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+    applied = apply_tuning()
+    if applied:
+        logger.info("Tuning config %s: %s", TUNING_CONFIG_PATH, applied)
+
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    job_queue = None
+    if workers > 1:
+        # Imported after apply_tuning: the api modules read their settings at import
+        from api.services.jobs import JobQueue
+
+        # One job pool for the server, not one per uvicorn worker
+        job_queue = JobQueue()
+        job_queue.start_workers()
+        os.environ["JOB_WORKERS"] = "0"
+
+    try:
+        uvicorn.run(
+            "api.main:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            log_level=args.log_level,
+        )
+    finally:
+        if job_queue is not None:
+            job_queue.stop_workers()
+
+
+if __name__ == "__main__":
+    main()
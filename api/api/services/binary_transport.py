@@ -0,0 +1,276 @@
+"""
+Compact binary prediction protocol over a Unix domain socket.
+
+Frames are little-endian fixed-layout structs, on persistent connections.
+Every frame carries a request id, so a client can pipeline requests:
+responses may come back in any order.
+
+Request frame:
+    uint32  length of the rest of the frame
+    uint32  request id
+    uint8   message type (MSG_PREDICT)
+    9 x float64  PredictRequest fields, in REQUEST_FIELDS order
+
+Response frame:
+    uint32  length of the rest of the frame
+    uint32  request id
+    uint8   status (STATUS_OK / STATUS_ERROR / STATUS_INVALID)
+    OK:     10 x float64 predicted features (OUTPUT_NAMES order)
+            uint16 number of cycles, then per cycle 3 x int32
+            (carb, diff, final; final = -1 when the cycle has no final time)
+    ERROR / INVALID:  utf-8 error message (INVALID = rejected input or
+                      malformed frame, request id 0 when the frame has none)
+
+A length prefix above MAX_FRAME_LENGTH is answered with INVALID and the
+connection is closed. A connection has at most PREDICT_MAX_IN_FLIGHT
+requests in progress: beyond that, the server stops reading it until one
+is answered.
+
+The Node client is server/services/predictionSocketClient.js.
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import socket
+import struct
+
+from api.services.predictor import OUTPUT_NAMES
+
+PREDICT_SOCKET_PATH = os.environ.get("PREDICT_SOCKET_PATH")
+# Requests of one connection processed at the same time
+PREDICT_MAX_IN_FLIGHT = int(os.environ.get("PREDICT_MAX_IN_FLIGHT", "16"))
+
+MSG_PREDICT = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_INVALID = 2
+
+REQUEST_FIELDS = [
+    "hardness_value", "target_depth", "load_weight", "weight", "is_weight_unknown",
+    "recipe_temperature", "recipe_carbon_max", "recipe_carbon_flow", "carbon_percentage",
+]
+
+HEADER = struct.Struct("<IIB")
+PREDICT_BODY = struct.Struct(f"<{len(REQUEST_FIELDS)}d")
+FEATURES = struct.Struct(f"<{len(OUTPUT_NAMES)}d")
+CYCLE_COUNT = struct.Struct("<H")
+CYCLE = struct.Struct("<3i")
+
+# Length prefix counts the request id and type/status bytes
+_HEADER_REST = HEADER.size - 4
+PREDICT_FRAME_LENGTH = _HEADER_REST + PREDICT_BODY.size
+# Larger length prefixes are rejected before reading the frame
+MAX_FRAME_LENGTH = 4096
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+
+def encode_request(request_id, values):
+    body = PREDICT_BODY.pack(*values)
+    return HEADER.pack(_HEADER_REST + len(body), request_id, MSG_PREDICT) + body
+
+
+def encode_response(request_id, predicted_features, recipe):
+    parts = [
+        FEATURES.pack(*(predicted_features[name] for name in OUTPUT_NAMES)),
+        CYCLE_COUNT.pack(len(recipe)),
+    ]
+    for cycle in recipe:
+        parts.append(CYCLE.pack(cycle[0], cycle[1], cycle[2] if len(cycle) > 2 else -1))
+    body = b"".join(parts)
+    return HEADER.pack(_HEADER_REST + len(body), request_id, STATUS_OK) + body
+
+
+def encode_error(request_id, message, status=STATUS_ERROR):
+    body = message.encode("utf-8")
+    return HEADER.pack(_HEADER_REST + len(body), request_id, status) + body
+
+
+def decode_response(status, body):
+    """Returns (predicted_features, recipe), raises RuntimeError on an error frame"""
+    if status != STATUS_OK:
+        raise RuntimeError(body.decode("utf-8"))
+    predicted = dict(zip(OUTPUT_NAMES, FEATURES.unpack_from(body, 0)))
+    (n_cycles,) = CYCLE_COUNT.unpack_from(body, FEATURES.size)
+    recipe = []
+    offset = FEATURES.size + CYCLE_COUNT.size
+    for _ in range(n_cycles):
+        carb, diff, final = CYCLE.unpack_from(body, offset)
+        recipe.append([carb, diff, final] if final >= 0 else [carb, diff])
+        offset += CYCLE.size
+    return predicted, recipe
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class BinaryPredictServer:
+    """
+    asyncio Unix socket server next to the HTTP app. Predictions run in the
+    default thread pool (like the sync FastAPI routes), so several requests
+    of one connection are processed concurrently and answered by id.
+
+    One process serves a path: it holds a lock on `<path>.lock`. With several
+    uvicorn workers, the first one to start serves the socket and the others
+    skip it.
+    """
+
+    def __init__(self, predictor, path=PREDICT_SOCKET_PATH, max_in_flight=PREDICT_MAX_IN_FLIGHT):
+        self.predictor = predictor
+        self.path = path
+        self.max_in_flight = max_in_flight
+        self._server = None
+        self._lock = None
+
+    async def start(self):
+        """Returns False when another process already serves the path"""
+        lock = open(self.path + ".lock", "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            logger.info("Prediction socket %s is served by another process", self.path)
+            return False
+        self._lock = lock
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.path)
+        return True
+
+    async def stop(self):
+        if self._lock is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._lock.close()
+        self._lock = None
+
+    async def _handle_connection(self, reader, writer):
+        tasks = set()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        try:
+            while True:
+                try:
+                    (length,) = struct.unpack("<I", await reader.readexactly(4))
+                    if length > MAX_FRAME_LENGTH:
+                        # The stream cannot be resynchronised: answer, then close
+                        await self._reject(writer, 0, f"Frame length {length} exceeds {MAX_FRAME_LENGTH}")
+                        break
+                    frame = await reader.readexactly(length)
+                except asyncio.IncompleteReadError as e:
+                    if e.partial:
+                        await self._reject(writer, _request_id(e.partial), "Truncated frame")
+                    break
+                # At the cap, wait for an answer before reading the next frame
+                await in_flight.acquire()
+                task = asyncio.ensure_future(self._answer(frame, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _: in_flight.release())
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def _answer(self, frame, writer):
+        request_id = _request_id(frame)
+        try:
+            if len(frame) < _HEADER_REST:
+                raise ValueError(f"Frame of {len(frame)} bytes has no header")
+            request_id, message_type = struct.unpack_from("<IB", frame, 0)
+            if message_type != MSG_PREDICT:
+                raise ValueError(f"Unknown message type {message_type}")
+            if len(frame) != PREDICT_FRAME_LENGTH:
+                raise ValueError(f"Predict frame of {len(frame)} bytes, expected {PREDICT_FRAME_LENGTH}")
+            values = PREDICT_BODY.unpack_from(frame, _HEADER_REST)
+            loop = asyncio.get_running_loop()
+            predicted, recipe = await loop.run_in_executor(None, self._predict, values)
+            response = encode_response(request_id, predicted, recipe)
+        except (ValueError, struct.error) as e:
+            # Malformed frame or invalid input (pydantic validation errors are ValueErrors)
+            logger.warning("Binary predict request rejected: %s", e)
+            response = encode_error(request_id, str(e), STATUS_INVALID)
+        except Exception as e:
+            logger.exception("Binary predict request failed")
+            response = encode_error(request_id, str(e))
+        writer.write(response)
+        await writer.drain()
+
+    async def _reject(self, writer, request_id, message):
+        logger.warning("Binary predict request rejected: %s", message)
+        writer.write(encode_error(request_id, message, STATUS_INVALID))
+        await writer.drain()
+
+    def _predict(self, values):
+        from api.models import PredictRequest
+        req = PredictRequest(**dict(zip(REQUEST_FIELDS, values)))
+        return self.predictor.predict(req)
+
+
+def _request_id(frame):
+    """Request id of a frame, 0 when the frame is too short to carry one"""
+    return struct.unpack_from("<I", frame, 0)[0] if len(frame) >= 4 else 0
+
+
+# ---------------------------------------------------------------------------
+# Client (benchmarks, Python callers)
+# ---------------------------------------------------------------------------
+
+class BinaryPredictClient:
+    """Blocking client with one persistent connection; supports pipelining"""
+
+    def __init__(self, path=PREDICT_SOCKET_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self._buffer = b""
+        self._next_id = 0
+
+    def close(self):
+        self.sock.close()
+
+    def send(self, request):
+        """Send one request (dict of REQUEST_FIELDS), returns its id"""
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        self.sock.sendall(encode_request(self._next_id, [float(request[f]) for f in REQUEST_FIELDS]))
+        return self._next_id
+
+    def receive(self):
+        """Next response: (request_id, predicted_features, recipe)"""
+        (length,) = struct.unpack("<I", self._read(4))
+        frame = self._read(length)
+        request_id, status = struct.unpack_from("<IB", frame, 0)
+        predicted, recipe = decode_response(status, frame[_HEADER_REST:])
+        return request_id, predicted, recipe
+
+    def predict(self, request):
+        self.send(request)
+        _, predicted, recipe = self.receive()
+        return predicted, recipe
+
+    def predict_many(self, requests):
+        """Pipelined: send everything, then collect the answers in request order"""
+        ids = [self.send(request) for request in requests]
+        answers = {}
+        while len(answers) < len(ids):
+            request_id, predicted, recipe = self.receive()
+            answers[request_id] = (predicted, recipe)
+        return [answers[i] for i in ids]
+
+    def _read(self, n):
+        while len(self._buffer) < n:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Prediction socket closed")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:n], self._buffer[n:]
+        return data
@@ -0,0 +1,162 @@
+import io
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ARROW_FILE = "application/vnd.apache.arrow.file"
+PARQUET = "application/vnd.apache.parquet"
+
+# Accept media type -> response format
+FORMATS = {
+    "application/json": "json",
+    ARROW_STREAM: "arrow",
+    ARROW_FILE: "arrow_file",
+    PARQUET: "parquet",
+    "application/x-parquet": "parquet",
+}
+
+# Response format -> media type
+MEDIA_TYPES = {
+    "arrow": ARROW_STREAM,
+    "arrow_file": ARROW_FILE,
+    "parquet": PARQUET,
+}
+
+
+def negotiate(accept):
+    """
+    Pick the response format from an Accept header, JSON unless Arrow or
+    Parquet is preferred (q-values respected, wildcards mean JSON).
+    """
+    if not accept:
+        return "json"
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *options = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for option in options:
+            if option.startswith("q="):
+                try:
+                    quality = float(option[2:])
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.lower()
+        if media_type in ("*/*", "application/*"):
+            media_type = "application/json"
+        if media_type in FORMATS and quality > 0:
+            candidates.append((-quality, position, FORMATS[media_type]))
+
+    if not candidates:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Supported media types: application/json, {ARROW_STREAM}, {ARROW_FILE}, {PARQUET}"
+        )
+    return min(candidates)[2]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise HTTPException(status_code=406, detail="Arrow/Parquet output requires pyarrow on the server")
+
+
+class ListColumn:
+    """
+    List column (one recipe per row) kept as Arrow lays it out: flat values
+    and one offsets array per nesting level, outermost first.
+    """
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def tolist(self):
+        items = self.values.tolist()
+        for offsets in reversed(self.offsets):
+            items = [items[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        return items
+
+    def to_arrow(self, pa):
+        array = pa.array(self.values)
+        for offsets in reversed(self.offsets):
+            array = pa.ListArray.from_arrays(pa.array(offsets), array)
+        return array
+
+
+_OFFSETS = "#offsets"
+
+
+def pack_columns(columns):
+    """
+    Store columns (numpy arrays or lists, list columns nested to any depth)
+    as an uncompressed npz blob of numpy arrays. No pickling: columns must
+    hold numbers, booleans or strings.
+    """
+    arrays = {}
+    for name, values in columns.items():
+        level = 0
+        while isinstance(values, (list, tuple)) and values and isinstance(values[0], (list, tuple)):
+            arrays[f"{name}{_OFFSETS}{level}"] = np.cumsum([0] + [len(item) for item in values], dtype=np.int32)
+            values = [value for item in values for value in item]
+            level += 1
+        arrays[name] = np.asarray(values)
+    sink = io.BytesIO()
+    np.savez(sink, **arrays)
+    return sink.getvalue()
+
+
+def unpack_columns(blob):
+    """Columns of a pack_columns blob: numpy arrays, ListColumn for list columns"""
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    columns = {}
+    for name, values in arrays.items():
+        if _OFFSETS in name:
+            continue
+        offsets = []
+        while f"{name}{_OFFSETS}{len(offsets)}" in arrays:
+            offsets.append(arrays[f"{name}{_OFFSETS}{len(offsets)}"])
+        columns[name] = ListColumn(values, offsets) if offsets else values
+    return columns
+
+
+def columns_to_json(columns):
+    return {name: values.tolist() if hasattr(values, "tolist") else values for name, values in columns.items()}
+
+
+def columns_to_bytes(columns, fmt):
+    """
+    Serialize a dict of equal-length columns (lists, numpy arrays or
+    ListColumn) as an Arrow IPC stream, an Arrow IPC file or a Parquet file.
+    Numpy and ListColumn columns are wrapped without building Python objects.
+    """
+    pa = _import_pyarrow()
+    table = pa.table({name: values.to_arrow(pa) if isinstance(values, ListColumn) else values
+                      for name, values in columns.items()})
+    sink = io.BytesIO()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == "arrow_file":
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink)
+    return sink.getvalue()
+
+
+def columnar_response(columns, fmt, json_content=None):
+    """
+    Response for a bulk result held as columns. JSON (the default) returns
+    json_content when given, else the columns themselves.
+    """
+    if fmt == "json":
+        return JSONResponse(json_content if json_content is not None else columns_to_json(columns))
+
+    return Response(content=columns_to_bytes(columns, fmt), media_type=MEDIA_TYPES[fmt])
@@ -0,0 +1,249 @@
+import json
+import threading
+
+import numpy as np
+
+
+class CompiledTreeEnsemble:
+    """
+    Array-based evaluator for a trained XGBoost regressor.
+
+    All trees are flattened into one node table laid out so that the right
+    child of a split always follows its left child. One traversal level is
+    then a handful of vectorised numpy calls over every tree at once, written
+    into scratch buffers allocated up front: no DMatrix, no DataFrame and no
+    allocation per call. The buffers are per thread: one instance is shared
+    by the request threadpool and the binary transport's executor.
+
+    Supported models: XGBRegressor (single or multi-target with one output
+    per tree) and sklearn MultiOutputRegressor wrapping XGBRegressors.
+    """
+
+    def __init__(self, model):
+        estimators = getattr(model, "estimators_", None)
+        if estimators is None:
+            estimators = [model]
+
+        self.feature_names = _feature_names(model, estimators[0])
+
+        feature, threshold, child, default_left, value = [], [], [], [], []
+        roots, tree_target, base_score = [], [], []
+        max_depth = 0
+
+        for estimator in estimators:
+            booster_json = json.loads(estimator.get_booster().save_raw("json"))
+            learner = booster_json["learner"]
+            objective = learner["objective"]["name"]
+            if objective not in ("reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"):
+                raise ValueError(f"Unsupported objective '{objective}'")
+
+            gbtree = learner["gradient_booster"]
+            if gbtree.get("name", "gbtree") != "gbtree":
+                raise ValueError(f"Unsupported booster '{gbtree.get('name')}'")
+            trees_json = gbtree["model"]["trees"]
+            tree_info = gbtree["model"]["tree_info"]
+
+            n_trees = _n_used_trees(estimator, gbtree["model"], len(trees_json))
+            target_offset = len(base_score)
+            base_score.extend(_base_scores(learner["learner_model_param"]))
+
+            for tree, target in zip(trees_json[:n_trees], tree_info[:n_trees]):
+                if int(tree["tree_param"].get("size_leaf_vector", "1")) > 1:
+                    raise ValueError("Vector-leaf (multi_output_tree) models are not supported")
+                root, depth = _append_tree(tree, len(feature), feature, threshold, child, default_left, value)
+                roots.append(root)
+                tree_target.append(target_offset + target)
+                max_depth = max(max_depth, depth)
+
+        self.n_features = len(self.feature_names)
+        self.n_targets = len(base_score)
+        self.n_trees = len(roots)
+        self.max_depth = max_depth
+
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.child = np.asarray(child, dtype=np.intp)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.base_score = np.asarray(base_score, dtype=np.float32)
+
+        # Tree -> target one-hot matrix: leaf sums become a single matmul
+        self.tree_target = np.zeros((self.n_trees, self.n_targets), dtype=np.float32)
+        self.tree_target[np.arange(self.n_trees), tree_target] = 1.0
+
+        self._local = threading.local()
+
+    def _buffers(self, n_rows):
+        """Scratch buffers of the calling thread, grown to n_rows if needed"""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is not None and buffers["capacity"] >= n_rows:
+            return buffers
+        shape = (n_rows, self.n_trees)
+        buffers = {
+            "capacity": n_rows,
+            "x": np.empty((n_rows, self.n_features), dtype=np.float32),
+            "row_offset": (np.arange(n_rows, dtype=np.intp) * self.n_features)[:, None],
+            "nodes": np.empty(shape, dtype=np.intp),
+            "index": np.empty(shape, dtype=np.intp),
+            "values": np.empty(shape, dtype=np.float32),
+            "thresholds": np.empty(shape, dtype=np.float32),
+            "go_right": np.empty(shape, dtype=bool),
+            "missing": np.empty(shape, dtype=bool),
+            "out": np.empty((n_rows, self.n_targets), dtype=np.float32),
+        }
+        self._local.buffers = buffers
+        return buffers
+
+    def predict(self, X):
+        """
+        Evaluate a (n_rows, n_features) array in feature_names order.
+        Returns a new (n_rows, n_targets) float32 array.
+        """
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X[None, :]
+        n_rows = X.shape[0]
+        buffers = self._buffers(n_rows)
+
+        x = buffers["x"][:n_rows]
+        x[...] = X
+        nodes = buffers["nodes"][:n_rows]
+        index = buffers["index"][:n_rows]
+        values = buffers["values"][:n_rows]
+        thresholds = buffers["thresholds"][:n_rows]
+        go_right = buffers["go_right"][:n_rows]
+        has_missing = np.isnan(x).any()
+
+        nodes[...] = self.roots
+        flat_x = buffers["x"].reshape(-1)
+        for _ in range(self.max_depth):
+            np.take(self.feature, nodes, out=index, mode="clip")
+            if n_rows > 1:
+                np.add(index, buffers["row_offset"][:n_rows], out=index)
+            np.take(flat_x, index, out=values, mode="clip")
+            np.take(self.threshold, nodes, out=thresholds, mode="clip")
+            # xgboost goes left when x < threshold, right otherwise
+            np.greater_equal(values, thresholds, out=go_right)
+            if has_missing:
+                missing = buffers["missing"][:n_rows]
+                np.isnan(values, out=missing)
+                go_right[missing] = ~np.take(self.default_left, nodes[missing])
+            np.take(self.child, nodes, out=index, mode="clip")
+            np.add(index, go_right, out=nodes)
+
+        np.take(self.value, nodes, out=values, mode="clip")
+        out = buffers["out"][:n_rows]
+        np.dot(values, self.tree_target, out=out)
+        np.add(out, self.base_score, out=out)
+        # The buffers are reused by the next call of the same thread
+        return out.copy()
+
+    def predict_row(self, row):
+        """Single-row evaluation, returns a new 1-D array"""
+        return self.predict(row)[0]
+
+
+def _feature_names(model, estimator):
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        names = estimator.get_booster().feature_names
+    if names is None:
+        raise ValueError("The model does not record its feature names")
+    return [str(name) for name in names]
+
+
+def _base_scores(learner_model_param):
+    raw = learner_model_param["base_score"].strip("[]")
+    scores = [float(v) for v in raw.split(",")]
+    n_targets = max(1, int(learner_model_param.get("num_target", "1")))
+    if len(scores) == 1 and n_targets > 1:
+        scores = scores * n_targets
+    return scores
+
+
+def _n_used_trees(estimator, model_json, n_trees):
+    """Trees used by estimator.predict (early stopping limits the iterations)"""
+    try:
+        best_iteration = estimator.best_iteration
+    except AttributeError:
+        return n_trees
+    if best_iteration is None:
+        return n_trees
+    return int(model_json["iteration_indptr"][best_iteration + 1])
+
+
+def _append_tree(tree, offset, feature, threshold, child, default_left, value):
+    """
+    Append one tree in breadth-first order with sibling nodes stored next to
+    each other. Leaves point to themselves (threshold +inf, never go right)
+    so every tree can be walked for the same number of levels.
+    Returns (root index, depth).
+    """
+    left = tree["left_children"]
+    right = tree["right_children"]
+
+    order = [0]
+    new_index = {0: offset}
+    depth_of = {0: 0}
+    position = 0
+    while position < len(order):
+        node = order[position]
+        position += 1
+        if left[node] != -1:
+            for c in (left[node], right[node]):
+                new_index[c] = offset + len(order)
+                depth_of[c] = depth_of[node] + 1
+                order.append(c)
+
+    for node in order:
+        if left[node] == -1:
+            feature.append(0)
+            threshold.append(np.inf)
+            child.append(new_index[node])
+            default_left.append(True)
+            value.append(tree["split_conditions"][node])
+        else:
+            feature.append(tree["split_indices"][node])
+            threshold.append(tree["split_conditions"][node])
+            child.append(new_index[left[node]])
+            default_left.append(bool(tree["default_left"][node]))
+            value.append(0.0)
+
+    return offset, max(depth_of.values())
+
+
+def reference_rows(compiled, n_rows=256, seed=0):
+    """
+    Reference set built from the model itself: every feature takes values at,
+    just below and just above its split thresholds, so both sides of the
+    splits are exercised.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, compiled.n_features), dtype=np.float32)
+    is_split = compiled.threshold != np.inf
+    for j in range(compiled.n_features):
+        candidates = compiled.threshold[is_split & (compiled.feature == j)]
+        if candidates.size == 0:
+            X[:, j] = rng.normal(size=n_rows)
+            continue
+        picks = rng.choice(candidates, size=n_rows)
+        X[:, j] = picks + rng.choice([-1.0, 0.0, 1.0], size=n_rows) * np.maximum(np.abs(picks), 1.0) * 1e-3
+    return X
+
+
+def validate(compiled, model, X_ref=None, rtol=1e-4, atol=1e-2):
+    """
+    Compare the compiled evaluator with the original model on a reference set.
+    Returns (ok, max_abs_error).
+    """
+    import pandas as pd
+
+    if X_ref is None:
+        X_ref = reference_rows(compiled)
+    expected = np.asarray(model.predict(pd.DataFrame(X_ref, columns=compiled.feature_names)), dtype=np.float64)
+    expected = expected.reshape(len(X_ref), -1)
+    got = compiled.predict(X_ref).astype(np.float64)
+
+    max_abs_error = float(np.max(np.abs(got - expected)))
+    return bool(np.allclose(got, expected, rtol=rtol, atol=atol)), max_abs_error
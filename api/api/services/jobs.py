@@ -0,0 +1,415 @@
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from api.services.columnar import pack_columns, unpack_columns
+
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_INTERACTIVE_WORKERS = int(os.environ.get("JOB_INTERACTIVE_WORKERS", "1"))
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", str(24 * 3600)))
+JOB_POLL_INTERVAL = 0.2
+# A running job whose worker has not sent a heartbeat for JOB_LEASE_SECONDS
+# (worker killed, server restarted) goes back to the queue
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+SWEEP_MAX_POINTS = int(os.environ.get("SWEEP_MAX_POINTS", "10000"))
+
+# Lower value = served first
+PRIORITIES = {
+    "interactive": 0,
+    "bulk": 10,
+}
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT,
+    result_columns BLOB,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at);
+"""
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+# ---------------------------------------------------------------------------
+# Job handlers (run inside the worker processes)
+# ---------------------------------------------------------------------------
+
+_predictor = None
+
+
+def _get_predictor():
+    global _predictor
+    if _predictor is None:
+        from api.services.predictor import PredictorService
+        _predictor = PredictorService()
+    return _predictor
+
+
+def _profile_recorder(options):
+    from utils.cbpwin_observers import ProfileRecorder
+    return ProfileRecorder(**options) if options else None
+
+
+def _run_predict(params):
+    from api.models import PredictRequest
+    req = PredictRequest(**params)
+    recorder = _profile_recorder(req.profiles.model_dump() if req.profiles else None)
+    predicted, recipe = _get_predictor().predict(req, [recorder] if recorder else [])
+    result = {"predicted_features": predicted, "reconstructed_recipe": recipe}
+    if recorder:
+        result["profiles"] = recorder.payloads()
+    if req.refine:
+        result["refinement"] = _get_predictor().refine(req, recipe, **req.refine.model_dump())
+    return result
+
+
+def _run_simulate(params):
+    from utils.util import calculate_recipe
+    recorder = _profile_recorder(params.get("profiles"))
+    results = calculate_recipe(params, [recorder] if recorder else [])
+    result = {"steps": [list(r) for r in results]}
+    if recorder:
+        result["profiles"] = recorder.payloads()
+    return result
+
+
+def _run_predict_batch(params):
+    from api.models import PredictBatchRequest
+    return {"columns": _get_predictor().predict_batch(PredictBatchRequest(**params).items)}
+
+
+def _run_sweep(params):
+    """
+    Simulations over the cartesian product of params["grid"] ({name: [values]})
+    on top of params["base"]. One row per simulated cycle.
+
+    With params["precision"] ("float64" or "float32"), all points run as one
+    batch (utils/cbpwin_batch.py) instead of one exact simulation each.
+    float64 gives the exact engine's results. float32 is for analysis only:
+    points whose stop decision is ambiguous in float32 are recomputed in
+    float64 and marked in a "rechecked" column.
+    """
+    from utils.util import calculate_recipe
+
+    base = params.get("base", {})
+    names = list(params["grid"])
+    points = list(itertools.product(*(params["grid"][name] for name in names)))
+    if len(points) > SWEEP_MAX_POINTS:
+        raise ValueError(f"Sweep has {len(points)} points (max {SWEEP_MAX_POINTS})")
+
+    point_params = [{**base, **dict(zip(names, values))} for values in points]
+    precision = params.get("precision")
+    rechecked = set()
+    if precision is None:
+        point_results = [calculate_recipe(point) for point in point_params]
+    else:
+        point_results, rechecked = _batch_sweep(point_params, precision)
+
+    counts = np.array([len(results) for results in point_results], dtype=np.int64)
+    steps = np.array([step for results in point_results for step in results], dtype=np.float64).reshape(-1, 4)
+    point = np.repeat(np.arange(len(points)), counts)
+    columns = {"point": point}
+    for i, name in enumerate(names):
+        columns[name] = np.repeat(np.asarray([values[i] for values in points]), counts)
+    columns["step"] = np.arange(len(point)) - np.repeat(np.cumsum(counts) - counts, counts)
+    for i, name in enumerate(("carb_time", "diff_time", "final_time", "depth")):
+        columns[name] = steps[:, i]
+    if precision == "float32":
+        columns["rechecked"] = np.isin(point, sorted(rechecked))
+    return {"columns": columns}
+
+
+def _batch_sweep(point_params, precision):
+    from utils.cbpwin_batch import run_batch
+    from utils.util import build_process_params
+
+    if any(point.get("engine", "exact") != "exact" for point in point_params):
+        raise ValueError("Batch sweeps (precision) only run the exact engine")
+    batch = run_batch([build_process_params(point) for point in point_params], precision)
+    return batch.results, set(batch.rechecked)
+
+
+JOB_HANDLERS = {
+    "predict": _run_predict,
+    "simulate": _run_simulate,
+    "predict_batch": _run_predict_batch,
+    "sweep": _run_sweep,
+}
+
+# Kinds returning {"columns": {...}}: stored as numpy arrays (result_columns),
+# fetched through /jobs/{id}/result (JSON, Arrow or Parquet), never inlined in
+# status responses
+COLUMNAR_KINDS = {"predict_batch", "sweep"}
+
+
+class JobQueue:
+    """
+    Persistent job queue backed by a local SQLite file.
+
+    Jobs are claimed by worker processes in (priority, created_at) order.
+    Interactive-only workers never pick bulk jobs, so interactive requests
+    are not stuck behind long batch work.
+
+    A claimed job is leased: its worker renews heartbeat_at while it runs.
+    Only jobs whose lease has expired are put back in the queue, so several
+    processes can share one queue file without running a job twice.
+    """
+
+    def __init__(self, db_path=JOB_DB_PATH, retention_seconds=JOB_RETENTION_SECONDS,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        self._workers = []
+        self._stop_event = None
+
+        conn = _connect(self.db_path)
+        conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for name, sql_type in (("heartbeat_at", "REAL"), ("result_columns", "BLOB")):
+            if name not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {sql_type}")
+        conn.close()
+
+    # --- API side -----------------------------------------------------------
+
+    def submit(self, kind, params, priority="bulk"):
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+
+        job_id = uuid.uuid4().hex
+        conn = _connect(self.db_path)
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, priority, status, params, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, PRIORITIES[priority], STATUS_QUEUED, json.dumps(params), time.time())
+            )
+        finally:
+            conn.close()
+        return job_id
+
+    def get(self, job_id):
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        job = dict(row)
+        del job["result_columns"]
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["priority"] = next(name for name, value in PRIORITIES.items() if value == job["priority"])
+        if job["status"] == STATUS_QUEUED:
+            job["queue_position"] = self._queue_position(row)
+        return job
+
+    def result_columns(self, job_id):
+        """Columns of a finished columnar job (numpy arrays / ListColumn), or None"""
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute("SELECT result_columns FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or row["result_columns"] is None:
+            return None
+        return unpack_columns(row["result_columns"])
+
+    def _queue_position(self, row):
+        conn = _connect(self.db_path)
+        try:
+            (ahead,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND "
+                "(priority < ? OR (priority = ? AND created_at < ?))",
+                (STATUS_QUEUED, row["priority"], row["priority"], row["created_at"])
+            ).fetchone()
+        finally:
+            conn.close()
+        return ahead
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job. A running job keeps its worker busy
+        until the current computation ends, but its result is discarded.
+        Returns False when the job is unknown or already finished.
+        """
+        conn = _connect(self.db_path)
+        try:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (STATUS_CANCELLED, time.time(), job_id, STATUS_QUEUED, STATUS_RUNNING)
+            )
+        finally:
+            conn.close()
+        return cur.rowcount == 1
+
+    # --- Worker pool --------------------------------------------------------
+
+    def start_workers(self, workers=JOB_WORKERS, interactive_workers=JOB_INTERACTIVE_WORKERS):
+        """
+        Start `workers` processes, the first `interactive_workers` of them
+        reserved for interactive jobs. At least one worker always accepts
+        every priority, otherwise bulk jobs would never run.
+        """
+        if workers > 0 and interactive_workers >= workers:
+            logger.warning("JOB_INTERACTIVE_WORKERS=%d with JOB_WORKERS=%d would leave bulk jobs unclaimed: "
+                           "reserving %d worker(s) for interactive jobs", interactive_workers, workers, workers - 1)
+            interactive_workers = workers - 1
+        ctx = multiprocessing.get_context("spawn")
+        self._stop_event = ctx.Event()
+        for i in range(workers):
+            max_priority = PRIORITIES["interactive"] if i < interactive_workers else max(PRIORITIES.values())
+            process = ctx.Process(
+                target=_worker_main,
+                args=(self.db_path, max_priority, self.retention_seconds, self.lease_seconds,
+                      self._stop_event),
+                name=f"job-worker-{i}",
+                daemon=False
+            )
+            process.start()
+            self._workers.append(process)
+
+    def stop_workers(self, timeout=5.0):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
+
+
+def _claim_next(conn, max_priority, lease_seconds=JOB_LEASE_SECONDS):
+    """
+    Claim the next queued job: (id, kind, params, started_at) row or None.
+    Expired leases are put back in the queue first.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, heartbeat_at = NULL "
+            "WHERE status = ? AND COALESCE(heartbeat_at, started_at, 0) < ?",
+            (STATUS_QUEUED, STATUS_RUNNING, now - lease_seconds)
+        )
+        row = conn.execute(
+            "SELECT id, kind, params FROM jobs WHERE status = ? AND priority <= ? "
+            "ORDER BY priority, created_at LIMIT 1",
+            (STATUS_QUEUED, max_priority)
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (STATUS_RUNNING, now, now, row["id"])
+            )
+            row = {**dict(row), "started_at": now}
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+
+def _heartbeat(db_path, job_id, started_at, interval, done):
+    """Renew the lease of a running job until `done` is set (thread of the worker)"""
+    conn = _connect(db_path)
+    try:
+        while not done.wait(interval):
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ? AND started_at = ?",
+                (time.time(), job_id, STATUS_RUNNING, started_at)
+            )
+    finally:
+        conn.close()
+
+
+def _purge_expired(conn, retention_seconds):
+    conn.execute(
+        "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+        (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED, time.time() - retention_seconds)
+    )
+
+
+def _worker_main(db_path, max_priority, retention_seconds, lease_seconds, stop_event):
+    conn = _connect(db_path)
+    last_purge = 0.0
+
+    while not stop_event.is_set():
+        if time.time() - last_purge > 60:
+            _purge_expired(conn, retention_seconds)
+            last_purge = time.time()
+
+        row = _claim_next(conn, max_priority, lease_seconds)
+        if row is None:
+            stop_event.wait(JOB_POLL_INTERVAL)
+            continue
+
+        # Heartbeat 4 times per lease
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=_heartbeat,
+            args=(db_path, row["id"], row["started_at"], lease_seconds / 4, done),
+            daemon=True
+        )
+        heartbeat.start()
+        result, result_columns, error, status = None, None, None, STATUS_DONE
+        try:
+            output = JOB_HANDLERS[row["kind"]](json.loads(row["params"]))
+            if row["kind"] in COLUMNAR_KINDS:
+                result_columns = pack_columns(output["columns"])
+            else:
+                result = json.dumps(output)
+        except Exception as e:
+            # Clients get the exception message, the traceback stays in the worker log
+            logger.exception("Job %s (%s) failed", row["id"], row["kind"])
+            error, status = f"{type(e).__name__}: {e}", STATUS_FAILED
+        finally:
+            done.set()
+            heartbeat.join()
+
+        # A job cancelled while running is no longer in the 'running' state,
+        # a job whose lease expired has been claimed again (new started_at)
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, result_columns = ?, error = ?, finished_at = ? "
+            "WHERE id = ? AND status = ? AND started_at = ?",
+            (status, result, result_columns, error, time.time(), row["id"], STATUS_RUNNING, row["started_at"])
+        )
+
+    conn.close()
@@ -1,26 +1,188 @@
+import logging
+import os
 import pickle
+import queue
+import random
+import threading
+import time
+import uuid
 import numpy as np
 import pandas as pd
+from api.services.compiled_model import CompiledTreeEnsemble, validate
+from utils.cbpwin_observers import BufferedLoggingObserver
+from utils.cbpwin_refine import DEFAULT_MAX_ITERATIONS, DEFAULT_TOLERANCE, refine_recipe
+from utils.cbpwin_trajectory import TrajectoryRecorder
 from utils.util import (
+    build_process_params,
     reconstruct_recipe,
     extract_features,
     calculate_recipe,
+    calculate_recipes,
     get_eff_carbon
 )
 
 XGB_MODEL_PATH = "models/best_recipe_model_XGBoost.pkl"
 
+# "xgboost" (generic predict) or "compiled" (array-based tree evaluator)
+PREDICTOR_BACKEND = os.environ.get("PREDICTOR_BACKEND", "xgboost")
+
+# One structured log record per simulation (logger "cbpwin"), off by default
+SIMULATION_LOG = os.environ.get("SIMULATION_LOG", "0") == "1"
+
+# Fraction of the simulations whose profile history is recorded to TRAJECTORY_DIR (.npz)
+TRAJECTORY_SAMPLE_RATE = float(os.environ.get("TRAJECTORY_SAMPLE_RATE", "0"))
+TRAJECTORY_DIR = os.environ.get("TRAJECTORY_DIR", "trajectories")
+TRAJECTORY_EVERY = int(os.environ.get("TRAJECTORY_EVERY", "60"))
+TRAJECTORY_BUDGET_BYTES = int(os.environ.get("TRAJECTORY_BUDGET_BYTES", str(16 * 1024 * 1024)))
+# Trajectories waiting for the writer thread; more are dropped with a warning
+TRAJECTORY_EXPORT_QUEUE = int(os.environ.get("TRAJECTORY_EXPORT_QUEUE", "4"))
+
+# Threads of the xgboost predict (0 = xgboost default)
+XGBOOST_NTHREAD = int(os.environ.get("XGBOOST_NTHREAD", "0"))
+
+OUTPUT_NAMES = [
+    'res_first_carb', 'res_first_diff', 'res_second_carb', 'res_second_diff',
+    'res_last_carb', 'res_last_diff', 'res_final_time', 'res_num_cycles', 'total_carb_time', 'total_diff_time'
+]
+
+# Inputs of the sensitivity endpoint and default finite-difference step (fraction of the value)
+SENSITIVITY_INPUTS = ("recipe_temperature", "recipe_carbon_max", "recipe_carbon_flow", "carbon_percentage",
+                      "target_depth")
+DEFAULT_RELATIVE_STEP = 0.02
+
+logger = logging.getLogger(__name__)
+
+if SIMULATION_LOG and not logging.getLogger("cbpwin").handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.getLogger("cbpwin").addHandler(_handler)
+    logging.getLogger("cbpwin").setLevel(logging.INFO)
+
+
+class TrajectoryExporter:
+    """
+    Writes sampled trajectories (.npz) on a background thread, off the
+    request path. At most max_pending recorders wait for the writer (each
+    holds up to TRAJECTORY_BUDGET_BYTES); the ones beyond are dropped.
+    """
+
+    def __init__(self, directory=TRAJECTORY_DIR, max_pending=TRAJECTORY_EXPORT_QUEUE):
+        self.directory = directory
+        self._pending = queue.Queue(max_pending)
+        threading.Thread(target=self._run, name="trajectory-export", daemon=True).start()
+
+    def submit(self, recorder):
+        """Queue a recorder for export; False if the queue is full"""
+        try:
+            self._pending.put_nowait(recorder)
+        except queue.Full:
+            logger.warning("Trajectory export queue full, dropping a recorded trajectory")
+            return False
+        return True
+
+    def join(self):
+        """Wait until every queued trajectory is written"""
+        self._pending.join()
+
+    def _run(self):
+        while True:
+            recorder = self._pending.get()
+            try:
+                self._write(recorder)
+            finally:
+                self._pending.task_done()
+
+    def _write(self, recorder):
+        """A failure is logged, never raised"""
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.npz")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            recorder.export(path)
+        except OSError as e:
+            logger.warning("Could not write trajectory %s: %s", path, e)
+            return
+        logger.info("Trajectory recorded to %s (%d profiles, %d dropped)", path, recorder.count, recorder.dropped)
+
 
 class PredictorService:
 
-    def __init__(self):
+    def __init__(self, backend=PREDICTOR_BACKEND):
         with open(XGB_MODEL_PATH, "rb") as f:
             self.model = pickle.load(f)
+        if XGBOOST_NTHREAD > 0:
+            self.model.set_params(n_jobs=XGBOOST_NTHREAD)
+
+        self.compiled = None
+        if backend == "compiled":
+            self.compiled = self._compile_model()
+
+        self.trajectory_exporter = TrajectoryExporter() if TRAJECTORY_SAMPLE_RATE > 0 else None
+
+    def _compile_model(self):
+        """
+        Compile the booster and check it against the original model on a
+        reference set. Falls back to the xgboost backend on any mismatch.
+        """
+        try:
+            compiled = CompiledTreeEnsemble(self.model)
+            ok, max_abs_error = validate(compiled, self.model)
+        except ValueError as e:
+            logger.warning("Compiled backend unavailable (%s), using xgboost predict", e)
+            return None
+
+        if not ok:
+            logger.warning("Compiled backend deviates from the model (max abs error %g), using xgboost predict",
+                           max_abs_error)
+            return None
+        return compiled
+
+    def simulation_params(self, req):
+        """CBPWin parameters of a request (flat, as calculate_recipe takes them)"""
+        return {
+            "temperature": req.recipe_temperature,
+            "carbon_flow": req.recipe_carbon_flow,
+            "carbon_max": req.recipe_carbon_max,
+            "carbon_min": 0.7*req.recipe_carbon_max,
+            "carbon_final": 0.69*req.recipe_carbon_max,
+            "target_depth": req.target_depth,
+            "eff_carbon": get_eff_carbon(req.hardness_value),
+            "steel_name": "Predicted Steel",
+            "initial_carbon": req.carbon_percentage
+        }
 
     def build_full_feature_row(self, req):
+        """
+        Full feature row as a single-row DataFrame (xgboost backend input)
+        """
+        return pd.DataFrame([self.build_full_features(req)])
+
+    def build_full_features(self, req, observers=()):
+        """
+        Run the CBPWin simulator for the request, then build the full feature
+        row (features_from_simulation)
+        (extra simulation observers can be attached, e.g. a ProfileRecorder)
+        """
+
+        # Build parameters for CBPWin
+        params = self.simulation_params(req)
+
+        # Run simulator
+        if SIMULATION_LOG:
+            observers = [BufferedLoggingObserver(), *observers]
+        recorder = None
+        if TRAJECTORY_SAMPLE_RATE > 0 and random.random() < TRAJECTORY_SAMPLE_RATE:
+            recorder = TrajectoryRecorder(every=TRAJECTORY_EVERY, budget_bytes=TRAJECTORY_BUDGET_BYTES)
+            observers = [recorder, *observers]
+        sim_results = calculate_recipe(params, observers)
+        if recorder is not None:
+            self.trajectory_exporter.submit(recorder)
+
+        return self.features_from_simulation(req, sim_results)
+
+    def features_from_simulation(self, req, sim_results):
         """
         Step 1: Create minimal input feature row (only your 9 inputs)
-        Step 2: Run CBPWin simulator to compute cbpwin_* features
+        Step 2: Convert the simulation results into cbpwin_* features
         """
 
         # === Step 1: Base input features ===
@@ -36,23 +198,7 @@ class PredictorService:
             "recipe_carbon_flow": req.recipe_carbon_flow,
         }
 
-        # === Step 2: Build parameters for CBPWin ===
-        params = {
-            "temperature": req.recipe_temperature,
-            "carbon_flow": req.recipe_carbon_flow,
-            "carbon_max": req.recipe_carbon_max,
-            "carbon_min": 0.7*req.recipe_carbon_max,
-            "carbon_final": 0.69*req.recipe_carbon_max,
-            "target_depth": req.target_depth,
-            "eff_carbon": get_eff_carbon(req.hardness_value),
-            "steel_name": "Predicted Steel",
-            "initial_carbon": req.carbon_percentage
-        }
-
-        # Run simulator
-        sim_results = calculate_recipe(params)
-
-        # Convert into cbpwin features
+        # === Step 2: Convert into cbpwin features ===
         modified_results = [(r[0], r[1]) for r in sim_results[:-1]]
         modified_results.append((sim_results[-1][0], sim_results[-1][1], sim_results[-1][2]))
 
@@ -73,27 +219,105 @@ class PredictorService:
         # Merge base + cbpwin features
         full_features = {**input_features, **renames_features}
 
-        return pd.DataFrame([full_features])
+        return full_features
 
-    def predict(self, req):
+    def predict(self, req, observers=()):
         """
         Returns: predicted Y + reconstructed recipe
         """
-        X = self.build_full_feature_row(req)
+        features = self.build_full_features(req, observers)
 
-        # Predict the 8 regression targets
-        y_pred = self.model.predict(X)[0]
-
-        output_names = [
-            'res_first_carb', 'res_first_diff', 'res_second_carb', 'res_second_diff',
-            'res_last_carb', 'res_last_diff', 'res_final_time', 'res_num_cycles', 'total_carb_time', 'total_diff_time'
-        ]
+        # Predict the regression targets
+        if self.compiled is not None:
+            y_pred = self.compiled.predict_row([features[name] for name in self.compiled.feature_names])
+        else:
+            y_pred = self.model.predict(pd.DataFrame([features]))[0]
 
         predicted_features = {
-            name: float(y_pred[i]) for i, name in enumerate(output_names)
+            name: float(y_pred[i]) for i, name in enumerate(OUTPUT_NAMES)
         }
 
         # Reconstruct recipe
         reconstructed = reconstruct_recipe(predicted_features)
 
         return predicted_features, reconstructed
+
+    def refine(self, req, recipe, tolerance_mm=DEFAULT_TOLERANCE, max_iterations=DEFAULT_MAX_ITERATIONS):
+        """
+        Closed-loop refinement of a reconstructed recipe: simulate it as is,
+        then correct the last cycle until the depth is within tolerance_mm
+        of the target (see utils/cbpwin_refine.py).
+        """
+        result = refine_recipe(build_process_params(self.simulation_params(req)), recipe,
+                               tolerance_mm, max_iterations)
+        return {
+            "refined_recipe": result["recipe"],
+            "raw_depth": result["raw_depth"],
+            "refined_depth": result["depth"],
+            "iterations": result["iterations"],
+            "converged": result["converged"],
+        }
+
+    def _predict_rows(self, rows):
+        """One model call for many feature rows: (rows, outputs) array"""
+        if self.compiled is not None:
+            X = np.array([[row[name] for name in self.compiled.feature_names] for row in rows], dtype=np.float32)
+            return self.compiled.predict(X)
+        return np.asarray(self.model.predict(pd.DataFrame(rows))).reshape(len(rows), -1)
+
+    def predict_batch(self, reqs):
+        """
+        Predict many requests with a single model call.
+        Returns columns: one float array per output + the reconstructed recipes.
+        """
+        rows = [self.build_full_features(req) for req in reqs]
+        y_pred = self._predict_rows(rows)
+
+        columns = {name: y_pred[:, i].astype(np.float64) for i, name in enumerate(OUTPUT_NAMES)}
+        columns["reconstructed_recipe"] = [
+            reconstruct_recipe({name: float(columns[name][k]) for name in OUTPUT_NAMES})
+            for k in range(len(rows))
+        ]
+        return columns
+
+    def sensitivity(self, req, inputs=SENSITIVITY_INPUTS, relative_step=DEFAULT_RELATIVE_STEP, steps=None,
+                    method="central"):
+        """
+        Finite-difference derivatives of every output with respect to `inputs`
+        around `req`. Each input moves by steps[name] when given, else by
+        relative_step * |value|; "central" uses value +- h, "forward" value + h.
+
+        All the perturbed cases are simulated as one batch (calculate_recipes:
+        target_depth moves reuse the base trajectory, the other ones run in
+        parallel on the simulation pool) and predicted with one model call.
+        """
+        steps = steps or {}
+        cases = [req]
+        offsets = {}
+        for name in inputs:
+            value = getattr(req, name)
+            h = steps.get(name) or relative_step * (abs(value) or 1.0)
+            offsets[name] = (h, len(cases))
+            cases.append(req.model_copy(update={name: value + h}))
+            if method == "central":
+                cases.append(req.model_copy(update={name: value - h}))
+
+        sim_results = calculate_recipes([self.simulation_params(case) for case in cases])
+        y_pred = self._predict_rows([self.features_from_simulation(case, results)
+                                     for case, results in zip(cases, sim_results)]).astype(np.float64)
+
+        sensitivities = {}
+        for name, (h, k) in offsets.items():
+            if method == "central":
+                derivatives = (y_pred[k] - y_pred[k + 1]) / (2 * h)
+            else:
+                derivatives = (y_pred[k] - y_pred[0]) / h
+            sensitivities[name] = {output: float(derivatives[i]) for i, output in enumerate(OUTPUT_NAMES)}
+
+        predicted_features = {name: float(y_pred[0][i]) for i, name in enumerate(OUTPUT_NAMES)}
+        return {
+            "predicted_features": predicted_features,
+            "reconstructed_recipe": reconstruct_recipe(predicted_features),
+            "steps": {name: h for name, (h, _) in offsets.items()},
+            "sensitivities": sensitivities,
+        }
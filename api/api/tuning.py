@@ -0,0 +1,49 @@
+"""
+Host tuning config written by `python -m api.autotune` and read by
+`python -m api.serve` at startup.
+
+The file holds the recommended settings as environment variables, plus the
+measurements they were chosen from. The settings are applied as defaults:
+a variable already set in the environment always wins.
+"""
+
+import json
+import logging
+import os
+
+TUNING_CONFIG_PATH = os.environ.get("TUNING_CONFIG_PATH", "tuning.json")
+
+# Settings searched by the autotuner
+TUNED_SETTINGS = ("WEB_CONCURRENCY", "XGBOOST_NTHREAD")
+
+logger = logging.getLogger(__name__)
+
+
+def load_tuning(path=TUNING_CONFIG_PATH):
+    """Recommended settings of the config file, {} when there is none (or path is empty)"""
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring tuning config %s: %s", path, e)
+        return {}
+    settings = config.get("settings", {})
+    return {name: str(settings[name]) for name in TUNED_SETTINGS if name in settings}
+
+
+def apply_tuning(path=TUNING_CONFIG_PATH):
+    """
+    Export the tuned settings that the environment does not set already.
+    Must run before the api modules are imported (they read their settings
+    at import time). Returns the settings actually applied.
+    """
+    applied = {}
+    for name, value in load_tuning(path).items():
+        if name not in os.environ:
+            os.environ[name] = value
+            applied[name] = value
+    return applied
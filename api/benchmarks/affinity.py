@@ -0,0 +1,182 @@
+"""
+Simulation cache hit rate across several API replicas, measured locally:
+
+    python -m benchmarks.affinity [--replicas 3] [--requests 600] [--cache-size 24] [--fail-over]
+
+Starts --replicas uvicorn processes (api.main:app, job workers off), each
+with a simulation cache of --cache-size entries, then replays the same
+workload twice on fresh replicas: once with each request sent to a random
+replica, once through the cache-affinity proxy (api.proxy). The workload
+draws trajectories from a skewed popularity distribution with a few target
+depths per trajectory, like repeated quotes for the same furnace settings.
+
+--fail-over stops one replica halfway through the proxied run; the proxy
+must keep answering every request by moving its keys to the next replica.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import uvicorn
+
+TEMPERATURES = [900, 920, 940, 960]
+CARBON_MAX = [1.1, 1.2, 1.3]
+CARBON_FLOWS = [10, 12, 14]
+CARBON_PERCENTAGES = [0.18, 0.2]
+TARGET_DEPTHS = [0.4, 0.5, 0.6]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(port, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Replica on port {port} did not start")
+
+
+def _start_replicas(count, cache_size):
+    env = dict(os.environ, JOB_WORKERS="0", SIMULATION_CACHE_SIZE=str(cache_size), SIMULATION_LOG="0")
+    replicas = []
+    for _ in range(count):
+        port = _free_port()
+        env["JOB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.db")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+            env=dict(env)
+        )
+        replicas.append((port, process))
+    for port, _ in replicas:
+        _wait_healthy(port)
+    return replicas
+
+
+def _stop_replicas(replicas):
+    for _, process in replicas:
+        if process.poll() is None:
+            process.terminate()
+    for _, process in replicas:
+        process.wait()
+
+
+def _cache_stats(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/health")
+    return json.loads(conn.getresponse().read())["simulation_cache"]
+
+
+def _workload(requests, seed):
+    rng = random.Random(seed)
+    trajectories = [
+        (t, c, f, p) for t in TEMPERATURES for c in CARBON_MAX for f in CARBON_FLOWS for p in CARBON_PERCENTAGES
+    ]
+    rng.shuffle(trajectories)
+    weights = [1.0 / (rank + 1) for rank in range(len(trajectories))]
+    workload = []
+    for temperature, carbon_max, flow, percentage in rng.choices(trajectories, weights, k=requests):
+        workload.append({
+            "hardness_value": 550, "target_depth": rng.choice(TARGET_DEPTHS), "load_weight": 100,
+            "weight": 1, "is_weight_unknown": 0, "recipe_temperature": temperature,
+            "recipe_carbon_max": carbon_max, "recipe_carbon_flow": flow, "carbon_percentage": percentage,
+        })
+    return workload
+
+
+def _post(conn, body):
+    conn.request("POST", "/predict", json.dumps(body), {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def _run(workload, send, replicas, fail_over=False):
+    errors = 0
+    start = time.perf_counter()
+    for i, body in enumerate(workload):
+        if fail_over and i == len(workload) // 2:
+            replicas[0][1].terminate()
+            replicas[0][1].wait()
+        if send(body) != 200:
+            errors += 1
+    elapsed = time.perf_counter() - start
+
+    hits = misses = 0
+    for port, process in replicas:
+        if process.poll() is None:
+            stats = _cache_stats(port)
+            hits += stats["hits"]
+            misses += stats["misses"]
+    return {"hit_rate": hits / max(1, hits + misses), "ms_per_request": elapsed / len(workload) * 1e3,
+            "errors": errors, "counted": hits + misses}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--cache-size", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fail-over", action="store_true", help="stop one replica halfway (proxied run)")
+    args = parser.parse_args()
+
+    workload = _workload(args.requests, args.seed)
+    results = {}
+
+    # Random routing (what a plain round-robin / random balancer does to the caches)
+    replicas = _start_replicas(args.replicas, args.cache_size)
+    connections = [http.client.HTTPConnection("127.0.0.1", port) for port, _ in replicas]
+    rng = random.Random(args.seed)
+    try:
+        results["random"] = _run(workload, lambda body: _post(rng.choice(connections), body), replicas)
+    finally:
+        _stop_replicas(replicas)
+
+    # Consistent hashing through the proxy
+    replicas = _start_replicas(args.replicas, args.cache_size)
+    os.environ["API_REPLICAS"] = ",".join(f"http://127.0.0.1:{port}" for port, _ in replicas)
+    os.environ["PROXY_HEALTH_INTERVAL"] = "0.5"
+    from api.proxy import app
+
+    proxy_port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=proxy_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    proxy_conn = http.client.HTTPConnection("127.0.0.1", proxy_port)
+    try:
+        results["affinity"] = _run(workload, lambda body: _post(proxy_conn, body), replicas, args.fail_over)
+    finally:
+        server.should_exit = True
+        _stop_replicas(replicas)
+
+    print(f"{args.requests} requests, {args.replicas} replicas, cache of {args.cache_size} trajectories each"
+          + (", one replica stopped halfway (affinity)" if args.fail_over else ""))
+    print(f"{'routing':<10} {'hit rate':>9} {'ms/request':>11} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['hit_rate']:>9.1%} {result['ms_per_request']:>11.1f} {result['errors']:>7}")
+    if args.fail_over:
+        print("(affinity hit rate counts the surviving replicas only)")
+
+
+if __name__ == "__main__":
+    main()
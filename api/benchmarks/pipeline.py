@@ -0,0 +1,67 @@
+"""
+Pipelined final phases against the sequential simulation, measured locally:
+
+    python -m benchmarks.pipeline [--pool-sizes 1,2,4] [--repeat 3]
+
+Runs every case of the standard corpus (utils/cbpwin_compare.py) with
+run_automatic_simulation, then with run_pipelined_simulation on a spawn
+process pool of each size (max_in_flight = 2 x the pool size, as in
+calculate_recipe). Prints the best time of --repeat runs, the speedup, and
+how far the pipelined results are from the sequential ones. The pool is
+started and warmed up before timing.
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.cbpwin import CBPWinSimulatorExact
+from utils.cbpwin_compare import STANDARD_CORPUS
+
+
+def _best_time(run, repeat):
+    best, results = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", type=_int_list, default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    sequential = [_best_time(lambda: CBPWinSimulatorExact().run_automatic_simulation(params), args.repeat)
+                  for params in STANDARD_CORPUS]
+
+    for pool_size in args.pool_sizes:
+        with ProcessPoolExecutor(pool_size, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(abs, range(pool_size)))
+            print(f"\npool of {pool_size}")
+            print(f"{'case':>4} {'sequential':>11} {'pipelined':>10} {'speedup':>8} {'cycles':>7} "
+                  f"{'max |ddepth|':>13} {'max |dfinal|':>13}")
+            for case, (params, (seq_time, seq_results)) in enumerate(zip(STANDARD_CORPUS, sequential)):
+                pipe_time, pipe_results = _best_time(
+                    lambda: CBPWinSimulatorExact().run_pipelined_simulation(params, pool, 2 * pool_size),
+                    args.repeat
+                )
+                same_cycles = len(pipe_results) == len(seq_results)
+                depth_gap = max(abs(a[3] - b[3]) for a, b in zip(seq_results, pipe_results))
+                final_gap = max(abs(a[2] - b[2]) for a, b in zip(seq_results, pipe_results))
+                print(f"{case:>4} {seq_time:>10.2f}s {pipe_time:>9.2f}s {seq_time / pipe_time:>7.2f}x "
+                      f"{'same' if same_cycles else 'DIFF':>7} {depth_gap:>13.1e} {final_gap:>12.0f}s")
+
+
+if __name__ == "__main__":
+    main()
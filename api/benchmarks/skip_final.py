@@ -0,0 +1,68 @@
+"""
+Exactness of skip_final_phase on a random grid, measured locally:
+
+    python -m benchmarks.skip_final [--cases 60] [--seed 0]
+
+Draws --cases process parameters (temperature, carbon flow, carbon max,
+target depth, initial carbon, hardness), simulates each with and without
+skip_final_phase, resolves the skipped final phases, and counts the cases
+whose cycle times differ from the exact engine, then those whose last
+final time (the cbpwin_final_time model feature) differs. Also prints the
+largest depth gap and the share of final-phase seconds skipped.
+"""
+
+import argparse
+import random
+
+from utils.cbpwin import CBPWinSimulatorExact
+from utils.util import build_process_params, get_eff_carbon
+
+
+def random_case(rng):
+    carbon_max = rng.choice([1.1, 1.2, 1.3, 1.4, 1.5, 1.6, 1.8])
+    return {
+        "temperature": rng.choice([880, 900, 920, 940, 960, 980]),
+        "carbon_flow": rng.uniform(8.0, 16.0),
+        "carbon_max": carbon_max,
+        "carbon_min": 0.7 * carbon_max,
+        "carbon_final": 0.69 * carbon_max,
+        "target_depth": rng.uniform(0.3, 1.8),
+        "eff_carbon": get_eff_carbon(rng.choice([513, 550, 600, 650, 700])),
+        "initial_carbon": rng.choice([0.14, 0.16, 0.18, 0.2, 0.22]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    times_differ = last_final_differ = 0
+    depth_gap = 0.0
+    final_seconds = skipped_seconds = 0.0
+    for case in range(args.cases):
+        params = build_process_params(random_case(rng))
+        exact = CBPWinSimulatorExact().run_automatic_simulation(params)
+        engine = CBPWinSimulatorExact()
+        skipped = engine.run_automatic_simulation({**params, "skip_final_phase": True})
+        resolved = engine.resolve_skipped_results(skipped)
+
+        final_seconds += sum(result[2] for result in resolved)
+        skipped_seconds += sum(result[2] for result, raw in zip(resolved, skipped) if raw[2] is None)
+        depth_gap = max([depth_gap] + [abs(x[3] - y[3]) for x, y in zip(exact, resolved)])
+        if len(exact) != len(resolved) or any(x[:3] != y[:3] for x, y in zip(exact, resolved)):
+            times_differ += 1
+            print(f"case {case}: {len(exact)} vs {len(resolved)} cycles, "
+                  f"last final {exact[-1][2]:.0f} vs {resolved[-1][2]:.0f} s")
+        if exact[-1][2] != resolved[-1][2]:
+            last_final_differ += 1
+
+    print(f"\n{times_differ}/{args.cases} cases with a cycle time different from the exact engine, "
+          f"{last_final_differ}/{args.cases} on the last final time; max depth gap {depth_gap:.1e} mm; "
+          f"{skipped_seconds / final_seconds:.0%} of the final-phase seconds skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Per-call overhead of the prediction transports, measured locally:
+
+    python -m benchmarks.transport [--calls 2000] [--real]
+
+By default the predictor is replaced by a stub that returns a fixed answer,
+so the numbers are the transport cost alone: HTTP/JSON + pydantic with a
+new TCP connection per call (what axios does without a keep-alive agent),
+HTTP/JSON on a kept-alive connection, and the binary protocol on a Unix
+socket, sequential and pipelined. --real uses the trained model instead.
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+import api.routers.predict as predict_module
+from api.services.binary_transport import BinaryPredictClient, BinaryPredictServer
+
+REQUEST = {
+    "hardness_value": 550, "target_depth": 0.6, "load_weight": 100, "weight": 1, "is_weight_unknown": 0,
+    "recipe_temperature": 940, "recipe_carbon_max": 1.3, "recipe_carbon_flow": 12, "carbon_percentage": 0.2,
+}
+
+
+class StubPredictor:
+    """Fixed answer, the size of a real one"""
+
+    def __init__(self):
+        self.answer = (
+            {name: 100.0 + i for i, name in enumerate(predict_module.OUTPUT_NAMES)},
+            [[60, 120]] * 11 + [[60, 120, 300]],
+        )
+
+    def predict(self, req, observers=()):
+        return self.answer
+
+
+def _start_http(port):
+    app = FastAPI()
+    app.include_router(predict_module.router)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _start_binary(predictor, path):
+    loop = asyncio.new_event_loop()
+    server = BinaryPredictServer(predictor, path)
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    return server, loop
+
+
+def _time_calls(call, calls):
+    call()  # warm-up
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(name, timings):
+    timings = sorted(timings)
+    p99 = timings[int(0.99 * (len(timings) - 1))]
+    print(f"{name:<36} {statistics.mean(timings) * 1e6:9.1f} {timings[len(timings) // 2] * 1e6:9.1f} "
+          f"{p99 * 1e6:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--real", action="store_true", help="use the trained model instead of the stub")
+    args = parser.parse_args()
+
+    predictor = predict_module.predictor if args.real else StubPredictor()
+    predict_module.predictor = predictor
+    body = json.dumps(REQUEST)
+    headers = {"Content-Type": "application/json"}
+
+    _start_http(args.port)
+    socket_path = os.path.join(tempfile.mkdtemp(), "predict.sock")
+    binary_server, loop = _start_binary(predictor, socket_path)
+
+    def http_new_connection():
+        conn = http.client.HTTPConnection("127.0.0.1", args.port)
+        conn.request("POST", "/predict", body, headers)
+        json.loads(conn.getresponse().read())
+        conn.close()
+
+    keepalive = http.client.HTTPConnection("127.0.0.1", args.port)
+
+    def http_keepalive():
+        keepalive.request("POST", "/predict", body, headers)
+        json.loads(keepalive.getresponse().read())
+
+    client = BinaryPredictClient(socket_path)
+    pipelined_batch = 32
+
+    print(f"{'transport (us per call)':<36} {'mean':>9} {'p50':>9} {'p99':>9}")
+    _report("HTTP/JSON, new connection", _time_calls(http_new_connection, args.calls))
+    _report("HTTP/JSON, keep-alive", _time_calls(http_keepalive, args.calls))
+    _report("binary, unix socket", _time_calls(lambda: client.predict(REQUEST), args.calls))
+    batch_timings = _time_calls(lambda: client.predict_many([REQUEST] * pipelined_batch),
+                                max(1, args.calls // pipelined_batch))
+    _report(f"binary, pipelined x{pipelined_batch}", [t / pipelined_batch for t in batch_timings])
+
+    client.close()
+    keepalive.close()
+    asyncio.run_coroutine_threadsafe(binary_server.stop(), loop).result()
+
+
+if __name__ == "__main__":
+    main()
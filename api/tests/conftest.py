@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The api and utils packages are imported from the api/ directory, as in the service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# No job workers and a throw-away queue file if a test starts the app
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("JOB_DB_PATH", os.path.join(tempfile.mkdtemp(), "jobs.db"))
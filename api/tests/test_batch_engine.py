@@ -0,0 +1,32 @@
+import pytest
+
+from utils.cbpwin import CBPWinSimulatorExact
+from utils.cbpwin_batch import CBPWinBatchSimulator, run_batch
+from utils.cbpwin_compare import STANDARD_CORPUS
+
+
+@pytest.fixture(scope="module")
+def exact():
+    return [CBPWinSimulatorExact().run_automatic_simulation(params) for params in STANDARD_CORPUS]
+
+
+def test_float64_matches_the_exact_engine_bit_for_bit(exact):
+    batch = run_batch(STANDARD_CORPUS, 'float64')
+    assert batch.results == exact
+    assert not any(batch.ambiguous)
+
+
+def test_float32_keeps_cycle_counts(exact):
+    batch = run_batch(STANDARD_CORPUS, 'float32')
+    assert [len(results) for results in batch.results] == [len(results) for results in exact]
+    # Rechecked rows are exact, the others within the ambiguity margin
+    for i, (results, reference) in enumerate(zip(batch.results, exact)):
+        if i in batch.rechecked:
+            assert results == reference
+        else:
+            assert abs(results[-1][3] - reference[-1][3]) < 0.0005
+
+
+def test_unknown_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        CBPWinBatchSimulator('float16')
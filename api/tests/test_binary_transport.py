@@ -0,0 +1,108 @@
+import asyncio
+import struct
+import threading
+import time
+
+import pytest
+
+from api.services.binary_transport import (
+    HEADER, MAX_FRAME_LENGTH, MSG_PREDICT, STATUS_INVALID, STATUS_OK,
+    BinaryPredictServer, decode_response, encode_request,
+)
+from api.services.predictor import OUTPUT_NAMES
+
+# REQUEST_FIELDS order
+VALUES = [550, 0.6, 100, 1, 0, 950, 1.8, 14, 0.2]
+
+
+class StubPredictor:
+    def predict(self, req):
+        return {name: 1.0 for name in OUTPUT_NAMES}, [[60, 120, 30]]
+
+
+class SlowPredictor(StubPredictor):
+    """Records the largest number of predictions running at the same time"""
+
+    def __init__(self):
+        self.running = self.peak = 0
+        self._lock = threading.Lock()
+
+    def predict(self, req):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        with self._lock:
+            self.running -= 1
+        return super().predict(req)
+
+
+async def _exchange(path, payload, responses=1, predictor=None, **server_options):
+    """Send raw bytes, return the (request id, status, body) of the responses"""
+    server = BinaryPredictServer(predictor or StubPredictor(), path, **server_options)
+    assert await server.start()
+    try:
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(payload)
+        writer.write_eof()
+        await writer.drain()
+        answers = []
+        for _ in range(responses):
+            (length,) = struct.unpack("<I", await reader.readexactly(4))
+            frame = await reader.readexactly(length)
+            request_id, status = struct.unpack_from("<IB", frame, 0)
+            answers.append((request_id, status, frame[HEADER.size - 4:]))
+        writer.close()
+        return answers
+    finally:
+        await server.stop()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "predict.sock")
+
+
+def test_predict_round_trip(path):
+    [(request_id, status, body)] = asyncio.run(_exchange(path, encode_request(7, VALUES)))
+    assert (request_id, status) == (7, STATUS_OK)
+    predicted, recipe = decode_response(status, body)
+    assert recipe == [[60, 120, 30]]
+    assert predicted == {name: 1.0 for name in OUTPUT_NAMES}
+
+
+@pytest.mark.parametrize("frame, request_id", [
+    (b"\x01\x02", 0),                                           # no request id
+    (struct.pack("<I", 5), 5),                                  # no message type
+    (struct.pack("<IB", 3, MSG_PREDICT) + b"\x00" * 8, 3),      # short body
+    (struct.pack("<IB", 4, 9) + b"\x00" * 72, 4),               # unknown type
+])
+def test_malformed_frames_are_invalid(path, frame, request_id):
+    payload = struct.pack("<I", len(frame)) + frame + encode_request(8, VALUES)
+    answers = sorted(asyncio.run(_exchange(path, payload, responses=2)))
+    assert answers[0][:2] == (request_id, STATUS_INVALID)
+    # The connection keeps serving the next frame
+    assert answers[1][:2] == (8, STATUS_OK)
+
+
+def test_truncated_frame_is_invalid(path):
+    payload = encode_request(9, VALUES)[:-10]
+    [(request_id, status, _)] = asyncio.run(_exchange(path, payload))
+    assert (request_id, status) == (9, STATUS_INVALID)
+
+
+def test_oversized_length_prefix_is_invalid(path):
+    payload = struct.pack("<I", MAX_FRAME_LENGTH + 1) + b"\x00" * 16
+    [(request_id, status, body)] = asyncio.run(_exchange(path, payload))
+    assert (request_id, status) == (0, STATUS_INVALID)
+    assert b"exceeds" in body
+
+
+def test_in_flight_requests_are_capped_per_connection(path):
+    predictor = SlowPredictor()
+    payload = b"".join(encode_request(request_id, VALUES) for request_id in range(1, 9))
+    answers = asyncio.run(_exchange(path, payload, responses=8, predictor=predictor, max_in_flight=2))
+
+    assert sorted(request_id for request_id, _, _ in answers) == list(range(1, 9))
+    assert all(status == STATUS_OK for _, status, _ in answers)
+    assert predictor.peak == 2
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from api.models import PredictBatchRequest
+from api.services.columnar import ListColumn, columnar_response, negotiate, pack_columns, unpack_columns
+
+pa = pytest.importorskip("pyarrow")
+
+COLUMNS = {"depth": np.array([0.5, 0.6]), "step": [0, 1]}
+
+
+def test_empty_batch_is_rejected():
+    with pytest.raises(ValidationError):
+        PredictBatchRequest(items=[])
+
+
+@pytest.mark.parametrize("accept, fmt", [
+    (None, "json"),
+    ("*/*", "json"),
+    ("application/vnd.apache.arrow.stream", "arrow"),
+    ("application/vnd.apache.arrow.file", "arrow_file"),
+    ("application/json;q=0.5, application/vnd.apache.parquet", "parquet"),
+])
+def test_negotiate(accept, fmt):
+    assert negotiate(accept) == fmt
+
+
+def test_unsupported_media_type():
+    with pytest.raises(HTTPException) as e:
+        negotiate("text/csv")
+    assert e.value.status_code == 406
+
+
+def test_arrow_file_is_an_ipc_file():
+    response = columnar_response(COLUMNS, negotiate("application/vnd.apache.arrow.file"))
+    assert response.media_type == "application/vnd.apache.arrow.file"
+    table = pa.ipc.open_file(pa.BufferReader(response.body)).read_all()
+    assert table.column("depth").to_pylist() == [0.5, 0.6]
+
+
+def test_arrow_stream_is_an_ipc_stream():
+    response = columnar_response(COLUMNS, negotiate("application/vnd.apache.arrow.stream"))
+    assert response.media_type == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(pa.BufferReader(response.body)).read_all()
+    assert table.column("step").to_pylist() == [0, 1]
+
+
+def test_packed_columns_round_trip():
+    recipes = [[[60, 120], [55, 300, 600]], [], [[70, 0, 900]]]
+    columns = unpack_columns(pack_columns({"depth": np.array([0.5, 0.6, 0.7]), "step": [0, 1, 2],
+                                           "recipe": recipes}))
+
+    assert columns["depth"].tolist() == [0.5, 0.6, 0.7]
+    assert columns["step"].dtype.kind == "i"
+    assert isinstance(columns["recipe"], ListColumn)
+    assert columns["recipe"].tolist() == recipes
+
+    response = columnar_response(columns, "arrow")
+    table = pa.ipc.open_stream(pa.BufferReader(response.body)).read_all()
+    assert table.column("recipe").to_pylist() == recipes
@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+xgboost = pytest.importorskip("xgboost")
+
+from api.services.compiled_model import CompiledTreeEnsemble, reference_rows, validate
+
+
+@pytest.fixture(scope="module")
+def model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, 6)).astype(np.float32), columns=[f"f{i}" for i in range(6)])
+    y = np.column_stack([X["f0"] * 2 + X["f1"], np.sin(X["f2"]) - X["f3"] * X["f4"], X["f5"] ** 2])
+    regressor = xgboost.XGBRegressor(n_estimators=30, max_depth=4, tree_method="hist")
+    regressor.fit(X, y)
+    return regressor
+
+
+def _native(model, X, names):
+    return np.asarray(model.predict(pd.DataFrame(X, columns=names))).reshape(len(X), -1)
+
+
+def test_matches_native_booster(model):
+    compiled = CompiledTreeEnsemble(model)
+    ok, max_abs_error = validate(compiled, model)
+    assert ok, max_abs_error
+    X = reference_rows(compiled, n_rows=64, seed=1)
+    np.testing.assert_allclose(compiled.predict(X), _native(model, X, compiled.feature_names), rtol=1e-5, atol=1e-4)
+
+
+def test_results_are_not_overwritten_by_later_calls(model):
+    compiled = CompiledTreeEnsemble(model)
+    X = reference_rows(compiled, n_rows=2, seed=2)
+    first = compiled.predict_row(X[0])
+    expected = first.copy()
+    compiled.predict_row(X[1])
+    compiled.predict(X)
+    np.testing.assert_array_equal(first, expected)
+
+
+def test_concurrent_calls_match_native_booster(model):
+    compiled = CompiledTreeEnsemble(model)
+    X = reference_rows(compiled, n_rows=32, seed=3)
+    expected = _native(model, X, compiled.feature_names)
+    mismatches = []
+    barrier = threading.Barrier(8)
+
+    def worker(offset):
+        barrier.wait()
+        for call in range(300):
+            k = (offset + call) % len(X)
+            if call % 3 == 0:
+                got = compiled.predict(X[k:k + 4])
+                want = expected[k:k + 4]
+            else:
+                got = compiled.predict_row(X[k])
+                want = expected[k]
+            if not np.allclose(got, want, rtol=1e-5, atol=1e-4):
+                mismatches.append((offset, call))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert mismatches == []
@@ -0,0 +1,14 @@
+from utils.cbpwin_compare import STANDARD_CORPUS
+from utils.cbpwin_graded import CBPWinSimulatorGraded
+
+
+def test_initialize_resets_per_run_state():
+    engine = CBPWinSimulatorGraded()
+    engine.run_automatic_simulation(STANDARD_CORPUS[0])
+    # Left over by a previous run on the instance
+    engine.skipped_final_steps[3] = (list(engine.layer_array), engine.current_layer_max)
+
+    engine.initialize_simulation(STANDARD_CORPUS[1])
+    assert engine.skipped_final_steps == {}
+    assert engine.current_step == 0
+    assert engine.current_total_time == 0.0
@@ -0,0 +1,22 @@
+from utils.cbpwin import CBPWinSimulatorExact
+from utils.cbpwin_compare import STANDARD_CORPUS
+from utils.cbpwin_implicit import MAX_PHASE_STEPS, CBPWinSimulatorImplicit
+
+
+def test_unreachable_threshold_stops():
+    engine = CBPWinSimulatorImplicit()
+    engine.initialize_simulation({'steel': {'initial_carbon': 0.2}})
+    engine.calc_layers_carburizing(1.2)
+
+    # The surface never drops below the initial carbon
+    duration = engine.calc_layers_final(0.1)
+    assert 0 < duration <= MAX_PHASE_STEPS * engine.time_step
+    assert engine.layer_array[0] > 0.1
+
+
+def test_keeps_the_cycle_count():
+    params = STANDARD_CORPUS[1]
+    exact = CBPWinSimulatorExact().run_automatic_simulation(params)
+    approx = CBPWinSimulatorImplicit().run_automatic_simulation(params)
+    assert len(approx) == len(exact)
+    assert abs(approx[-1][3] - exact[-1][3]) < 0.015
@@ -0,0 +1,167 @@
+import time
+
+import pytest
+
+from api.services.jobs import (
+    PRIORITIES, STATUS_CANCELLED, STATUS_QUEUED, STATUS_RUNNING, SWEEP_MAX_POINTS, JobQueue, _claim_next,
+    _connect, _run_sweep,
+)
+from utils.util import calculate_recipe
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(db_path=str(tmp_path / "jobs.db"))
+
+
+def _claim(queue, max_priority=10, lease_seconds=60):
+    conn = _connect(queue.db_path)
+    try:
+        return _claim_next(conn, max_priority, lease_seconds)
+    finally:
+        conn.close()
+
+
+def test_interactive_jobs_are_claimed_first(queue):
+    bulk = [queue.submit("simulate", {"n": i}, "bulk") for i in range(2)]
+    interactive = [queue.submit("simulate", {"n": i}, "interactive") for i in range(2)]
+
+    assert queue.get(bulk[0])["queue_position"] == 2
+    assert queue.get(interactive[1])["queue_position"] == 1
+    claimed = [_claim(queue)["id"] for _ in range(4)]
+    assert claimed == interactive + bulk
+
+
+def test_interactive_workers_never_claim_bulk_jobs(queue):
+    queue.submit("simulate", {}, "bulk")
+    assert _claim(queue, max_priority=PRIORITIES["interactive"]) is None
+    job_id = queue.submit("simulate", {}, "interactive")
+    assert _claim(queue, max_priority=PRIORITIES["interactive"])["id"] == job_id
+
+
+def test_cancelled_job_is_not_claimed(queue):
+    job_id = queue.submit("simulate", {})
+    assert queue.cancel(job_id)
+    assert queue.get(job_id)["status"] == STATUS_CANCELLED
+    assert _claim(queue) is None
+    assert not queue.cancel(job_id)
+
+
+def test_unknown_kind_or_priority_is_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit("unknown", {})
+    with pytest.raises(ValueError):
+        queue.submit("simulate", {}, "urgent")
+
+
+def test_running_job_is_not_reclaimed_by_another_process(queue):
+    job_id = queue.submit("simulate", {})
+    assert _claim(queue)["id"] == job_id
+
+    # Another uvicorn worker importing the app, then claiming
+    JobQueue(db_path=queue.db_path)
+    assert queue.get(job_id)["status"] == STATUS_RUNNING
+    assert _claim(queue) is None
+
+
+def test_expired_lease_goes_back_to_the_queue(queue):
+    job_id = queue.submit("simulate", {})
+    first = _claim(queue)
+    time.sleep(0.01)
+
+    second = _claim(queue, lease_seconds=0)
+    assert second["id"] == job_id
+    assert second["started_at"] > first["started_at"]
+
+    # The first claim can no longer complete the job
+    conn = _connect(queue.db_path)
+    try:
+        cur = conn.execute(
+            "UPDATE jobs SET status = 'done' WHERE id = ? AND status = ? AND started_at = ?",
+            (job_id, STATUS_RUNNING, first["started_at"])
+        )
+    finally:
+        conn.close()
+    assert cur.rowcount == 0
+
+
+def test_job_of_a_stopped_server_is_requeued(queue):
+    job_id = queue.submit("simulate", {})
+    _claim(queue)
+    conn = _connect(queue.db_path)
+    try:
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 3600, job_id))
+    finally:
+        conn.close()
+
+    assert _claim(queue)["id"] == job_id
+    assert queue.get(job_id)["status"] == STATUS_RUNNING
+    assert queue.get(queue.submit("simulate", {}))["status"] == STATUS_QUEUED
+
+
+def test_worker_runs_a_job(queue):
+    queue.start_workers(workers=1, interactive_workers=0)
+    try:
+        job_id = queue.submit("simulate", {"target_depth": 0.4})
+        deadline = time.time() + 60
+        while queue.get(job_id)["status"] in (STATUS_QUEUED, STATUS_RUNNING) and time.time() < deadline:
+            time.sleep(0.1)
+    finally:
+        queue.stop_workers()
+
+    job = queue.get(job_id)
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["steps"][-1][3] >= 0.4
+
+
+def test_status_leaves_out_columnar_results(queue):
+    from api.routers.jobs import _job_response
+
+    job_id = queue.submit("sweep", {"grid": {"target_depth": [0.4]}})
+    conn = _connect(queue.db_path)
+    try:
+        conn.execute("UPDATE jobs SET status = 'done', result = ? WHERE id = ?",
+                     ('{"columns": {"depth": [0.4]}}', job_id))
+    finally:
+        conn.close()
+
+    response = _job_response(queue.get(job_id))
+    assert response.result is None
+    assert response.result_url == f"/jobs/{job_id}/result"
+
+
+def test_sweep_columns_are_arrays():
+    columns = _run_sweep({"grid": {"target_depth": [0.3, 0.4]}})["columns"]
+
+    expected = [calculate_recipe({"target_depth": depth}) for depth in (0.3, 0.4)]
+    assert columns["point"].tolist() == [0] * len(expected[0]) + [1] * len(expected[1])
+    assert columns["step"].tolist() == list(range(len(expected[0]))) + list(range(len(expected[1])))
+    assert columns["depth"].tolist() == [step[3] for results in expected for step in results]
+
+
+def test_failed_job_reports_a_short_error(queue):
+    queue.start_workers(workers=1, interactive_workers=0)
+    try:
+        job_id = queue.submit("sweep", {"grid": {"target_depth": list(range(SWEEP_MAX_POINTS + 1))}})
+        deadline = time.time() + 60
+        while queue.get(job_id)["status"] in (STATUS_QUEUED, STATUS_RUNNING) and time.time() < deadline:
+            time.sleep(0.1)
+    finally:
+        queue.stop_workers()
+
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == f"ValueError: Sweep has {SWEEP_MAX_POINTS + 1} points (max {SWEEP_MAX_POINTS})"
+
+
+def test_bulk_jobs_run_when_every_worker_is_interactive(queue):
+    queue.start_workers(workers=1, interactive_workers=1)
+    try:
+        job_id = queue.submit("simulate", {"target_depth": 0.3}, "bulk")
+        deadline = time.time() + 60
+        while queue.get(job_id)["status"] in (STATUS_QUEUED, STATUS_RUNNING) and time.time() < deadline:
+            time.sleep(0.1)
+    finally:
+        queue.stop_workers()
+
+    assert queue.get(job_id)["status"] == "done"
@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from api.services.predictor import TrajectoryExporter
+from utils.cbpwin import CBPWIN_MAX_LAYERS, CBPWinSimulatorExact
+from utils.cbpwin_compare import STANDARD_CORPUS
+from utils.cbpwin_observers import CollectingObserver
+from utils.cbpwin_trajectory import TrajectoryRecorder
+from utils.util import calculate_recipe
+
+PARAMS = STANDARD_CORPUS[1]
+
+
+def _run(params):
+    observer = CollectingObserver()
+    return _run_with(observer, params), observer
+
+
+def _run_with(observer, params=PARAMS):
+    engine = CBPWinSimulatorExact()
+    engine.add_observer(observer)
+    return engine.run_automatic_simulation(params)
+
+
+def test_events_follow_the_simulation():
+    results, observer = _run(PARAMS)
+
+    assert observer.events[0][0] == 'simulation_started'
+    assert observer.events[-1] == ('simulation_finished', {'steps': len(results), 'results': results})
+
+    cycles = observer.of('cycle_completed')
+    assert [(c['carb_time'], c['diff_time'], c['final_time'], c['depth']) for c in cycles] == results
+    phases = [(p['step'], p['phase']) for p in observer.of('phase_completed')]
+    assert phases == [(step, phase) for step in range(len(results))
+                      for phase in ('carburizing', 'diffusion', 'final')]
+
+    fronts = observer.of('front_advanced')
+    assert all(f['layer_max'] > f['previous_layer_max'] for f in fronts)
+
+
+def test_pipelined_run_reports_cycles_in_order():
+    observer = CollectingObserver()
+    engine = CBPWinSimulatorExact()
+    engine.add_observer(observer)
+    with ThreadPoolExecutor(2) as executor:
+        results = engine.run_pipelined_simulation(PARAMS, executor, max_in_flight=4)
+
+    cycles = observer.of('cycle_completed')
+    assert [c['step'] for c in cycles][:len(results)] == list(range(len(results)))
+    assert [(c['final_time'], c['depth']) for c in cycles[:len(results)]] == [r[2:] for r in results]
+    assert observer.events[-1][0] == 'simulation_finished'
+
+
+def test_observed_simulations_bypass_the_cache():
+    params = {'target_depth': 0.5}
+    calculate_recipe(params)
+    observer = CollectingObserver()
+    calculate_recipe(params, [observer])
+    assert observer.of('simulation_finished')
+
+
+def test_recorder_keeps_the_active_layers_and_fills_the_tail():
+    recorder = TrajectoryRecorder(every=0, budget_bytes=1024 * 1024)
+    layers = [1.0 - 0.001 * i for i in range(50)] + [0.18] * (CBPWIN_MAX_LAYERS - 49)
+    recorder.on_phase_profile(0, 'carburizing', 120.0, layers, 40)
+
+    profile = recorder.arrays()['profiles'][0]
+    assert np.array_equal(profile[:42], np.array(layers[:42], dtype=np.float32))
+    assert np.all(profile[42:] == np.float32(layers[42]))
+
+
+def test_trajectories_are_written_off_the_request_path(tmp_path):
+    recorder = TrajectoryRecorder(every=60, budget_bytes=1024 * 1024)
+    _run_with(recorder)
+    exporter = TrajectoryExporter(directory=str(tmp_path), max_pending=1)
+
+    assert exporter.submit(recorder)
+    exporter.join()
+    [path] = tmp_path.iterdir()
+    with np.load(path) as exported:
+        assert len(exported['time_s']) + int(exported['dropped']) == recorder.count
@@ -0,0 +1,80 @@
+import pytest
+
+from utils.cbpwin import CBPWinSimulatorExact
+from utils.cbpwin_refine import refine_recipe
+from utils.util import build_process_params
+
+PARAMS = build_process_params({"target_depth": 0.6})
+HEAD = [[231, 203], [95, 323], [88, 445]]
+
+
+def _replay(recipe):
+    """Fixed-duration replay of a recipe: effective depth"""
+    engine = CBPWinSimulatorExact()
+    engine.initialize_simulation(PARAMS)
+    for cycle in recipe:
+        engine.calc_layers_fixed(cycle[0], carburizing=True)
+        engine.calc_layers_fixed(sum(cycle[1:]), carburizing=False)
+    return engine.calculate_effective_depth(PARAMS["eff_carbon"])
+
+
+@pytest.mark.parametrize("last", [
+    [85, 568, 300],     # too shallow
+    [85, 3000, 3000],   # too deep
+    [300, 2000, 0],     # no final phase
+    [400, 0, 0],        # diffusion alone is not enough
+])
+def test_refined_recipe_keeps_final_phase(last):
+    result = refine_recipe(PARAMS, HEAD + [last])
+
+    assert result["converged"]
+    *_, (carb, diffusion, final) = result["recipe"]
+    assert diffusion >= 1 and final >= 1
+    depth = _replay(result["recipe"])
+    assert depth == pytest.approx(result["depth"])
+    assert abs(depth - PARAMS["target_depth"]) <= 0.01
+
+
+@pytest.mark.parametrize("last", [[85, 568, 300], [85, 3000, 3000], [20, 100, 100]])
+def test_refined_recipe_is_never_further_than_the_raw_one(last):
+    target = PARAMS["target_depth"]
+    result = refine_recipe(PARAMS, HEAD + [last], max_iterations=1)
+    assert abs(result["depth"] - target) <= abs(result["raw_depth"] - target)
+    assert _replay(result["recipe"]) == pytest.approx(result["depth"])
+
+
+def test_simulated_seconds_stay_within_budget():
+    recipe = HEAD + [[85, 3000, 3000]]
+    result = refine_recipe(PARAMS, recipe, max_iterations=50, max_simulated_seconds=500)
+    assert result["simulated_seconds"] <= 500
+
+    result = refine_recipe(PARAMS, recipe, max_iterations=50, max_simulated_seconds=0)
+    assert result["iterations"] == 0
+    assert result["recipe"] == recipe
+
+
+def test_raw_recipe_without_final_phase_is_not_converged():
+    # Depth within tolerance but no final phase: still refined
+    refined = refine_recipe(PARAMS, HEAD + [[85, 568, 1879]])["recipe"]
+    result = refine_recipe(PARAMS, HEAD + [[85, refined[-1][1] + refined[-1][2], 0]])
+    assert result["iterations"] > 0
+    assert result["recipe"][-1][2] >= 1
+
+
+def test_iterations_count_dropped_cycles_and_stay_bounded():
+    params = {**PARAMS, "target_depth": 0.3}
+    result = refine_recipe(params, HEAD + [[107, 0, 0]], max_iterations=8)
+    assert len(result["recipe"]) == len(HEAD) - 1
+    assert result["converged"]
+    # One 2 s trial per cycle tried, plus the searches
+    assert 3 <= result["iterations"] <= 8
+
+    result = refine_recipe(PARAMS, HEAD + [[20, 100, 100]], max_iterations=2)
+    assert result["iterations"] <= 2
+
+
+def test_empty_recipe():
+    result = refine_recipe(PARAMS, [])
+    assert result["recipe"] == []
+    assert result["iterations"] == 0
+    assert not result["converged"]
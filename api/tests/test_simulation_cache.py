@@ -0,0 +1,59 @@
+from utils.cbpwin import CBPWinSimulatorExact
+from utils.simulation_cache import SimulationCache, trajectory_key
+from utils.util import build_process_params, calculate_recipes
+
+PARAMS = build_process_params({"target_depth": 0.8})
+
+
+def _simulate(params):
+    return CBPWinSimulatorExact().run_automatic_simulation(params)
+
+
+def test_shallower_target_is_served_by_a_prefix():
+    cache = SimulationCache(4)
+    cache.put(PARAMS, _simulate(PARAMS))
+
+    shallow = {**PARAMS, "target_depth": 0.5}
+    assert cache.get(shallow) == _simulate(shallow)
+    assert cache.stats()["hits"] == 1
+
+
+def test_deeper_target_or_other_trajectory_misses():
+    cache = SimulationCache(4)
+    cache.put(PARAMS, _simulate(PARAMS))
+
+    assert cache.get({**PARAMS, "target_depth": 1.2}) is None
+    assert cache.get({**PARAMS, "carbon_max": 1.5}) is None
+    assert cache.get(PARAMS, variant=("implicit", False)) is None
+    assert cache.stats()["misses"] == 3
+
+
+def test_keys_are_rounded():
+    assert trajectory_key({"carbon_min": 0.7 * 1.3}) == trajectory_key({"carbon_min": 0.91})
+    assert trajectory_key({"steel": {"initial_carbon": 0.18}}) == trajectory_key({"initial_carbon": 0.18})
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SimulationCache(2)
+    results = [(60.0, 120.0, 300.0, 1.0)]
+    for carbon_max in (1.4, 1.5, 1.6):
+        cache.put({**PARAMS, "carbon_max": carbon_max}, results)
+    assert cache.get({**PARAMS, "carbon_max": 1.4}) is None
+    assert cache.get({**PARAMS, "carbon_max": 1.6}) == results
+
+
+def test_batch_cases_share_one_trajectory():
+    cases = [{"target_depth": depth} for depth in (0.8, 0.4, 0.6)]
+    for case, results in zip(cases, calculate_recipes(cases)):
+        assert results == _simulate(build_process_params(case))
+
+
+def test_carbon_max_cases_share_the_first_carburizing():
+    cases = [{"target_depth": 0.8, "carbon_max": carbon_max, "carbon_min": 0.7 * carbon_max,
+              "carbon_final": 0.69 * carbon_max} for carbon_max in (1.3, 1.274, 1.326)]
+    for case, results in zip(cases, calculate_recipes(cases)):
+        assert results == _simulate(build_process_params(case))
+
+    engine = CBPWinSimulatorExact()
+    checkpoint = engine.carburizing_checkpoint(PARAMS, PARAMS["carbon_max"] - 0.1)
+    assert CBPWinSimulatorExact().run_automatic_simulation(PARAMS, checkpoint) == _simulate(PARAMS)
@@ -13,8 +13,12 @@ Paramètres principaux :
 - initial_carbon : Teneur initiale en carbone de l'acier (%)
 """
 
+import copy
+import functools
 import math
-from typing import List, Tuple
+from collections import deque
+from concurrent.futures import Executor
+from typing import List, Optional, Tuple
 
 # Constantes du modèle CBPWin
 CBPWIN_MAX_LAYERS = 2000  # Nombre maximum de couches de simulation
@@ -27,6 +31,10 @@ DIFFUSION_D0 = 9.332      # Facteur de diffusion D0 (cm²/s)
 ACTIVATION_K = 21393.1    # Facteur d'activation K (K)
 STEEL_DENSITY = 7.87      # Masse volumique de l'acier (g/cm³)
 
+# Marges du test conservatif des phases finales (final_phase_may_reach)
+FINAL_PHASE_TIME_MARGIN = 1.25     # Facteur sur la durée majorée de la phase finale
+FINAL_PHASE_MARGIN_LAYERS = 1      # Couches retirées de la couche à atteindre
+
 class CBPWinSimulatorExact:
     """Simulateur de carburation basé sur les formules CBPWin"""
     
@@ -60,6 +68,43 @@ class CBPWinSimulatorExact:
         # Facteurs calculés
         self.diffusion_factor_static = 0.0
         self.out_carbon_quantity = 0.0
+        
+        # Phases finales sautées : step -> (snapshot post-diffusion, couche max)
+        self.initial_carbon = self.default_steel['initial_carbon']
+        self.skipped_final_steps = {}
+        self.final_phase_params = (0.70, 0.36)
+        
+        # Observateurs (voir utils/cbpwin_observers.py), aucun par défaut
+        self.observers = []
+        # Période des profils en cours de phase (s), 0 = aucun : PGCD des
+        # `sample_interval` des observateurs
+        self.sample_interval = 0
+    
+    def add_observer(self, observer):
+        self.observers.append(observer)
+        self._update_sample_interval()
+    
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+        self._update_sample_interval()
+    
+    def _update_sample_interval(self):
+        intervals = [int(getattr(observer, 'sample_interval', 0)) for observer in self.observers]
+        self.sample_interval = functools.reduce(math.gcd, intervals, 0)
+    
+    def _notify(self, event: str, *args):
+        for observer in self.observers:
+            getattr(observer, event)(*args)
+    
+    def _notify_phase(self, phase: str, duration: float, previous_layer_max: int):
+        """Fin de phase + avancée éventuelle du front (appelé seulement si des observateurs sont attachés)"""
+        self._notify('on_phase_completed', self.current_step, phase, duration,
+                     self.layer_array[0], self.current_layer_max)
+        self._notify('on_phase_profile', self.current_step, phase, duration,
+                     self.layer_array, self.current_layer_max)
+        if self.current_layer_max != previous_layer_max:
+            self._notify('on_front_advanced', self.current_step, phase,
+                         previous_layer_max, self.current_layer_max)
     
     def initialize_simulation(self, params: dict):
         """Initialisation exacte comme dans CBPWinEngineIterative::calculation()"""
@@ -73,6 +118,7 @@ class CBPWinSimulatorExact:
         
         # Initialisation des couches avec carbone initial
         initial_carbon = steel['initial_carbon']
+        self.initial_carbon = initial_carbon
         for i in range(CBPWIN_MAX_LAYERS + 1):
             self.layer_array[i] = initial_carbon
         
@@ -80,6 +126,7 @@ class CBPWinSimulatorExact:
         self.current_step = 0
         self.current_layer_max = 1
         self.current_total_time = 0.0
+        self.skipped_final_steps = {}
         
         # print(f"[Initialisation CBPWin]:")
         # print(f"   Diffusion factor: {self.diffusion_factor_static:.2e}")
@@ -119,6 +166,9 @@ class CBPWinSimulatorExact:
                     self.current_layer_max = current_layer
                     step_time += 1.0
                     self.current_total_time += 1.0
+                    if self.sample_interval and step_time % self.sample_interval == 0:
+                        self._notify('on_profile_sample', self.current_step, 'carburizing', step_time,
+                                     self.layer_array, self.current_layer_max)
                     
                     # Test condition d'arrêt (stopAutoCarburizing) - UTILISE LE PARAMÈTRE CONFIGURÉ
                     if self.layer_array[0] > carbon_max:
@@ -163,6 +213,9 @@ class CBPWinSimulatorExact:
                     self.current_layer_max = current_layer
                     step_time += 1.0
                     self.current_total_time += 1.0
+                    if self.sample_interval and step_time % self.sample_interval == 0:
+                        self._notify('on_profile_sample', self.current_step, 'diffusion', step_time,
+                                     self.layer_array, self.current_layer_max)
                     
                     # Test condition d'arrêt (stopAutoDiffusion) - UTILISE LE PARAMÈTRE CONFIGURÉ
                     if self.layer_array[0] < carbon_min:
@@ -206,6 +259,9 @@ class CBPWinSimulatorExact:
                     self.current_layer_max = current_layer
                     step_time += 1.0
                     self.current_total_time += 1.0
+                    if self.sample_interval and step_time % self.sample_interval == 0:
+                        self._notify('on_profile_sample', self.current_step, 'final', step_time,
+                                     self.layer_array, self.current_layer_max)
                     
                     # Test condition d'arrêt (stopAutoFinal) - UTILISE LE PARAMÈTRE CONFIGURÉ
                     if self.layer_array[0] < carbon_final:
@@ -221,6 +277,51 @@ class CBPWinSimulatorExact:
         
         return step_time
     
+    def calc_layers_fixed(self, duration: float, carburizing: bool) -> float:
+        """
+        Phase de durée imposée (évaluation d'une recette donnée) : même
+        schéma seconde par seconde que calc_layers_*, avec apport externe
+        si `carburizing`, arrêtée après `duration` secondes au lieu d'un
+        seuil de surface.
+        """
+        step_time = 0.0
+        stop = duration <= 0
+        
+        out_delta_c = self.out_carbon_quantity if carburizing else 0.0
+        
+        while not stop:
+            restart = False
+            current_layer = 1
+            ext_delta_c = out_delta_c
+            
+            while not stop and not restart:
+                layer_n = self.layer_array[current_layer]
+                layer_n_plus_1 = self.layer_array[current_layer + 1]
+                
+                int_delta_c = self.diffusion_factor_static * ((layer_n - layer_n_plus_1) / 0.000025)
+                
+                self.layer_array[current_layer] = layer_n + ext_delta_c - int_delta_c
+                
+                self.layer_array[0] = self.layer_array[1] + ((self.layer_array[1] - self.layer_array[2]) / 2.0)
+                
+                if (current_layer >= self.current_layer_max) and (int_delta_c < 0.000001):
+                    self.current_layer_max = current_layer
+                    step_time += 1.0
+                    self.current_total_time += 1.0
+                    
+                    if step_time >= duration:
+                        stop = True
+                    else:
+                        restart = True
+                else:
+                    current_layer += 1
+                    if current_layer >= CBPWIN_MAX_LAYERS:
+                        stop = True
+                    else:
+                        ext_delta_c = int_delta_c
+        
+        return step_time
+    
     def calculate_effective_depth(self, eff_carbon: float) -> float:
         """
         Reproduction EXACTE de CBPWinEngineIterative::stopAutoEnd()
@@ -246,30 +347,171 @@ class CBPWinSimulatorExact:
             compare_eff_delta_p = 0.025
         
         if carb_n == carb_n_plus_1:
-            print(f"Warning: carb_n == carb_n_plus_1 ({carb_n} == {carb_n_plus_1}, i_search = {i_search}, eff_carbon = {eff_carbon}, compare_eff_n = {compare_eff_n}, compare_eff_delta_p = {compare_eff_delta_p})")
+            if self.observers:
+                self._notify('on_warning', 'carb_n == carb_n_plus_1', {
+                    'carb_n': carb_n, 'carb_n_plus_1': carb_n_plus_1, 'i_search': i_search,
+                    'eff_carbon': eff_carbon, 'compare_eff_n': compare_eff_n,
+                    'compare_eff_delta_p': compare_eff_delta_p})
             return compare_eff_n
         # Formule CBPWin exacte
         depth = compare_eff_n + (compare_eff_delta_p * ((carb_n - eff_carbon) / (carb_n - carb_n_plus_1)))
         
         return depth
     
-    def run_automatic_simulation(self, params: dict) -> List[Tuple[float, float, float, float]]:
+    def final_phase_may_reach(self, layers: List[float], carbon_final: float,
+                              eff_carbon: float, target_depth: float) -> bool:
+        """
+        Test conservatif : la phase finale partant du profil post-diffusion
+        `layers` peut-elle amener la profondeur effective à target_depth ?
+        Retourne False seulement si c'est impossible ; la phase finale peut
+        alors être sautée puisqu'elle ne sert qu'au test d'arrêt.
+        
+        La phase finale est une diffusion sans apport (équation de Fick, flux
+        nul en surface). On majore le profil par son enveloppe décroissante,
+        somme de marches a_k sur [0, Y_k], dont la solution est analytique :
+            C(x, t) = c0 + sum a_k * (erf((Y_k + x)/s) + erf((Y_k - x)/s)) / 2,
+            s = sqrt(4 D t)
+        1. La surface de l'enveloppe vaut c0 + sum a_k * erf(Y_k / s) : on
+           trouve par dichotomie l'instant où elle passe sous carbon_final,
+           qui majore la durée de la phase finale.
+        2. À la couche qu'il faut atteindre pour la profondeur cible, chaque
+           marche est majorée par son maximum en temps sur cette durée
+           (maximum atteint en s² = 4xY / ln((x+Y)/(x-Y))).
+        Le modèle continu est ainsi majoré exactement ; une marge de 25 % sur
+        la durée et d'une couche sur la profondeur couvre l'écart entre le
+        modèle continu et sa discrétisation par le moteur.
+        """
+        if carbon_final <= eff_carbon:
+            return True
+        
+        c0 = self.initial_carbon
+        n = min(self.current_layer_max + 1, CBPWIN_MAX_LAYERS)
+        dx = LAYER_THICKNESS / 10.0  # cm, unité du facteur de diffusion
+        
+        # Enveloppe décroissante du profil, décomposée en marches (a_k, Y_k)
+        steps = []
+        envelope = c0
+        for k in range(n, 0, -1):
+            if layers[k] > envelope:
+                steps.append((layers[k] - envelope, k * dx))
+                envelope = layers[k]
+        if envelope < eff_carbon or carbon_final <= c0:
+            return True
+        
+        # 1. Majorant de la durée de la phase finale (en s = sqrt(4 D t))
+        excess_final = carbon_final - c0
+        low, high = 1e-9, 1.0
+        if sum(a * math.erf(y / high) for a, y in steps) >= excess_final:
+            return True
+        for _ in range(40):
+            middle = math.sqrt(low * high)
+            if sum(a * math.erf(y / middle) for a, y in steps) >= excess_final:
+                low = middle
+            else:
+                high = middle
+        s_max = high * math.sqrt(FINAL_PHASE_TIME_MARGIN)
+        
+        # 2. Couche à atteindre : calculate_effective_depth donne une profondeur
+        # < (i + 0.5) * 0.05 mm quand la dernière couche >= eff_carbon est i,
+        # il faut donc eff_carbon au moins à la couche required_layer
+        required_layer = int(math.floor(target_depth / LAYER_THICKNESS - 0.5)) + 1
+        # Marge d'une couche : le moteur avance par couches entières, son front
+        # peut devancer d'une couche celui du modèle continu
+        target_layer = required_layer - FINAL_PHASE_MARGIN_LAYERS
+        if target_layer < 2:
+            return True
+        x = (target_layer - 0.5) * dx  # Centre de la couche
+        
+        reachable = 0.0
+        for a, y in steps:
+            if y >= x:
+                reachable += a
+                continue
+            s_peak = math.sqrt(4.0 * x * y / math.log((x + y) / (x - y)))
+            s = min(s_peak, s_max)
+            reachable += a * 0.5 * (math.erf((y + x) / s) - math.erf((x - y) / s))
+        return reachable >= eff_carbon - c0
+    
+    def resolve_final_phase(self, step: int) -> Tuple[float, float]:
+        """
+        Calcule à la demande (temps_final, profondeur) d'un step dont la
+        phase finale a été sautée, sans modifier l'état du moteur.
+        """
+        snapshot, layer_max = self.skipped_final_steps[step]
+        carbon_final, eff_carbon = self.final_phase_params
+        
+        saved_layers, saved_layer_max, saved_total = self.layer_array, self.current_layer_max, self.current_total_time
+        self.layer_array, self.current_layer_max = list(snapshot), layer_max
+        try:
+            final_time = self.calc_layers_final(carbon_final)
+            depth = self.calculate_effective_depth(eff_carbon)
+        finally:
+            self.layer_array, self.current_layer_max, self.current_total_time = saved_layers, saved_layer_max, saved_total
+        return final_time, depth
+    
+    def resolve_skipped_results(self, results: List[Tuple]) -> List[Tuple[float, float, float, float]]:
+        """Complète les steps marqués sautés (temps_final = None) d'une liste de résultats"""
+        resolved = []
+        for step, result in enumerate(results):
+            if result[2] is None:
+                result = (result[0], result[1]) + self.resolve_final_phase(step)
+            resolved.append(result)
+        return resolved
+    
+    def carburizing_checkpoint(self, params: dict, carbon_max: float) -> Tuple[List[float], int, float, float]:
+        """
+        Point de contrôle de la première carburation, arrêtée à carbon_max :
+        (couches, front, temps total, temps de carburation).
+        
+        Jusque-là, la trajectoire ne dépend que de la température, du flux et
+        de l'acier : le point sert à toute simulation de ces paramètres dont
+        le carbon_max est >= celui-ci (voir run_automatic_simulation).
+        """
+        self.initialize_simulation(params)
+        carb_time = self.calc_layers_carburizing(carbon_max)
+        return self.layer_array.copy(), self.current_layer_max, self.current_total_time, carb_time
+    
+    def run_automatic_simulation(self, params: dict,
+                                 checkpoint: Optional[Tuple[List[float], int, float, float]] = None
+                                 ) -> List[Tuple[float, float, Optional[float], Optional[float]]]:
         """
         Simulation automatique selon l'algorithme CBPWin
         Retourne une liste de tuples (temps_carb, temps_diff, temps_final, profondeur)
+        
+        `checkpoint` (carburizing_checkpoint(), mêmes température, flux et
+        acier, carbon_max inférieur ou égal) : la première carburation
+        reprend de ce point au lieu de t = 0, avec des résultats identiques.
+        Les échantillons de profil (sample_interval) de la partie reprise ne
+        sont pas notifiés.
+        
+        Avec params['skip_final_phase'] = True, la phase finale (qui ne sert
+        qu'au test d'arrêt) n'est lancée que si final_phase_may_reach()
+        ne peut pas exclure que la profondeur cible soit atteinte. Les steps sautés
+        ont temps_final = profondeur = None (voir resolve_final_phase()).
+        Le front de calcul atteint pendant une phase finale sautée n'étant
+        pas connu, les temps des steps suivants peuvent différer d'une
+        seconde du moteur exact : sur deux grilles aléatoires de 60 cas
+        (benchmarks/skip_final.py), 11 et 16 cas ont au moins un temps
+        décalé d'une seconde, 2 et 3 cas sur le temps final du dernier step,
+        profondeurs à 5e-5 mm près. Ne pas l'utiliser pour les features du
+        modèle (cbpwin_final_time).
         """
         carbon_max = params.get('carbon_max', 1.8)
         carbon_min = params.get('carbon_min', 1.0)
         carbon_final = params.get('carbon_final', 0.70)
         target_depth = params.get('target_depth', 2.1)
         eff_carbon = params.get('eff_carbon', 0.36)
+        skip_final_phase = params.get('skip_final_phase', False)
+        self.final_phase_params = (carbon_final, eff_carbon)
         
-        print(f"[DEMARRAGE SIMULATION]")
-        print(f"[Objectifs]:")
-        print(f"   - Profondeur: {target_depth} mm")
-        print(f"   - Carbone: {carbon_max}% -> {carbon_min}% -> {carbon_final}%")
+        if self.observers:
+            self._notify('on_simulation_started', params)
         
         self.initialize_simulation(params)
+        resumed_time = None
+        if checkpoint is not None:
+            layers, self.current_layer_max, self.current_total_time, resumed_time = checkpoint
+            self.layer_array = list(layers)
         
         results = []
         
@@ -277,7 +519,17 @@ class CBPWinSimulatorExact:
         while self.current_step < CBPWIN_MAX_STEPS:
             
             # === PHASE 1: CARBURISATION ===
-            carb_time = self.calc_layers_carburizing(carbon_max)
+            front = self.current_layer_max
+            if resumed_time is None:
+                carb_time = self.calc_layers_carburizing(carbon_max)
+            elif self.layer_array[0] > carbon_max:
+                # Le point de contrôle est déjà le test d'arrêt de cette carburation
+                carb_time = resumed_time
+            else:
+                carb_time = resumed_time + self.calc_layers_carburizing(carbon_max)
+            resumed_time = None
+            if self.observers:
+                self._notify_phase('carburizing', carb_time, front)
             
             # Sauvegarder l'état après carburisation (comme pOldLayerCarburizing)
             carburizing_layers = self.layer_array.copy()
@@ -288,31 +540,48 @@ class CBPWinSimulatorExact:
             for idx in range(self.current_layer_max + 1):
                 self.layer_array[idx] = carburizing_layers[idx]
             
+            front = self.current_layer_max
             diff_time = self.calc_layers_diffusion(carbon_min)
+            if self.observers:
+                self._notify_phase('diffusion', diff_time, front)
             
             # Sauvegarder l'état après diffusion (comme pOldLayerDiffusion)
             diffusion_layers = self.layer_array.copy()
             
+            # === PHASE 3 SAUTÉE: la cible est hors d'atteinte pour ce step ===
+            if (skip_final_phase and self.current_step < (CBPWIN_MAX_STEPS - 1)
+                    and not self.final_phase_may_reach(diffusion_layers, carbon_final, eff_carbon, target_depth)):
+                self.skipped_final_steps[self.current_step] = (diffusion_layers, self.current_layer_max)
+                results.append((carb_time, diff_time, None, None))
+                if self.observers:
+                    self._notify('on_cycle_completed', self.current_step, carb_time, diff_time,
+                                 None, None, self.layer_array[0], self.current_layer_max)
+                self.current_step += 1
+                continue
+            
             # === PHASE 3: FINAL ===
             # Copier l'état de diffusion vers final (comme dans le code C++)
             # for (int idx = 0; idx <= m_iCurrentLayerMax; idx++) m_pLayerArray[idx] = pOldLayerDiffusion[idx];
             for idx in range(self.current_layer_max + 1):
                 self.layer_array[idx] = diffusion_layers[idx]
             
+            front = self.current_layer_max
             final_time = self.calc_layers_final(carbon_final)
+            if self.observers:
+                self._notify_phase('final', final_time, front)
             
             # === CALCUL PROFONDEUR EFFECTIVE ===
             effective_depth = self.calculate_effective_depth(eff_carbon)
             
             results.append((carb_time, diff_time, final_time, effective_depth))
             
-            print(f"Step {self.current_step + 1}: Carb={carb_time:3.0f}s, Diff={diff_time:3.0f}s, "
-                  f"Final={final_time:4.0f}s, Depth={effective_depth:.3f}mm "
-                  f"(Surface: {self.layer_array[0]:.2f}%, MaxLayer: {self.current_layer_max})")
+            if self.observers:
+                self._notify('on_cycle_completed', self.current_step, carb_time, diff_time, final_time,
+                             effective_depth, self.layer_array[0], self.current_layer_max)
+                self._notify('on_cycle_profile', self.current_step, self.layer_array, self.current_layer_max)
             
             # Condition d'arret CBPWin (stopAutoEnd)
             if effective_depth >= target_depth or self.current_step >= (CBPWIN_MAX_STEPS - 1):
-                print(f"[Arret]: profondeur {effective_depth:.3f}mm >= {target_depth}mm")
                 break
             
             # === PREPARATION DU STEP SUIVANT ===
@@ -323,9 +592,147 @@ class CBPWinSimulatorExact:
             
             self.current_step += 1
         
-        print(f"\n[SIMULATION TERMINEE] apres {self.current_step + 1} steps")
+        if self.observers:
+            self._notify('on_simulation_finished', self.current_step + 1, results)
         return results
 
+    def run_pipelined_simulation(self, params: dict, executor: Executor,
+                                 max_in_flight: int) -> List[Tuple[float, float, Optional[float], Optional[float]]]:
+        """
+        Équivalent de run_automatic_simulation, mais chaque phase finale est
+        envoyée à `executor` (pool de processus) pendant que la chaîne
+        carburation -> diffusion continue de façon spéculative : le step
+        suivant repart du snapshot post-diffusion, pas de l'état final, donc
+        les phases finales sont des branches indépendantes.
+        
+        Le front atteint par les phases finales (current_layer_max) n'est pas
+        reporté sur la chaîne principale, contrairement à
+        run_automatic_simulation : les balayages suivants s'arrêtent plus
+        tôt. Sur le corpus standard, mêmes nombres de cycles, profondeurs à
+        1e-4 mm près, une phase finale d'une seconde plus courte (cas 2) ;
+        même écart avec params['skip_final_phase'].
+        
+        Dès qu'un step atteint target_depth, les steps suivants sont retirés
+        des résultats. max_in_flight (phases finales en attente au plus,
+        typiquement 2 x la taille du pool) limite l'avance de la chaîne
+        principale, donc aussi le travail spéculatif perdu : les phases
+        finales en file sont annulées, celles déjà lancées dans un worker
+        (Future.cancel n'a pas d'effet sur elles) vont à leur terme et leur
+        résultat est ignoré.
+        
+        Les observateurs restent dans le processus appelant : les événements
+        des phases finales (et leurs avertissements) sont émis à la collecte,
+        dans l'ordre des steps. Les phases de carburation / diffusion des
+        steps spéculatifs au-delà du step d'arrêt peuvent être notifiées.
+        """
+        carbon_max = params.get('carbon_max', 1.8)
+        carbon_min = params.get('carbon_min', 1.0)
+        carbon_final = params.get('carbon_final', 0.70)
+        target_depth = params.get('target_depth', 2.1)
+        eff_carbon = params.get('eff_carbon', 0.36)
+        skip_final_phase = params.get('skip_final_phase', False)
+        self.final_phase_params = (carbon_final, eff_carbon)
+        max_in_flight = max(1, max_in_flight)
+        
+        if self.observers:
+            self._notify('on_simulation_started', params)
+        
+        self.initialize_simulation(params)
+        
+        results = []
+        pending = deque()  # (step, future) dans l'ordre des steps
+        stop_step = None
+        
+        def collect(block: bool) -> Optional[int]:
+            """Récupère les phases finales terminées, dans l'ordre des steps"""
+            while pending and (block or pending[0][1].done()):
+                step, future = pending.popleft()
+                final_time, effective_depth, surface, layer_max, warnings, profile = future.result()
+                carb_time, diff_time = results[step][:2]
+                results[step] = (carb_time, diff_time, final_time, effective_depth)
+                if self.observers:
+                    self._notify('on_phase_completed', step, 'final', final_time, surface, layer_max)
+                    self._notify('on_phase_profile', step, 'final', final_time, profile, layer_max)
+                    for message, context in warnings:
+                        self._notify('on_warning', message, context)
+                    self._notify('on_cycle_completed', step, carb_time, diff_time,
+                                 final_time, effective_depth, surface, layer_max)
+                    self._notify('on_cycle_profile', step, profile, layer_max)
+                if effective_depth >= target_depth:
+                    return step
+                block = False
+            return None
+        
+        while self.current_step < CBPWIN_MAX_STEPS and stop_step is None:
+            front = self.current_layer_max
+            carb_time = self.calc_layers_carburizing(carbon_max)
+            if self.observers:
+                self._notify_phase('carburizing', carb_time, front)
+            front = self.current_layer_max
+            diff_time = self.calc_layers_diffusion(carbon_min)
+            if self.observers:
+                self._notify_phase('diffusion', diff_time, front)
+            
+            diffusion_layers = self.layer_array.copy()
+            last_step = self.current_step >= (CBPWIN_MAX_STEPS - 1)
+            results.append((carb_time, diff_time, None, None))
+            
+            if (skip_final_phase and not last_step
+                    and not self.final_phase_may_reach(diffusion_layers, carbon_final, eff_carbon, target_depth)):
+                self.skipped_final_steps[self.current_step] = (diffusion_layers, self.current_layer_max)
+                if self.observers:
+                    self._notify('on_cycle_completed', self.current_step, carb_time, diff_time,
+                                 None, None, diffusion_layers[0], self.current_layer_max)
+            else:
+                branch = copy.copy(self)
+                branch.layer_array = diffusion_layers
+                branch.skipped_final_steps = {}
+                branch.observers = []
+                branch.sample_interval = 0
+                pending.append((self.current_step, executor.submit(_run_final_phase, branch, carbon_final, eff_carbon,
+                                                                      bool(self.observers))))
+            
+            stop_step = collect(block=len(pending) >= max_in_flight)
+            if last_step:
+                break
+            self.current_step += 1
+        
+        # Fin de la chaîne principale : attendre les phases finales restantes
+        while stop_step is None and pending:
+            stop_step = collect(block=True)
+        
+        # Travail spéculatif au-delà du step d'arrêt : seules les phases
+        # encore en file s'annulent, les autres finissent dans le pool
+        for _, future in pending:
+            future.cancel()
+        if stop_step is not None:
+            del results[stop_step + 1:]
+            for step in [s for s in self.skipped_final_steps if s > stop_step]:
+                del self.skipped_final_steps[step]
+            self.current_step = stop_step
+        
+        if self.observers:
+            self._notify('on_simulation_finished', len(results), results)
+        return results
+
+
+def _run_final_phase(engine: CBPWinSimulatorExact, carbon_final: float, eff_carbon: float,
+                     with_profile: bool = False) -> Tuple:
+    """
+    Phase finale + profondeur sur une copie du moteur (exécutée dans un worker).
+    Retourne (temps final, profondeur, surface, couche max, avertissements,
+    profil final ou None).
+    """
+    from utils.cbpwin_observers import CollectingObserver
+    
+    collector = CollectingObserver()
+    engine.observers = [collector]
+    final_time = engine.calc_layers_final(carbon_final)
+    effective_depth = engine.calculate_effective_depth(eff_carbon)
+    warnings = [(w['message'], w['context']) for w in collector.of('warning')]
+    profile = engine.layer_array if with_profile else None
+    return final_time, effective_depth, engine.layer_array[0], engine.current_layer_max, warnings, profile
+
 def main():
     """Exemple d'utilisation du simulateur avec un cas typique"""
     # Configuration du traitement
@@ -349,7 +756,10 @@ def main():
     print("\n=== SIMULATEUR DE CARBURATION CBPWin ===")
     
     # Lancement de la simulation
+    from utils.cbpwin_observers import ConsoleObserver
+    
     simulator = CBPWinSimulatorExact()
+    simulator.add_observer(ConsoleObserver())
     results = simulator.run_automatic_simulation(process_params)
     
     # Calcul des temps totaux
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Moteur CBPWin par lots : plusieurs simulations avancées ensemble, seconde
+par seconde, sur un tableau numpy (lignes x couches).
+
+Dans le balayage d'une seconde du moteur exact, la couche n est mise à jour
+avec les valeurs de n et n + 1 de la seconde précédente (n + 1 n'est pas
+encore modifiée, le flux entrant vient de n - 1) : la seconde entière se
+calcule donc en une opération vectorielle sur les couches 1..m, m étant
+la première couche >= current_layer_max dont le flux passe sous le seuil
+de convergence (le front avance d'au plus une couche par seconde). Les
+phases, snapshots et tests d'arrêt sont ceux de run_automatic_simulation,
+ligne par ligne.
+
+Précision :
+- 'float64' (défaut) : mêmes opérations, dans le même ordre, que le moteur
+  exact ; résultats identiques au bit près.
+- 'float32' : profils en simple précision, mode d'analyse de la dérive,
+  pas d'optimisation : à peine plus rapide que float64 (environ 1,2x), plus
+  lent une fois les lignes ambiguës refaites. Opt-in : la documentation du
+  moteur (cbpwin_simulation_logic.md) impose les doubles pour la parité
+  CBPWin. Avant la première
+  utilisation dans un processus, la dérive est mesurée sur le corpus de
+  référence (check_drift) : si elle change un nombre de cycles, le moteur
+  refuse de tourner (ou avertit, selon `drift_policy`). Les lignes dont une
+  profondeur de fin de cycle tombe à moins de `depth_margin` de la cible
+  sont signalées (`ambiguous`) : leur nombre de cycles peut différer du
+  moteur exact, à refaire en float64.
+
+Sans observateurs ni skip_final_phase : chaque cycle a sa phase finale.
+"""
+
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.cbpwin import (
+    CBPWinSimulatorExact,
+    CBPWIN_MAX_LAYERS,
+    CBPWIN_MAX_STEPS,
+    CONVERGENCE_THRESHOLD,
+)
+
+DTYPES = ('float64', 'float32')
+
+# Phases d'une ligne
+CARBURIZING, DIFFUSION, FINAL, DONE = range(4)
+
+# Écart de profondeur (mm) à la cible en deçà duquel une ligne float32 est
+# ambiguë : ~7x la dérive mesurée sur le corpus de référence (7e-5 mm)
+FLOAT32_DEPTH_MARGIN = 0.0005
+
+# Dérive de profondeur (mm) sur le corpus au-delà de laquelle float32 avertit
+# (la marge des lignes ambiguës ne couvre plus la dérive avec certitude)
+FLOAT32_DRIFT_WARNING = FLOAT32_DEPTH_MARGIN / 2
+
+# Dérive float32 qui change un nombre de cycles du corpus : 'refuse' ou 'warn'
+BATCH_DRIFT_POLICY = os.environ.get('BATCH_DRIFT_POLICY', 'refuse')
+
+logger = logging.getLogger('cbpwin')
+
+# Rapports de dérive du processus, par dtype (check_drift)
+_drift_reports: Dict[str, dict] = {}
+
+
+class BatchResult:
+    """
+    Résultats d'un lot : `results[i]` a le format de run_automatic_simulation
+    ([(temps_carb, temps_diff, temps_final, profondeur), ...]) ; `ambiguous[i]`
+    signale une décision d'arrêt à moins de depth_margin de la cible (float32) ;
+    `rechecked` : lignes refaites en float64 (run_batch).
+    """
+
+    def __init__(self, results: List[List[Tuple]], ambiguous: List[bool], dtype: str, seconds: float):
+        self.results = results
+        self.ambiguous = ambiguous
+        self.dtype = dtype
+        self.seconds = seconds
+        self.rechecked: List[int] = []
+
+    def __len__(self):
+        return len(self.results)
+
+
+def _effective_depth(layers: List[float], layer_max: int, eff_carbon: float) -> float:
+    """calculate_effective_depth du moteur exact, sur un profil (floats Python)"""
+    i_search = layer_max
+    carb_n = 0.0
+    carb_n_plus_1 = 0.0
+    for i in range(i_search, 0, -1):
+        if layers[i] >= eff_carbon:
+            carb_n = layers[i]
+            carb_n_plus_1 = layers[i + 1]
+            i_search = i
+            break
+
+    if i_search > 1:
+        compare_eff_n = (float(i_search) * 0.05) - 0.025
+        compare_eff_delta_p = 0.05
+    else:
+        compare_eff_n = 0.0
+        compare_eff_delta_p = 0.025
+
+    if carb_n == carb_n_plus_1:
+        return compare_eff_n
+    return compare_eff_n + (compare_eff_delta_p * ((carb_n - eff_carbon) / (carb_n - carb_n_plus_1)))
+
+
+class CBPWinBatchSimulator:
+    """
+    - dtype        : 'float64' (identique au moteur exact) ou 'float32'
+    - drift_policy : 'refuse' (défaut) ou 'warn' si la dérive float32 change
+                     un nombre de cycles du corpus de référence
+    - depth_margin : marge des lignes ambiguës (mm, float32)
+    """
+
+    def __init__(self, dtype: str = 'float64', drift_policy: str = BATCH_DRIFT_POLICY,
+                 depth_margin: float = FLOAT32_DEPTH_MARGIN):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown batch dtype '{dtype}'")
+        if drift_policy not in ('refuse', 'warn'):
+            raise ValueError(f"Unknown drift policy '{drift_policy}'")
+        self.dtype = np.dtype(dtype)
+        self.drift_policy = drift_policy
+        self.depth_margin = depth_margin if dtype == 'float32' else 0.0
+
+    def _check_precision(self):
+        if self.dtype == np.float64:
+            return
+        report = check_drift(self.dtype.name)
+        if report['cycle_count_changes']:
+            message = (f"{self.dtype.name} batch drift changes the cycle count of "
+                       f"{report['cycle_count_changes']} reference case(s)")
+            if self.drift_policy == 'refuse':
+                raise ValueError(message)
+            logger.warning(message)
+        elif report['max_depth_drift_mm'] > FLOAT32_DRIFT_WARNING:
+            logger.warning("%s batch depth drift %.4f mm on the reference corpus",
+                           self.dtype.name, report['max_depth_drift_mm'])
+
+    def run(self, params_list: List[dict]) -> BatchResult:
+        """Simule les paramètres process `params_list` (format du moteur exact)"""
+        self._check_precision()
+        return self._simulate(params_list)
+
+    def _simulate(self, params_list: List[dict]) -> BatchResult:
+        start = time.perf_counter()
+        rows = len(params_list)
+        dtype = self.dtype
+        reference = CBPWinSimulatorExact()
+
+        # Paramètres par ligne
+        diffusion_factor = np.empty(rows, dtype=dtype)
+        out_quantity = np.empty(rows, dtype=dtype)
+        thresholds = np.empty((rows, 3), dtype=dtype)
+        eff_carbon, target_depth = [], []
+        layers = np.empty((rows, CBPWIN_MAX_LAYERS + 1), dtype=dtype)
+        for i, params in enumerate(params_list):
+            reference.initialize_simulation(params)
+            diffusion_factor[i] = reference.diffusion_factor_static
+            out_quantity[i] = reference.out_carbon_quantity
+            thresholds[i] = (params.get('carbon_max', 1.8), params.get('carbon_min', 1.0),
+                             params.get('carbon_final', 0.70))
+            eff_carbon.append(params.get('eff_carbon', 0.36))
+            target_depth.append(params.get('target_depth', 2.1))
+            layers[i] = reference.initial_carbon
+        diffusion_layers = layers.copy()
+
+        # État par ligne
+        phase = np.full(rows, CARBURIZING, dtype=np.int8)
+        phase_time = np.zeros(rows)
+        layer_max = np.ones(rows, dtype=np.int64)
+        step = [0] * rows
+        cycle_times = [[] for _ in range(rows)]
+        results = [[] for _ in range(rows)]
+        ambiguous = [False] * rows
+        # Lignes encore simulées (indices dans params_list)
+        ids = np.arange(rows)
+
+        convergence = dtype.type(CONVERGENCE_THRESHOLD)
+        squared_thickness = dtype.type(0.000025)
+        half = dtype.type(2.0)
+        zero = dtype.type(0.0)
+
+        inflow, threshold, direction = self._phase_arrays(phase, out_quantity, thresholds)
+        row_index = np.arange(len(ids))
+        while len(ids):
+            # Couches 1..hi : au-delà de current_layer_max, les couches sont encore au
+            # carbone initial (flux nul), le front avance donc d'au plus une couche
+            hi = min(int(layer_max.max()) + 1, CBPWIN_MAX_LAYERS - 1)
+            old = layers[:, 1:hi + 2]
+            int_delta = diffusion_factor[:, None] * ((old[:, :-1] - old[:, 1:]) / squared_thickness)
+            ext_delta = np.empty_like(int_delta)
+            ext_delta[:, 0] = inflow
+            ext_delta[:, 1:] = int_delta[:, :-1]
+
+            # Front : current_layer_max si son flux est sous le seuil, sinon la couche suivante
+            front = layer_max + (int_delta[row_index, layer_max - 1] >= convergence)
+            # Front à CBPWIN_MAX_LAYERS : balayage jusqu'à la dernière couche, phase arrêtée
+            found = front < CBPWIN_MAX_LAYERS
+            # La couche après le front ne reçoit pas son flux
+            beyond = front < hi
+            ext_delta[row_index[beyond], front[beyond]] = zero
+            layers[:, 1:hi + 1] = old[:, :-1] + ext_delta - int_delta
+            surface = layers[:, 1] + ((layers[:, 1] - layers[:, 2]) / half)
+            layers[:, 0] = surface
+
+            layer_max = np.where(found, front, layer_max)
+            phase_time += found
+            stopped = ~found | (direction * (surface - threshold) > zero)
+            if not stopped.any():
+                continue
+
+            for i in np.flatnonzero(stopped):
+                self._end_phase(i, ids[i], phase, phase_time, layer_max, layers, diffusion_layers, step,
+                                cycle_times, results, ambiguous, eff_carbon, target_depth)
+
+            # Lignes terminées retirées du lot quand elles en représentent un quart
+            live = phase != DONE
+            if live.sum() <= 0.75 * len(ids):
+                ids, phase, phase_time, layer_max = ids[live], phase[live], phase_time[live], layer_max[live]
+                layers, diffusion_layers = layers[live], diffusion_layers[live]
+                diffusion_factor, out_quantity, thresholds = diffusion_factor[live], out_quantity[live], thresholds[live]
+                row_index = np.arange(len(ids))
+            inflow, threshold, direction = self._phase_arrays(phase, out_quantity, thresholds)
+
+        return BatchResult(results, ambiguous, dtype.name, time.perf_counter() - start)
+
+    def _phase_arrays(self, phase, out_quantity, thresholds):
+        """
+        Apport en couche 1, seuil de surface et sens du test d'arrêt de la
+        phase de chaque ligne (surface > carbon_max en carburation, < seuil sinon)
+        """
+        zero = self.dtype.type(0.0)
+        carburizing = phase == CARBURIZING
+        inflow = np.where(carburizing, out_quantity, zero)
+        threshold = thresholds[np.arange(len(phase)), np.minimum(phase, FINAL)]
+        direction = np.where(carburizing, self.dtype.type(1.0), self.dtype.type(-1.0))
+        return inflow, threshold, direction
+
+    def _end_phase(self, i, row, phase, phase_time, layer_max, layers, diffusion_layers, step,
+                   cycle_times, results, ambiguous, eff_carbon, target_depth):
+        """
+        Transition de phase de la ligne `row` (indice `i` dans le lot), mêmes
+        snapshots que run_automatic_simulation
+        """
+        if phase[i] == DONE:
+            return
+        cycle_times[row].append(float(phase_time[i]))
+        phase_time[i] = 0.0
+        if phase[i] == CARBURIZING:
+            phase[i] = DIFFUSION
+            return
+        if phase[i] == DIFFUSION:
+            diffusion_layers[i] = layers[i]
+            phase[i] = FINAL
+            return
+
+        lm = int(layer_max[i])
+        depth = _effective_depth(layers[i, :lm + 2].tolist(), lm, eff_carbon[row])
+        carb_time, diff_time, final_time = cycle_times[row]
+        cycle_times[row] = []
+        results[row].append((carb_time, diff_time, final_time, depth))
+        if abs(depth - target_depth[row]) < self.depth_margin:
+            ambiguous[row] = True
+
+        if depth >= target_depth[row] or step[row] >= (CBPWIN_MAX_STEPS - 1):
+            phase[i] = DONE
+            return
+        # Le cycle suivant repart du profil post-diffusion (current_layer_max de la phase finale)
+        layers[i] = diffusion_layers[i]
+        step[row] += 1
+        phase[i] = CARBURIZING
+
+
+def run_batch(params_list: List[dict], dtype: str = 'float64', drift_policy: str = BATCH_DRIFT_POLICY,
+              recheck: bool = True) -> BatchResult:
+    """
+    Lot complet ; avec `recheck`, les lignes ambiguës d'un lot float32 sont
+    refaites en float64 (leurs indices dans `rechecked`).
+    """
+    batch = CBPWinBatchSimulator(dtype, drift_policy).run(params_list)
+    flagged = [i for i, flag in enumerate(batch.ambiguous) if flag]
+    if recheck and flagged:
+        exact = CBPWinBatchSimulator('float64').run([params_list[i] for i in flagged])
+        for i, results in zip(flagged, exact.results):
+            batch.results[i] = results
+            batch.ambiguous[i] = False
+        batch.rechecked = flagged
+        batch.seconds += exact.seconds
+    return batch
+
+
+def check_drift(dtype: str = 'float32', corpus: Optional[List[dict]] = None) -> dict:
+    """
+    Dérive d'un dtype réduit par rapport au float64 sur le corpus de
+    référence : nombres de cycles, temps par cycle, profondeur. Calculée une
+    fois par processus et par dtype (corpus par défaut).
+    """
+    from utils.cbpwin_compare import STANDARD_CORPUS
+
+    if corpus is None:
+        if dtype in _drift_reports:
+            return _drift_reports[dtype]
+        cases = STANDARD_CORPUS
+    else:
+        cases = corpus
+
+    exact = CBPWinBatchSimulator('float64').run(cases)
+    approx = CBPWinBatchSimulator(dtype, depth_margin=0.0)._simulate(cases)
+
+    report = {'dtype': dtype, 'cases': [], 'cycle_count_changes': 0,
+              'max_depth_drift_mm': 0.0, 'max_time_drift_s': 0.0}
+    for exact_results, approx_results in zip(exact.results, approx.results):
+        common = min(len(exact_results), len(approx_results))
+        depth_drift = max(abs(a[3] - e[3]) for e, a in zip(exact_results[:common], approx_results[:common]))
+        time_drift = max(abs(a[k] - e[k]) for e, a in zip(exact_results[:common], approx_results[:common])
+                         for k in range(3))
+        report['cases'].append({'exact_cycles': len(exact_results), 'approx_cycles': len(approx_results),
+                                'max_depth_drift_mm': depth_drift, 'max_time_drift_s': time_drift})
+        report['cycle_count_changes'] += len(exact_results) != len(approx_results)
+        report['max_depth_drift_mm'] = max(report['max_depth_drift_mm'], depth_drift)
+        report['max_time_drift_s'] = max(report['max_time_drift_s'], time_drift)
+    report['speedup'] = exact.seconds / approx.seconds if approx.seconds > 0 else float('inf')
+
+    if corpus is None:
+        _drift_reports[dtype] = report
+    return report
+
+
+
+def main():
+    """Dérive float32 sur le corpus de référence, puis débit sur un balayage"""
+    import itertools
+
+    report = check_drift('float32')
+    print("\n=== DÉRIVE FLOAT32 vs FLOAT64 (corpus de référence) ===")
+    print(f"{'cas':>3} | {'cycles':>9} | {'prof. mm':>9} | {'temps s':>7}")
+    for i, case in enumerate(report['cases'], 1):
+        print(f"{i:3d} | {case['exact_cycles']:4d}/{case['approx_cycles']:<4d} | "
+              f"{case['max_depth_drift_mm']:9.2e} | {case['max_time_drift_s']:7.0f}")
+
+    grid = itertools.product((900.0, 920.0, 940.0, 960.0), (1.3, 1.5, 1.8), (10.0, 13.0, 15.4),
+                             (0.16, 0.2), (0.6, 0.9))
+    cases = [{'temperature': temperature, 'carbon_flow': flow, 'carbon_max': carbon_max,
+              'carbon_min': 0.7 * carbon_max, 'carbon_final': 0.69 * carbon_max, 'target_depth': depth,
+              'eff_carbon': 0.36, 'steel': {'initial_carbon': carbon}}
+             for temperature, carbon_max, flow, carbon, depth in grid]
+
+    print(f"\n=== BALAYAGE DE {len(cases)} CAS ===")
+    start = time.perf_counter()
+    exact = [CBPWinSimulatorExact().run_automatic_simulation(params) for params in cases]
+    exact_seconds = time.perf_counter() - start
+    print(f"{'moteur exact':>14} : {exact_seconds:6.2f} s")
+    for dtype in DTYPES:
+        batch = run_batch(cases, dtype)
+        identical = sum(a == b for a, b in zip(exact, batch.results))
+        print(f"{'lot ' + dtype:>14} : {batch.seconds:6.2f} s ({exact_seconds / batch.seconds:4.1f}x), "
+              f"{identical}/{len(cases)} identiques, {len(batch.rechecked)} refaits en float64")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Comparaison d'un moteur approché avec le moteur CBPWin exact.
+
+Permet de décider, cas d'usage par cas d'usage (balayages de paramètres,
+exploration "what-if"...), si l'écart d'un moteur approché est acceptable.
+"""
+
+import time
+from typing import Dict, List
+
+from utils.cbpwin import CBPWinSimulatorExact
+
+# Corpus de référence : cas typiques des recettes ECM
+STANDARD_CORPUS: List[dict] = [
+    {'temperature': 920.0, 'carbon_flow': 11.86, 'carbon_max': 1.32, 'carbon_min': 0.92,
+     'carbon_final': 0.91, 'target_depth': 0.57, 'eff_carbon': 0.42, 'steel': {'initial_carbon': 0.2}},
+    {'temperature': 960.0, 'carbon_flow': 15.4, 'carbon_max': 1.8, 'carbon_min': 1.0,
+     'carbon_final': 0.70, 'target_depth': 0.7, 'eff_carbon': 0.36, 'steel': {'initial_carbon': 0.18}},
+    {'temperature': 900.0, 'carbon_flow': 10.0, 'carbon_max': 1.34, 'carbon_min': 0.95,
+     'carbon_final': 0.9, 'target_depth': 0.95, 'eff_carbon': 0.36, 'steel': {'initial_carbon': 0.2}},
+    {'temperature': 960.0, 'carbon_flow': 15.36, 'carbon_max': 1.8, 'carbon_min': 1.26,
+     'carbon_final': 1.24, 'target_depth': 1.12, 'eff_carbon': 0.36, 'steel': {'initial_carbon': 0.2}},
+    {'temperature': 940.0, 'carbon_flow': 13.0, 'carbon_max': 1.5, 'carbon_min': 1.05,
+     'carbon_final': 1.03, 'target_depth': 1.6, 'eff_carbon': 0.39, 'steel': {'initial_carbon': 0.16}},
+]
+
+
+def _run(simulator, params: dict):
+    """Lance une simulation, retourne (résultats, durée)"""
+    start = time.perf_counter()
+    results = simulator.run_automatic_simulation(params)
+    return results, time.perf_counter() - start
+
+
+def _totals(results) -> Dict[str, float]:
+    total_carb = sum(r[0] for r in results)
+    total_diff = sum(r[1] for r in results) + results[-1][2]
+    return {'total_carb': total_carb, 'total_diff': total_diff, 'depth': results[-1][3]}
+
+
+def compare_with_exact(simulator, params: dict, reference=None) -> Dict[str, float]:
+    """
+    Compare un simulateur (même interface que CBPWinSimulatorExact) au moteur
+    exact sur un jeu de paramètres.
+
+    Retourne les écarts sur le nombre de cycles, les temps par cycle
+    (carburation / diffusion / final), les temps totaux et la profondeur.
+    """
+    if reference is None:
+        reference = _run(CBPWinSimulatorExact(), params)
+    exact, exact_seconds = reference
+    approx, approx_seconds = _run(simulator, params)
+
+    common = min(len(exact), len(approx))
+    report = {
+        'exact_cycles': len(exact),
+        'approx_cycles': len(approx),
+        'cycle_count_error': len(approx) - len(exact),
+    }
+    for index, name in enumerate(('carb', 'diff', 'final')):
+        errors = [abs(approx[i][index] - exact[i][index]) for i in range(common)]
+        report[f'max_{name}_error_s'] = max(errors)
+        report[f'mean_{name}_error_s'] = sum(errors) / common
+
+    exact_totals = _totals(exact)
+    approx_totals = _totals(approx)
+    for name in ('total_carb', 'total_diff'):
+        report[f'{name}_error_s'] = approx_totals[name] - exact_totals[name]
+        report[f'{name}_error_pct'] = 100.0 * report[f'{name}_error_s'] / exact_totals[name]
+    report['depth_error_mm'] = approx_totals['depth'] - exact_totals['depth']
+
+    report['exact_seconds'] = exact_seconds
+    report['approx_seconds'] = approx_seconds
+    report['speedup'] = exact_seconds / approx_seconds if approx_seconds > 0 else float('inf')
+    return report
+
+
+def compare_on_corpus(simulator_factory, corpus: List[dict] = STANDARD_CORPUS) -> List[Dict[str, float]]:
+    """Compare un moteur approché au moteur exact sur tout un corpus"""
+    return [compare_with_exact(simulator_factory(), params) for params in corpus]
+
+
+def print_report(reports: List[Dict[str, float]]):
+    print(f"{'cas':>3} | {'cycles':>9} | {'carb max':>8} | {'diff max':>8} | {'final max':>9} | "
+          f"{'carb tot %':>10} | {'diff tot %':>10} | {'prof. mm':>8} | {'gain':>6}")
+    print("-" * 95)
+    for i, r in enumerate(reports, 1):
+        print(f"{i:3d} | {r['exact_cycles']:4d}/{r['approx_cycles']:<4d} | {r['max_carb_error_s']:8.0f} | "
+              f"{r['max_diff_error_s']:8.0f} | {r['max_final_error_s']:9.0f} | "
+              f"{r['total_carb_error_pct']:10.2f} | {r['total_diff_error_pct']:10.2f} | "
+              f"{r['depth_error_mm']:8.4f} | {r['speedup']:5.1f}x")
+
+
+def main():
+    from utils.cbpwin_graded import CBPWinSimulatorGraded
+    from utils.cbpwin_implicit import CBPWinSimulatorImplicit
+
+    print("\n=== MAILLAGE GRADUÉ vs MOTEUR EXACT ===")
+    print_report(compare_on_corpus(CBPWinSimulatorGraded))
+
+    print("\n=== SCHÉMA IMPLICITE vs MOTEUR EXACT ===")
+    print_report(compare_on_corpus(CBPWinSimulatorImplicit))
+
+
+if __name__ == "__main__":
+    main()
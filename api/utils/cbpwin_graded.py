@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Simulateur CBPWin APPROCHÉ sur maillage non uniforme (gradué en profondeur).
+
+Le moteur exact utilise 2000 couches de 0.05 mm. Loin de la surface les
+gradients de carbone sont faibles : ce moteur garde des cellules de 0.05 mm
+près de la surface (là où sont testés les seuils et mesurée la profondeur),
+puis fait grossir les cellules géométriquement avec la profondeur.
+
+Le schéma est en volumes finis : le flux entre deux cellules de tailles
+différentes est calculé sur la distance entre leurs centres et il est
+retiré de l'une et ajouté à l'autre en quantité de carbone (et non en
+concentration), ce qui conserve exactement la masse de carbone.
+
+Sur un maillage uniforme de 0.05 mm ce schéma est identique au moteur exact.
+L'erreur par rapport au moteur exact se mesure avec utils/cbpwin_compare.py.
+"""
+
+from utils.cbpwin import (
+    CBPWinSimulatorExact,
+    CBPWIN_MAX_LAYERS,
+    LAYER_THICKNESS,
+    CONVERGENCE_THRESHOLD,
+    DIFFUSION_D0,
+    ACTIVATION_K,
+    STEEL_DENSITY,
+)
+
+import math
+
+# Paramètres par défaut du maillage
+DEFAULT_FINE_DEPTH = 0.5      # Profondeur maillée à 0.05 mm (mm)
+DEFAULT_GROWTH = 1.1          # Facteur de croissance entre deux cellules
+DEFAULT_MAX_CELL = 0.5        # Épaisseur maximale d'une cellule (mm)
+
+
+def build_graded_mesh(fine_depth: float = DEFAULT_FINE_DEPTH,
+                      growth: float = DEFAULT_GROWTH,
+                      max_cell: float = DEFAULT_MAX_CELL) -> list:
+    """
+    Épaisseurs des cellules (mm) : fines jusqu'à fine_depth puis croissance
+    géométrique, jusqu'à couvrir la même profondeur que le moteur exact.
+    """
+    total_depth = CBPWIN_MAX_LAYERS * LAYER_THICKNESS
+    n_fine = max(2, int(round(fine_depth / LAYER_THICKNESS)))
+
+    widths = [LAYER_THICKNESS] * n_fine
+    depth = n_fine * LAYER_THICKNESS
+    width = LAYER_THICKNESS
+    while depth < total_depth:
+        width = min(width * growth, max_cell, total_depth - depth)
+        widths.append(width)
+        depth += width
+    return widths
+
+
+class CBPWinSimulatorGraded(CBPWinSimulatorExact):
+    """
+    Même algorithme que CBPWinSimulatorExact (phases, snapshots, front actif)
+    mais sur un maillage gradué. layer_array[j] est la concentration de la
+    cellule j, layer_array[0] reste la surface extrapolée.
+    """
+
+    def __init__(self, fine_depth: float = DEFAULT_FINE_DEPTH,
+                 growth: float = DEFAULT_GROWTH,
+                 max_cell: float = DEFAULT_MAX_CELL):
+        super().__init__()
+
+        widths_mm = build_graded_mesh(fine_depth, growth, max_cell)
+        self.n_cells = len(widths_mm)
+
+        # Épaisseurs en cm (unité du facteur de diffusion), index 0 inutilisé
+        self.cell_width = [0.0] + [w / 10.0 for w in widths_mm]
+        # Distance entre le centre de la cellule j et celui de la cellule j+1 (cm)
+        self.center_distance = [0.0] * (self.n_cells + 1)
+        for j in range(1, self.n_cells):
+            self.center_distance[j] = (self.cell_width[j] + self.cell_width[j + 1]) / 2.0
+        self.center_distance[self.n_cells] = self.cell_width[self.n_cells]
+
+        # Position du centre des cellules (mm) pour le calcul de profondeur
+        self.cell_center = [0.0] * (self.n_cells + 2)
+        depth = 0.0
+        for j in range(1, self.n_cells + 1):
+            self.cell_center[j] = depth + widths_mm[j - 1] / 2.0
+            depth += widths_mm[j - 1]
+        self.cell_center[self.n_cells + 1] = depth
+
+        self.layer_array = [0.0] * (self.n_cells + 2)
+
+    def initialize_simulation(self, params: dict):
+        temperature = params.get('temperature', 950.0)
+        carbon_flow = params.get('carbon_flow', 14.0)
+        steel = params.get('steel', self.default_steel)
+
+        self.diffusion_factor_static = DIFFUSION_D0 * math.exp(-ACTIVATION_K / (temperature + 273.15))
+        self.out_carbon_quantity = carbon_flow * (1.0 / (3600.0 * STEEL_DENSITY * 0.05))
+
+        initial_carbon = steel['initial_carbon']
+        self.initial_carbon = initial_carbon
+        for i in range(len(self.layer_array)):
+            self.layer_array[i] = initial_carbon
+
+        self.current_step = 0
+        self.current_layer_max = 1
+        self.current_total_time = 0.0
+        self.skipped_final_steps = {}
+
+    def _calc_layers(self, surface_flux: float, stop_test, phase: str) -> float:
+        """
+        Boucle FDM seconde par seconde sur le maillage gradué.
+        surface_flux : apport externe exprimé en quantité de carbone (%.cm / s)
+        """
+        step_time = 0.0
+        stop = False
+
+        layers = self.layer_array
+        width = self.cell_width
+        distance = self.center_distance
+        diffusion = self.diffusion_factor_static
+        n_cells = self.n_cells
+
+        while not stop:
+            restart = False
+            current_layer = 1
+            ext_flux = surface_flux
+
+            while not stop and not restart:
+                layer_n = layers[current_layer]
+                layer_n_plus_1 = layers[current_layer + 1]
+
+                # Flux sortant vers la cellule suivante (quantité de carbone)
+                int_flux = diffusion * (layer_n - layer_n_plus_1) / distance[current_layer]
+                int_delta_c = int_flux / width[current_layer]
+
+                layers[current_layer] = layer_n + (ext_flux - int_flux) / width[current_layer]
+
+                if (current_layer >= self.current_layer_max) and (int_delta_c < CONVERGENCE_THRESHOLD):
+                    self.current_layer_max = current_layer
+                    step_time += 1.0
+                    self.current_total_time += 1.0
+
+                    layers[0] = layers[1] + ((layers[1] - layers[2]) / 2.0)
+                    if self.sample_interval and step_time % self.sample_interval == 0:
+                        self._notify('on_profile_sample', self.current_step, phase, step_time,
+                                     layers, self.current_layer_max)
+                    if stop_test(layers[0]):
+                        stop = True
+                    else:
+                        restart = True
+                else:
+                    current_layer += 1
+                    if current_layer >= n_cells:
+                        stop = True
+                    else:
+                        ext_flux = int_flux
+
+        self.layer_array[0] = self.layer_array[1] + ((self.layer_array[1] - self.layer_array[2]) / 2.0)
+        return step_time
+
+    def calc_layers_carburizing(self, carbon_max: float) -> float:
+        surface_flux = self.out_carbon_quantity * self.cell_width[1]
+        return self._calc_layers(surface_flux, lambda surface: surface > carbon_max, 'carburizing')
+
+    def calc_layers_diffusion(self, carbon_min: float) -> float:
+        return self._calc_layers(0.0, lambda surface: surface < carbon_min, 'diffusion')
+
+    def calc_layers_final(self, carbon_final: float) -> float:
+        return self._calc_layers(0.0, lambda surface: surface < carbon_final, 'final')
+
+    def final_phase_may_reach(self, layers, carbon_final, eff_carbon, target_depth) -> bool:
+        # Le majorant du moteur exact suppose des couches de 0.05 mm
+        return True
+
+    def calculate_effective_depth(self, eff_carbon: float) -> float:
+        """
+        Même recherche que le moteur exact, avec interpolation linéaire entre
+        les centres de cellules (identique au moteur exact dans la zone fine).
+        """
+        i_search = self.current_layer_max
+        carb_n = 0.0
+        carb_n_plus_1 = 0.0
+
+        for i in range(i_search, 0, -1):
+            if self.layer_array[i] >= eff_carbon:
+                carb_n = self.layer_array[i]
+                carb_n_plus_1 = self.layer_array[i + 1]
+                i_search = i
+                break
+
+        if i_search > 1:
+            compare_eff_n = self.cell_center[i_search]
+            compare_eff_delta_p = self.cell_center[i_search + 1] - self.cell_center[i_search]
+        else:
+            compare_eff_n = 0.0
+            compare_eff_delta_p = LAYER_THICKNESS / 2.0
+
+        if carb_n == carb_n_plus_1:
+            return compare_eff_n
+        return compare_eff_n + (compare_eff_delta_p * ((carb_n - eff_carbon) / (carb_n - carb_n_plus_1)))
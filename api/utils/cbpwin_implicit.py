@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Simulateur CBPWin APPROCHÉ à schéma implicite (pas de temps large).
+
+Le moteur exact avance d'une seconde par balayage explicite : une longue
+recette demande des dizaines de milliers de balayages. Ce moteur résout la
+même équation de diffusion (mêmes couches de 0.05 mm, même apport de
+surface out_carbon_quantity par seconde dans la couche 1) avec un schéma
+theta inconditionnellement stable :
+    theta = 1   : Euler implicite
+    theta = 0.5 : Crank-Nicolson
+et une résolution tridiagonale (algorithme de Thomas) par pas de temps.
+
+Les phases avancent par pas d'au plus `time_step` secondes, chaque pas
+visant l'instant où la surface atteint le seuil de la phase (surface >
+carbon_max, < carbon_min, < carbon_final) estimé par la tangente. Quand un
+pas franchit le seuil trop tôt, l'instant du franchissement est recherché à
+la seconde près par sécante sur la taille du pas.
+
+Sur le corpus standard (Crank-Nicolson, pas de 240 s) : mêmes nombres de
+cycles, temps totaux à 3.3 % près, profondeur à 0.015 mm près. Écart par
+cycle : 3 s au plus en carburation, 25 s en diffusion, 79 s en phase finale
+(cas 2, où la surface approche carbon_final très lentement ; 8 s au plus
+sur les autres cas). Gain : 15 à 57 fois moins de calcul selon les
+mesures, il croît avec la durée du traitement. L'objectif de 50 à 100 fois
+n'est atteint que sur les traitements les plus longs : les pas sont
+limités par l'estimation du franchissement et par sa recherche à la
+seconde près, pas par time_step (480 ou 900 s ne font pas mieux que 240 s).
+Euler implicite est plus robuste mais dévie davantage (cycles en moins).
+
+L'écart au moteur exact (temps par cycle, profondeur) se mesure avec
+utils/cbpwin_compare.py.
+"""
+
+import math
+
+from utils.cbpwin import (
+    CBPWinSimulatorExact,
+    CBPWIN_MAX_LAYERS,
+    LAYER_THICKNESS,
+)
+
+# Paramètres par défaut du schéma
+DEFAULT_TIME_STEP = 240.0      # Pas de temps maximal (s)
+DEFAULT_THETA = 0.5            # 1 = Euler implicite, 0.5 = Crank-Nicolson
+ACTIVE_TOLERANCE = 1e-7        # Flux (par seconde) en deçà duquel une couche reste inactive
+# Pas au plus par phase : seuil inatteignable (ex. carbon_final sous le
+# carbone initial), là où le moteur exact s'arrête sur la dernière couche
+MAX_PHASE_STEPS = 10000
+
+LAYER_THICKNESS_CM = LAYER_THICKNESS / 10.0
+
+
+class CBPWinSimulatorImplicit(CBPWinSimulatorExact):
+    """
+    Même algorithme que CBPWinSimulatorExact (phases, snapshots, arrêt sur
+    profondeur) avec un schéma implicite. current_layer_max est ici la
+    dernière couche dont le carbone diffère du carbone initial : les
+    snapshots et la recherche de profondeur du moteur exact restent valables.
+    """
+
+    def __init__(self, time_step: float = DEFAULT_TIME_STEP, theta: float = DEFAULT_THETA):
+        super().__init__()
+        if time_step < 1.0:
+            raise ValueError("time_step must be at least 1 second")
+        if not 0.5 <= theta <= 1.0:
+            raise ValueError("theta must be between 0.5 (Crank-Nicolson) and 1 (backward Euler)")
+        self.time_step = float(int(time_step))
+        self.theta = theta
+        self.solves = 0  # Nombre de résolutions tridiagonales (coût du calcul)
+        self._factors = {}
+
+    def initialize_simulation(self, params: dict):
+        super().initialize_simulation(params)
+        self.solves = 0
+        self._factors = {}  # Dépend de la température
+
+    def _active_layers(self, duration: float) -> int:
+        """Couches à résoudre : front actuel + distance de diffusion sur `duration`"""
+        spread = math.sqrt(self.diffusion_factor_static * duration) / LAYER_THICKNESS_CM
+        return min(CBPWIN_MAX_LAYERS - 1, self.current_layer_max + int(6.0 * spread) + 2)
+
+    def _factor(self, duration: float, n: int):
+        """
+        Élimination de Thomas pour un pas de `duration` secondes. Les
+        coefficients ne dépendent que du pas : ils sont calculés une fois et
+        prolongés si besoin (n croissant).
+        """
+        factors = self._factors.get(duration)
+        if factors is None:
+            r = self.diffusion_factor_static * duration / (LAYER_THICKNESS_CM * LAYER_THICKNESS_CM)
+            a = self.theta * r
+            # inv[i] = 1 / pivot i ; up[i] = a / pivot i  (couche 1 : flux imposé, pivot 1 + a)
+            factors = (a, (1.0 - self.theta) * r, [0.0, 1.0 / (1.0 + a)], [0.0, a / (1.0 + a)])
+            self._factors[duration] = factors
+        a, b, inv, up = factors
+        for i in range(len(inv), n + 1):
+            pivot = 1.0 + 2.0 * a - a * up[i - 1]
+            inv.append(1.0 / pivot)
+            up.append(a / pivot)
+        return factors
+
+    def _solve(self, layers: list, n: int, duration: float, surface_flux: float) -> list:
+        """
+        Un pas theta de `duration` secondes sur les couches 1..n (la couche
+        n+1 reste fixe). Retourne les nouvelles valeurs des couches 0..n.
+        """
+        self.solves += 1
+        a, b, inv, up = self._factor(duration, n)
+
+        values = [0.0] * (n + 1)
+        previous = (layers[1] + b * (layers[2] - layers[1]) + surface_flux * duration) * inv[1]
+        values[1] = previous
+        if b == 0.0:
+            for i in range(2, n + 1):
+                previous = (layers[i] + a * previous) * inv[i]
+                values[i] = previous
+        else:
+            for i in range(2, n + 1):
+                rhs = layers[i] + b * (layers[i - 1] - 2.0 * layers[i] + layers[i + 1])
+                previous = (rhs + a * previous) * inv[i]
+                values[i] = previous
+        # La couche n+1 (fixe) entre dans la dernière équation
+        values[n] += a * layers[n + 1] * inv[n]
+        following = values[n]
+        for i in range(n - 1, 0, -1):
+            following = values[i] + up[i] * following
+            values[i] = following
+
+        values[0] = values[1] + ((values[1] - values[2]) / 2.0)
+        return values
+
+    def _commit(self, values: list, n: int, duration: float):
+        layers = self.layer_array
+        layers[:n + 1] = values
+        self.current_total_time += duration
+
+        # Couches actives : écart au carbone initial qui donnerait un flux
+        # au-dessus du seuil de convergence du moteur exact
+        tolerance = ACTIVE_TOLERANCE * (LAYER_THICKNESS_CM * LAYER_THICKNESS_CM) / self.diffusion_factor_static
+        initial_carbon = self.initial_carbon
+        for i in range(n, self.current_layer_max, -1):
+            if abs(layers[i] - initial_carbon) > tolerance:
+                self.current_layer_max = i
+                break
+
+    def _surface_rate(self, surface_flux: float) -> float:
+        """Dérivée en temps de la surface extrapolée (équation semi-discrète)"""
+        layers = self.layer_array
+        r = self.diffusion_factor_static / (LAYER_THICKNESS_CM * LAYER_THICKNESS_CM)
+        rate_1 = surface_flux + r * (layers[2] - layers[1])
+        rate_2 = r * (layers[1] - 2.0 * layers[2] + layers[3])
+        return 1.5 * rate_1 - 0.5 * rate_2
+
+    def _calc_phase(self, surface_flux: float, threshold: float, rising: bool, phase: str) -> float:
+        """
+        Avance jusqu'au franchissement de `threshold` par la surface (par
+        au-dessus si rising, par en dessous sinon). Retourne la durée de la
+        phase en secondes entières (au moins 1 s, comme le moteur exact).
+
+        Chaque pas vise l'instant de franchissement estimé par la tangente
+        (méthode de Newton, plafonnée à time_step) : l'approche du seuil
+        étant en général décélérée, l'estimation est par défaut et le pas qui
+        franchit est le dernier. Sinon, l'instant est recherché à la seconde
+        près dans le pas (_locate_crossing).
+
+        Les profils en cours de phase (sample_interval) sont émis à la fin
+        du premier pas qui atteint chaque multiple de la période.
+
+        Seuil non franchi après MAX_PHASE_STEPS pas : la phase s'arrête là.
+        """
+        sign = 1.0 if rising else -1.0
+        step_time = 0.0
+        for _ in range(MAX_PHASE_STEPS):
+            gap = sign * (threshold - self.layer_array[0])
+            rate = sign * self._surface_rate(surface_flux)
+            if rate > 0.0:
+                duration = float(min(self.time_step, max(1, math.ceil(gap / rate))))
+            else:
+                duration = self.time_step
+
+            n = self._active_layers(duration)
+            values = self._solve(self.layer_array, n, duration, surface_flux)
+            if sign * (values[0] - threshold) <= 0.0:
+                self._commit(values, n, duration)
+                step_time += duration
+                interval = self.sample_interval
+                if interval and step_time // interval > (step_time - duration) // interval:
+                    self._notify('on_profile_sample', self.current_step, phase, step_time,
+                                 self.layer_array, self.current_layer_max)
+                continue
+
+            if duration > 1.0:
+                duration, values = self._locate_crossing(n, duration, surface_flux, threshold, sign, values)
+            self._commit(values, n, duration)
+            return step_time + duration
+        return step_time
+
+    def _locate_crossing(self, n: int, duration: float, surface_flux: float,
+                         threshold: float, sign: float, values_hi: list):
+        """
+        Plus petit nombre entier de secondes k dans [1, duration] tel que le
+        pas de k secondes franchisse le seuil. Recherche par sécante dans
+        l'intervalle [lo, hi] (lo ne franchit pas, hi franchit).
+        """
+        layers = self.layer_array
+        lo, hi = 0, int(duration)
+        gap_lo = sign * (layers[0] - threshold)
+        gap_hi = sign * (values_hi[0] - threshold)
+
+        while hi - lo > 1:
+            k = lo + math.ceil((hi - lo) * -gap_lo / (gap_hi - gap_lo))
+            k = min(max(k, lo + 1), hi - 1)
+            values = self._solve(layers, n, float(k), surface_flux)
+            gap = sign * (values[0] - threshold)
+            if gap > 0.0:
+                hi, gap_hi, values_hi = k, gap, values
+            else:
+                lo, gap_lo = k, gap
+        return float(hi), values_hi
+
+    def calc_layers_carburizing(self, carbon_max: float) -> float:
+        return self._calc_phase(self.out_carbon_quantity, carbon_max, rising=True, phase='carburizing')
+
+    def calc_layers_diffusion(self, carbon_min: float) -> float:
+        return self._calc_phase(0.0, carbon_min, rising=False, phase='diffusion')
+
+    def calc_layers_final(self, carbon_final: float) -> float:
+        return self._calc_phase(0.0, carbon_final, rising=False, phase='final')
+
+
+def main():
+    from utils.cbpwin_compare import compare_on_corpus, print_report
+
+    for time_step in (60.0, DEFAULT_TIME_STEP):
+        for theta, name in ((1.0, 'Euler implicite'), (0.5, 'Crank-Nicolson')):
+            print(f"\n=== {name.upper()}, PAS {time_step:.0f} s vs MOTEUR EXACT ===")
+            print_report(compare_on_corpus(lambda: CBPWinSimulatorImplicit(time_step, theta)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Observateurs du simulateur CBPWin.
+
+Le moteur n'écrit plus rien sur la sortie standard : il notifie les
+observateurs attachés (engine.add_observer(...)). Sans observateur, chaque
+notification se réduit à un test `if self.observers` par phase ; la boucle
+seconde par seconde ne teste que `sample_interval` (nul par défaut).
+
+Événements (mêmes noms que les méthodes de SimulationObserver) :
+- on_simulation_started(params)
+- on_phase_completed(step, phase, duration, surface_carbon, layer_max)
+  phase = 'carburizing' | 'diffusion' | 'final'
+- on_phase_profile(step, phase, duration, layers, layer_max)
+  profil de carbone en fin de phase, c.-à-d. au franchissement du seuil de
+  surface qui termine la phase (carbon_max, carbon_min, carbon_final)
+- on_profile_sample(step, phase, phase_time, layers, layer_max)
+  profil en cours de phase, toutes les `engine.sample_interval` secondes de
+  phase (PGCD des attributs `sample_interval` des observateurs ; aucun si
+  aucun observateur n'en déclare). Non émis pour les phases finales
+  exécutées dans le pool (mode pipeline)
+- on_front_advanced(step, phase, previous_layer_max, layer_max)
+- on_cycle_completed(step, carb_time, diff_time, final_time, depth, surface_carbon, layer_max)
+  final_time et depth valent None pour une phase finale sautée
+- on_cycle_profile(step, layers, layer_max)
+  profil de carbone en fin de cycle (celui de la mesure de profondeur),
+  non émis pour une phase finale sautée
+- on_warning(message, context)
+- on_simulation_finished(steps, results)
+
+Les `layers` des événements de profil sont le tableau du moteur : ils ne
+sont valables que pendant l'appel.
+"""
+
+import array
+import base64
+import json
+import logging
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.cbpwin import LAYER_THICKNESS
+
+
+class SimulationObserver:
+    """Observateur vide : les sous-classes ne redéfinissent que ce qui les intéresse"""
+
+    def on_simulation_started(self, params: dict):
+        pass
+
+    def on_phase_completed(self, step: int, phase: str, duration: float,
+                           surface_carbon: float, layer_max: int):
+        pass
+
+    def on_phase_profile(self, step: int, phase: str, duration: float, layers: List[float], layer_max: int):
+        pass
+
+    def on_profile_sample(self, step: int, phase: str, phase_time: float, layers: List[float], layer_max: int):
+        pass
+
+    def on_front_advanced(self, step: int, phase: str, previous_layer_max: int, layer_max: int):
+        pass
+
+    def on_cycle_completed(self, step: int, carb_time: float, diff_time: float,
+                           final_time: Optional[float], depth: Optional[float],
+                           surface_carbon: float, layer_max: int):
+        pass
+
+    def on_cycle_profile(self, step: int, layers: List[float], layer_max: int):
+        pass
+
+    def on_warning(self, message: str, context: dict):
+        pass
+
+    def on_simulation_finished(self, steps: int, results: List[Tuple]):
+        pass
+
+
+class CollectingObserver(SimulationObserver):
+    """
+    Garde tous les événements en mémoire, dans l'ordre : (nom, arguments).
+    Pour les tests et le traçage.
+    """
+
+    def __init__(self):
+        self.events: List[Tuple[str, Dict]] = []
+
+    def of(self, name: str) -> List[Dict]:
+        """Arguments des événements d'un type donné"""
+        return [args for event, args in self.events if event == name]
+
+    def on_simulation_started(self, params):
+        self.events.append(('simulation_started', {'params': params}))
+
+    def on_phase_completed(self, step, phase, duration, surface_carbon, layer_max):
+        self.events.append(('phase_completed', {
+            'step': step, 'phase': phase, 'duration': duration,
+            'surface_carbon': surface_carbon, 'layer_max': layer_max}))
+
+    def on_front_advanced(self, step, phase, previous_layer_max, layer_max):
+        self.events.append(('front_advanced', {
+            'step': step, 'phase': phase,
+            'previous_layer_max': previous_layer_max, 'layer_max': layer_max}))
+
+    def on_cycle_completed(self, step, carb_time, diff_time, final_time, depth, surface_carbon, layer_max):
+        self.events.append(('cycle_completed', {
+            'step': step, 'carb_time': carb_time, 'diff_time': diff_time,
+            'final_time': final_time, 'depth': depth,
+            'surface_carbon': surface_carbon, 'layer_max': layer_max}))
+
+    def on_cycle_profile(self, step, layers, layer_max):
+        self.events.append(('cycle_profile', {
+            'step': step, 'layers': layers[:layer_max + 2], 'layer_max': layer_max}))
+
+    def on_warning(self, message, context):
+        self.events.append(('warning', {'message': message, 'context': context}))
+
+    def on_simulation_finished(self, steps, results):
+        self.events.append(('simulation_finished', {'steps': steps, 'results': results}))
+
+
+class BufferedLoggingObserver(SimulationObserver):
+    """
+    Journalisation structurée bufferisée : les cycles et avertissements d'une
+    simulation sont accumulés en mémoire puis écrits en UN seul
+    enregistrement JSON à la fin de la simulation (ou quand le buffer
+    atteint max_records). Les lignes de requêtes concurrentes ne
+    s'entremêlent plus et il n'y a qu'une écriture par requête.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO,
+                 max_records: int = 1000, context: Optional[dict] = None):
+        self.logger = logger or logging.getLogger('cbpwin')
+        self.level = level
+        self.max_records = max_records
+        self.context = context or {}
+        self._reset()
+
+    def _reset(self):
+        self.records: List[Dict] = []
+        self.header: Dict = {}
+        self.has_warning = False
+        self.started_at = time.perf_counter()
+
+    def flush(self, **summary):
+        if not self.records and not summary:
+            return
+        level = max(self.level, logging.WARNING) if self.has_warning else self.level
+        if self.logger.isEnabledFor(level):
+            entry = dict(self.context, **self.header, **summary, events=self.records)
+            self.logger.log(level, '%s', json.dumps(entry, default=str))
+        self.records = []
+        self.has_warning = False
+
+    def _append(self, record: Dict):
+        self.records.append(record)
+        if len(self.records) >= self.max_records:
+            self.flush(partial=True)
+
+    def on_simulation_started(self, params):
+        self._reset()
+        self.header = {
+            'event': 'cbpwin_simulation',
+            'target_depth': params.get('target_depth'),
+            'carbon': [params.get('carbon_max'), params.get('carbon_min'), params.get('carbon_final')],
+        }
+
+    def on_cycle_completed(self, step, carb_time, diff_time, final_time, depth, surface_carbon, layer_max):
+        self._append({'step': step + 1, 'carb': carb_time, 'diff': diff_time, 'final': final_time,
+                      'depth': depth, 'surface': surface_carbon, 'layer_max': layer_max})
+
+    def on_warning(self, message, context):
+        self.has_warning = True
+        self._append({'warning': message, **context})
+
+    def on_simulation_finished(self, steps, results):
+        self.flush(steps=steps, depth=results[-1][3] if results else None,
+                   seconds=round(time.perf_counter() - self.started_at, 6))
+
+
+class ConsoleObserver(SimulationObserver):
+    """Sortie console historique du simulateur (utilisée par main())"""
+
+    def on_simulation_started(self, params):
+        print(f"[DEMARRAGE SIMULATION]")
+        print(f"[Objectifs]:")
+        print(f"   - Profondeur: {params.get('target_depth', 2.1)} mm")
+        print(f"   - Carbone: {params.get('carbon_max', 1.8)}% -> {params.get('carbon_min', 1.0)}% "
+              f"-> {params.get('carbon_final', 0.70)}%")
+        self.target_depth = params.get('target_depth', 2.1)
+
+    def on_cycle_completed(self, step, carb_time, diff_time, final_time, depth, surface_carbon, layer_max):
+        if final_time is None:
+            print(f"Step {step + 1}: Carb={carb_time:3.0f}s, Diff={diff_time:3.0f}s, Final sautée")
+            return
+        print(f"Step {step + 1}: Carb={carb_time:3.0f}s, Diff={diff_time:3.0f}s, "
+              f"Final={final_time:4.0f}s, Depth={depth:.3f}mm "
+              f"(Surface: {surface_carbon:.2f}%, MaxLayer: {layer_max})")
+        if depth >= self.target_depth:
+            print(f"[Arret]: profondeur {depth:.3f}mm >= {self.target_depth}mm")
+
+    def on_warning(self, message, context):
+        details = ', '.join(f"{key} = {value}" for key, value in context.items())
+        print(f"Warning: {message} ({details})")
+
+    def on_simulation_finished(self, steps, results):
+        print(f"\n[SIMULATION TERMINEE] apres {steps} steps")
+
+
+PROFILE_DTYPES = {'float32': 'f', 'float64': 'd'}
+
+
+class ProfileRecorder(SimulationObserver):
+    """
+    Profils de carbone en fin de cycle, encodés en binaire (little-endian)
+    directement depuis le tableau du moteur, sans conversion Python
+    élément par élément.
+
+    - dtype  : 'float32' ou 'float64'
+    - trim   : ne garder que les couches actives (0..current_layer_max + 1)
+    - stride : une couche sur `stride` (sous-échantillonnage en profondeur)
+    - cycles : 'last' (dernier cycle seulement) ou 'all'
+
+    L'indice 0 est la surface (0 mm), l'indice i >= 1 la couche centrée à
+    (i - 0.5) * 0.05 mm ; après sous-échantillonnage l'élément j est la
+    couche j * stride.
+    """
+
+    def __init__(self, dtype: str = 'float32', trim: bool = True, stride: int = 1, cycles: str = 'last'):
+        if dtype not in PROFILE_DTYPES:
+            raise ValueError(f"Unknown profile dtype '{dtype}'")
+        if stride < 1:
+            raise ValueError("stride must be at least 1")
+        if cycles not in ('last', 'all'):
+            raise ValueError(f"Unknown profile cycles option '{cycles}'")
+        self.dtype = dtype
+        self.trim = trim
+        self.stride = stride
+        self.cycles = cycles
+        self.profiles: Dict[int, bytes] = {}
+
+    def on_simulation_started(self, params):
+        self.profiles = {}
+
+    def on_cycle_profile(self, step, layers, layer_max):
+        end = layer_max + 2 if self.trim else len(layers)
+        buffer = array.array(PROFILE_DTYPES[self.dtype], layers[:end:self.stride])
+        if sys.byteorder == 'big':
+            buffer.byteswap()
+        if self.cycles == 'last':
+            self.profiles.clear()
+        self.profiles[step] = buffer.tobytes()
+
+    def payloads(self) -> List[Dict]:
+        """Profils prêts pour une réponse JSON (données en base64)"""
+        itemsize = array.array(PROFILE_DTYPES[self.dtype]).itemsize
+        return [
+            {
+                'step': step,
+                'dtype': self.dtype,
+                'count': len(data) // itemsize,
+                'stride': self.stride,
+                'layer_thickness_mm': LAYER_THICKNESS,
+                'data': base64.b64encode(data).decode('ascii'),
+            }
+            for step, data in sorted(self.profiles.items())
+        ]
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Affinage en boucle fermée d'une recette avec le simulateur.
+
+La recette reconstruite à partir des sorties du modèle (reconstruct_recipe)
+peut manquer la profondeur visée. On la simule telle quelle (durées
+imposées, calc_layers_fixed), on mesure l'écart de profondeur, puis on
+corrige la fin de la recette en quelques essais bornés :
+
+1. Diffusion + phase finale du dernier cycle : sans apport, elles forment
+   une seule diffusion de durée T = diff + final, à partir de l'état après
+   la dernière carburation (gardé en cache). On cherche T >= 2 s (sécante,
+   secondes entières) ; la recette brute fournit déjà un point (T brut,
+   profondeur brute) et chaque essai sous la cible devient le nouvel état
+   de départ : un essai ne simule que les secondes au-delà du meilleur état
+   connu. La recette affinée garde la diffusion brute (bornée à [1, T - 1])
+   et met le reste en phase finale : diffusion et finale restent > 0.
+2. Si la cible est déjà dépassée à T = 2 s, ce cycle est retiré et c'est la
+   diffusion du cycle précédent qui devient la diffusion finale (en
+   remontant tant qu'il le faut).
+3. Si même T max ne suffit pas, la carburation de ce cycle est ajustée, à
+   partir de l'état (en cache) avant le cycle.
+
+La durée de la phase finale n'est pas imposée par carbon_final : la
+surface de la recette affinée peut rester au-dessus (attendre qu'elle y
+passe demande des dizaines de milliers de secondes sur les recettes du
+modèle, et dépasse la cible).
+
+Le coût est borné deux fois : au plus max_iterations essais (`iterations`,
+cycles retirés compris), et au plus max_simulated_seconds secondes simulées
+par ces essais (par défaut SIMULATION_BUDGET_FACTOR x la durée de la recette
+brute, soit au plus environ deux évaluations de la recette). Le résultat n'est jamais
+plus loin de la cible que la recette brute : le meilleur essai est retenu,
+la recette brute s'il n'y en a pas de meilleur.
+
+La recette brute n'est simulée qu'une fois (états gardés à chaque cycle),
+la simulation automatique complète n'est jamais relancée.
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+from utils.cbpwin import CBPWinSimulatorExact
+
+DEFAULT_TOLERANCE = 0.01        # Écart de profondeur accepté (mm)
+DEFAULT_MAX_ITERATIONS = 8      # Simulations d'essai au-delà de la recette brute
+
+# Secondes simulées par les essais, en multiple de la durée de la recette brute
+SIMULATION_BUDGET_FACTOR = 2.0
+
+# Diffusion finale la plus courte : 1 s de diffusion + 1 s de phase finale
+MIN_FINAL_DIFFUSION = 2
+
+# Bornes des durées cherchées : 3 x la durée brute, au moins 10 min
+# (diffusion finale) ou 5 min (carburation)
+MAX_DIFFUSION_FACTOR = 3.0
+MIN_DIFFUSION_BOUND = 600.0
+MIN_CARBURIZING_BOUND = 300
+
+
+def _snapshot(engine) -> Tuple[List[float], int]:
+    return engine.layer_array.copy(), engine.current_layer_max
+
+
+def _restore(engine, snapshot):
+    engine.layer_array = snapshot[0].copy()
+    engine.current_layer_max = snapshot[1]
+
+
+class _Budget:
+    """Essais et secondes simulées restants"""
+
+    def __init__(self, iterations: int, seconds: float):
+        self.iterations = iterations
+        self.seconds = seconds
+        self.trials = 0
+        self.simulated = 0.0
+
+    def allows(self, seconds: float) -> bool:
+        return self.trials < self.iterations and self.simulated + seconds <= self.seconds
+
+    def spend(self, seconds: float):
+        self.trials += 1
+        self.simulated += seconds
+
+
+def _next_guess(t_lo, d_lo, t_hi, d_hi, t_prev, d_prev, target, t_max, same_side):
+    """
+    Prochaine durée : interpolation si la cible est encadrée, extrapolation
+    sinon, en racine du temps (la profondeur de diffusion croît comme sqrt(t))
+    """
+    s_lo = math.sqrt(t_lo)
+    if t_hi is not None:
+        s_hi = math.sqrt(t_hi)
+        guess = round((s_lo + (target - d_lo) * (s_hi - s_lo) / (d_hi - d_lo)) ** 2)
+        if same_side:
+            # Interpolation restée du même côté : on se rapproche du milieu
+            guess = (guess + (t_lo + t_hi) // 2) // 2
+        return min(max(guess, t_lo + 1), t_hi - 1)
+    if t_lo > t_prev and d_lo > d_prev:
+        s_prev = math.sqrt(t_prev)
+        guess = math.ceil((s_lo + (target - d_lo) * (s_lo - s_prev) / (d_lo - d_prev)) ** 2)
+    else:
+        guess = 2 * t_lo
+    return min(max(guess, t_lo + 1), t_max)
+
+
+def _search_diffusion(engine, start, t_start, eff_carbon, target, guess, t_max, tolerance, budget,
+                      known=None):
+    """
+    Durée de diffusion T >= t_start pour atteindre target, `start` étant
+    l'état à T = t_start ; `known` : point (T, profondeur, état ou None) déjà
+    simulé. Retourne (T, profondeur, convergé, état 'undershoot' /
+    'overshoot' / None), T et profondeur du meilleur point.
+    """
+    _restore(engine, start)
+    d_lo = engine.calculate_effective_depth(eff_carbon)
+    if abs(d_lo - target) <= tolerance:
+        return t_start, d_lo, True, None
+    if d_lo > target:
+        return t_start, d_lo, False, 'overshoot'
+
+    lo_state, t_lo = start, t_start
+    t_prev, d_prev = t_start, d_lo
+    t_hi = d_hi = None
+    best = (abs(d_lo - target), t_start, d_lo)
+    if known is not None and known[0] > t_start:
+        t_known, d_known, state = known
+        best = min(best, (abs(d_known - target), t_known, d_known))
+        if d_known > target:
+            t_hi, d_hi = t_known, d_known
+        elif state is not None:
+            t_prev, d_prev = t_lo, d_lo
+            lo_state, t_lo, d_lo = state, t_known, d_known
+    if t_hi is not None and t_hi - t_lo <= 1:
+        return best[1], best[2], False, None
+    t = _next_guess(t_lo, d_lo, t_hi, d_hi, t_prev, d_prev, target, t_max, False) if t_lo > t_start or t_hi \
+        else min(max(int(guess), t_start + 1), t_max)
+    last_side = None
+
+    while t > t_lo and budget.allows(t - t_lo):
+        _restore(engine, lo_state)
+        engine.calc_layers_fixed(t - t_lo, carburizing=False)
+        budget.spend(t - t_lo)
+        depth = engine.calculate_effective_depth(eff_carbon)
+        best = min(best, (abs(depth - target), t, depth))
+        if abs(depth - target) <= tolerance:
+            return t, depth, True, None
+
+        side = 'lo' if depth < target else 'hi'
+        same_side = side == last_side
+        last_side = side
+        if side == 'lo':
+            lo_state = _snapshot(engine)
+            t_prev, d_prev = t_lo, d_lo
+            t_lo, d_lo = t, depth
+        else:
+            t_hi, d_hi = t, depth
+
+        if t_hi is not None and t_hi - t_lo <= 1:
+            break
+        if t_hi is None and t_lo >= t_max:
+            return best[1], best[2], False, 'undershoot'
+        t = _next_guess(t_lo, d_lo, t_hi, d_hi, t_prev, d_prev, target, t_max, same_side)
+
+    if t_hi is None and t_lo >= t_max:
+        return best[1], best[2], False, 'undershoot'
+    return best[1], best[2], False, None
+
+
+def _search_carburizing(engine, start, eff_carbon, target, carb, carb_depth, diffusion, tolerance, budget):
+    """
+    Durée de la carburation du cycle par sécante, à partir de la durée brute
+    `carb` (profondeur `carb_depth`), suivie d'une diffusion de `diffusion`
+    secondes. Retourne (carb, profondeur)
+    """
+    points = [(carb, carb_depth)]
+    c = carb * 2 if carb_depth < target else carb // 2
+    while True:
+        c = min(max(int(c), 1), max(3 * carb, MIN_CARBURIZING_BOUND))
+        if not budget.allows(c + diffusion):
+            break
+        _restore(engine, start)
+        engine.calc_layers_fixed(c, carburizing=True)
+        engine.calc_layers_fixed(diffusion, carburizing=False)
+        budget.spend(c + diffusion)
+        depth = engine.calculate_effective_depth(eff_carbon)
+        points.append((c, depth))
+        if abs(depth - target) <= tolerance:
+            break
+        (c0, d0), (c1, d1) = points[-2], points[-1]
+        if d1 == d0 or c1 == c0:
+            break
+        c = c1 + round((target - d1) * (c1 - c0) / (d1 - d0))
+        if c == c1:
+            break
+    return min(points, key=lambda point: abs(point[1] - target))
+
+
+def _last_cycle(carb, raw_diff, total):
+    """Dernier cycle [carb, diff, final] de diffusion totale `total` >= 2, diff et final >= 1"""
+    diff = min(max(int(raw_diff), 1), total - 1)
+    return [carb, diff, total - diff]
+
+
+def refine_recipe(params: dict, recipe: List[List[int]], tolerance: float = DEFAULT_TOLERANCE,
+                  max_iterations: int = DEFAULT_MAX_ITERATIONS,
+                  max_simulated_seconds: Optional[float] = None) -> Dict:
+    """
+    Affine `recipe` ([[carb, diff], ..., [carb, diff, final]], secondes) pour
+    les paramètres process `params` (mêmes clés que run_automatic_simulation).
+
+    Retourne {'recipe', 'raw_depth', 'depth', 'iterations', 'converged',
+    'simulated_seconds'} ; iterations et simulated_seconds = essais au-delà
+    de l'évaluation de la recette brute. Convergé : profondeur à `tolerance`
+    près, diffusion et finale du dernier cycle > 0.
+    """
+    target = params.get('target_depth', 2.1)
+    eff_carbon = params.get('eff_carbon', 0.36)
+    cycles = [[max(0, int(value)) for value in cycle] for cycle in recipe]
+    last = len(cycles) - 1
+
+    engine = CBPWinSimulatorExact()
+    engine.initialize_simulation(params)
+    if not cycles:
+        depth = engine.calculate_effective_depth(eff_carbon)
+        return {'recipe': [], 'raw_depth': depth, 'depth': depth, 'iterations': 0, 'converged': False,
+                'simulated_seconds': 0.0}
+
+    # Passe unique sur la recette brute ; états gardés avant chaque cycle et
+    # après chaque carburation
+    before_cycle, after_carb = [], []
+    for index, cycle in enumerate(cycles):
+        before_cycle.append(_snapshot(engine))
+        engine.calc_layers_fixed(cycle[0], carburizing=True)
+        after_carb.append(_snapshot(engine))
+        diffusion = cycle[1] + (cycle[2] if index == last and len(cycle) > 2 else 0)
+        engine.calc_layers_fixed(diffusion, carburizing=False)
+    raw_depth = engine.calculate_effective_depth(eff_carbon)
+    raw_state = _snapshot(engine)
+
+    raw_final = cycles[last][2] if len(cycles[last]) > 2 else 0
+    raw_valid = cycles[last][1] > 0 and raw_final > 0
+    result = {'recipe': [list(cycle) for cycle in recipe], 'raw_depth': raw_depth, 'depth': raw_depth,
+              'iterations': 0, 'converged': raw_valid and abs(raw_depth - target) <= tolerance,
+              'simulated_seconds': 0.0}
+    if result['converged']:
+        return result
+
+    if max_simulated_seconds is None:
+        max_simulated_seconds = SIMULATION_BUDGET_FACTOR * engine.current_total_time
+    budget = _Budget(max_iterations, max_simulated_seconds)
+
+    # Meilleur candidat : (écart, recette, profondeur, convergé) ; la recette
+    # brute sans phase finale n'est gardée que si aucun essai ne fait mieux
+    best = (abs(raw_depth - target) if raw_valid else math.inf, None, raw_depth, False)
+
+    def consider(recipe_head, carb, diff, total, depth, converged):
+        nonlocal best
+        candidate = (abs(depth - target), recipe_head, depth, converged)
+        if candidate[0] < best[0]:
+            best = (candidate[0], recipe_head + [_last_cycle(carb, diff, total)], depth, converged)
+
+    # Diffusion finale du cycle `index`, à partir de 2 s après sa carburation ;
+    # cible dépassée dès 2 s : on remonte d'un cycle
+    raw_total = cycles[last][1] + raw_final
+    index, guess = last, raw_total
+    while budget.allows(MIN_FINAL_DIFFUSION):
+        _restore(engine, after_carb[index])
+        engine.calc_layers_fixed(MIN_FINAL_DIFFUSION, carburizing=False)
+        budget.spend(MIN_FINAL_DIFFUSION)
+        known = (raw_total, raw_depth, raw_state) if index == last else None
+        t_max = int(max(MAX_DIFFUSION_FACTOR * guess, MIN_DIFFUSION_BOUND, MIN_FINAL_DIFFUSION + 1))
+        total, depth, converged, failure = _search_diffusion(
+            engine, _snapshot(engine), MIN_FINAL_DIFFUSION, eff_carbon, target, guess, t_max, tolerance,
+            budget, known)
+        head = [list(cycle[:2]) for cycle in cycles[:index]]
+        carb, diff = cycles[index][0], cycles[index][1]
+        consider(head, carb, diff, total, depth, converged)
+
+        if failure == 'undershoot':
+            # La diffusion seule ne suffit pas : ajuster la carburation du cycle
+            carb, depth = _search_carburizing(engine, before_cycle[index], eff_carbon, target, carb, depth,
+                                              total, tolerance, budget)
+            consider(head, carb, diff, total, depth, abs(depth - target) <= tolerance)
+        if failure != 'overshoot' or index == 0:
+            break
+        index -= 1
+        # Diffusion de départ : tout ce qui suivait la carburation du cycle
+        guess = cycles[index][1] + sum(sum(cycle) for cycle in cycles[index + 1:])
+
+    result['iterations'] = budget.trials
+    result['simulated_seconds'] = budget.simulated
+    if best[1] is not None:
+        result.update({'recipe': best[1], 'depth': best[2], 'converged': best[3]})
+    return result
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Enregistreur de trajectoire : historique des profils de carbone pendant la
+simulation, à mémoire bornée.
+
+Un profil est gardé :
+- toutes les `every` secondes de chaque phase (on_profile_sample) ;
+- à chaque fin de phase, c.-à-d. à chaque franchissement du seuil de surface
+  qui la termine (carbon_max, carbon_min, carbon_final).
+
+Les profils vont dans un tampon circulaire préalloué (en mémoire, ou dans un
+fichier projeté en mémoire si `path` est donné) dont la taille est fixée
+par un budget en octets : quand il est plein, les plus anciens sont écrasés
+(compteur `dropped`). export() écrit un .npz compressé, dans l'ordre
+chronologique.
+
+Temps : secondes sur la chronologie de la recette. Les cycles s'enchaînent
+carburation -> diffusion ; la phase finale d'un cycle est une branche qui
+part de la fin de sa diffusion (le cycle suivant ne la suit pas).
+
+Coût : une conversion du profil actif (couches 0..layer_max + 1) par
+enregistrement, rien d'autre entre deux périodes. Le moteur exact garde ses
+couches en flottants Python (parité CBPWin) : la conversion est lue
+directement dans le dtype du tampon, sans liste intermédiaire.
+"""
+
+import time
+from itertools import islice
+from typing import Dict, Optional
+
+import numpy as np
+
+from utils.cbpwin import CBPWIN_MAX_LAYERS, LAYER_THICKNESS
+from utils.cbpwin_observers import SimulationObserver
+
+PHASES = ('carburizing', 'diffusion', 'final')
+PHASE_CODES = {name: code for code, name in enumerate(PHASES)}
+
+# Nature d'un enregistrement
+KIND_SAMPLE = 0
+KIND_PHASE_END = 1
+
+# Métadonnées par enregistrement : temps (f8), step (i4), couche max (i4), phase (i1), nature (i1)
+METADATA_BYTES = 8 + 4 + 4 + 1 + 1
+
+
+class TrajectoryRecorder(SimulationObserver):
+    """
+    - every        : période des profils en cours de phase (s), 0 = fins de phase seulement
+    - budget_bytes : taille maximale du tampon (profils + métadonnées)
+    - dtype        : 'float32' ou 'float64'
+    - max_depth_mm : profondeur enregistrée (par défaut toute la pièce)
+    - path         : fichier du tampon projeté en mémoire (par défaut en mémoire)
+    """
+
+    def __init__(self, every: int = 60, budget_bytes: int = 16 * 1024 * 1024, dtype: str = 'float32',
+                 max_depth_mm: Optional[float] = None, path: Optional[str] = None):
+        if every < 0:
+            raise ValueError("every must be positive (0 = phase ends only)")
+        if dtype not in ('float32', 'float64'):
+            raise ValueError(f"Unknown trajectory dtype '{dtype}'")
+        self.sample_interval = int(every)
+        self.dtype = np.dtype(dtype)
+        self.width = CBPWIN_MAX_LAYERS + 1
+        if max_depth_mm is not None:
+            self.width = min(self.width, int(max_depth_mm / LAYER_THICKNESS) + 2)
+
+        row_bytes = self.width * self.dtype.itemsize + METADATA_BYTES
+        self.capacity = budget_bytes // row_bytes
+        if self.capacity < 1:
+            raise ValueError(f"budget_bytes too small for one profile ({row_bytes} bytes)")
+
+        if path is None:
+            self.profiles = np.empty((self.capacity, self.width), dtype=self.dtype)
+        else:
+            self.profiles = np.memmap(path, dtype=self.dtype, mode='w+', shape=(self.capacity, self.width))
+        self.times = np.empty(self.capacity, dtype=np.float64)
+        self.steps = np.empty(self.capacity, dtype=np.int32)
+        self.layer_max = np.empty(self.capacity, dtype=np.int32)
+        self.phases = np.empty(self.capacity, dtype=np.int8)
+        self.kinds = np.empty(self.capacity, dtype=np.int8)
+        self._reset()
+
+    def _reset(self):
+        self.count = 0      # enregistrements reçus depuis le début
+        self.dropped = 0    # écrasés faute de place
+        self.params = {}
+        self.record_seconds = 0.0
+        # Début de chaque phase sur la chronologie de la recette
+        self._carburizing_start = 0.0
+        self._diffusion_start = 0.0
+        self._final_starts: Dict[int, float] = {}
+        # Dernière période enregistrée dans la phase en cours
+        self._sample_phase = None
+        self._sample_slot = 0
+
+    def _phase_start(self, step: int, phase: str) -> float:
+        if phase == 'carburizing':
+            return self._carburizing_start
+        if phase == 'diffusion':
+            return self._diffusion_start
+        return self._final_starts.get(step, self._carburizing_start)
+
+    def _record(self, step, phase, time_s, kind, layers, layer_max):
+        start = time.perf_counter()
+        row = self.count % self.capacity
+        if self.count >= self.capacity:
+            self.dropped += 1
+        end = min(self.width, layer_max + 2)
+        profile = self.profiles[row]
+        profile[:end] = np.fromiter(islice(layers, end), dtype=self.dtype, count=end)
+        # Au-delà du front, les couches sont encore au carbone initial
+        profile[end:] = layers[end] if end < self.width else layers[-1]
+        self.times[row] = time_s
+        self.steps[row] = step
+        self.layer_max[row] = layer_max
+        self.phases[row] = PHASE_CODES[phase]
+        self.kinds[row] = kind
+        self.count += 1
+        self.record_seconds += time.perf_counter() - start
+
+    def on_simulation_started(self, params):
+        self._reset()
+        self.params = {name: value for name, value in params.items() if isinstance(value, (int, float))}
+
+    def on_profile_sample(self, step, phase, phase_time, layers, layer_max):
+        # Le moteur émet au PGCD des périodes de ses observateurs (et le moteur
+        # implicite au premier pas qui dépasse chaque multiple) : un profil
+        # par période de ce recorder
+        if not self.sample_interval:
+            return
+        if self._sample_phase != (step, phase):
+            self._sample_phase = (step, phase)
+            self._sample_slot = 0
+        slot = phase_time // self.sample_interval
+        if slot > self._sample_slot:
+            self._sample_slot = slot
+            self._record(step, phase, self._phase_start(step, phase) + phase_time, KIND_SAMPLE, layers, layer_max)
+
+    def on_phase_profile(self, step, phase, duration, layers, layer_max):
+        if layers is None:
+            return
+        end_time = self._phase_start(step, phase) + duration
+        self._record(step, phase, end_time, KIND_PHASE_END, layers, layer_max)
+        if phase == 'carburizing':
+            self._diffusion_start = end_time
+        elif phase == 'diffusion':
+            self._final_starts[step] = end_time
+            self._carburizing_start = end_time
+        else:
+            self._final_starts.pop(step, None)
+
+    @property
+    def nbytes(self) -> int:
+        return self.capacity * (self.width * self.dtype.itemsize + METADATA_BYTES)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Enregistrements gardés, dans l'ordre chronologique d'arrivée"""
+        kept = min(self.count, self.capacity)
+        order = (np.arange(kept) + (self.count - kept)) % self.capacity
+        return {
+            'time_s': self.times[order],
+            'step': self.steps[order],
+            'phase': self.phases[order],
+            'kind': self.kinds[order],
+            'layer_max': self.layer_max[order],
+            'profiles': np.asarray(self.profiles[order]),
+        }
+
+    def export(self, path: str):
+        """Fichier .npz compressé : tableaux de arrays() + métadonnées"""
+        np.savez_compressed(
+            path,
+            **self.arrays(),
+            phases=np.array(PHASES),
+            layer_thickness_mm=LAYER_THICKNESS,
+            sample_interval_s=self.sample_interval,
+            dropped=self.dropped,
+            params_names=np.array(list(self.params)),
+            params_values=np.array(list(self.params.values()), dtype=np.float64),
+        )
+
+
+def main():
+    """Coût de l'enregistrement sur le corpus de référence (moteur exact, meilleur de 3)"""
+    from utils.cbpwin import CBPWinSimulatorExact
+    from utils.cbpwin_compare import STANDARD_CORPUS
+
+    def best_of(params, recorder=None, runs=3):
+        timings = []
+        for _ in range(runs):
+            engine = CBPWinSimulatorExact()
+            if recorder is not None:
+                engine.add_observer(recorder)
+            start = time.perf_counter()
+            engine.run_automatic_simulation(params)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    print(f"{'target':>7} {'plain s':>8} {'recorded s':>11} {'overhead':>9} {'records':>8} {'dropped':>8}")
+    for params in STANDARD_CORPUS:
+        recorder = TrajectoryRecorder(every=60, budget_bytes=4 * 1024 * 1024)
+        plain = best_of(params)
+        recorded = best_of(params, recorder)
+        print(f"{params['target_depth']:>7.2f} {plain:>8.3f} {recorded:>11.3f} "
+              f"{100.0 * (recorded - plain) / plain:>8.1f}% {recorder.count:>8} {recorder.dropped:>8}")
+    print(f"tampon : {recorder.capacity} profils de {recorder.width} couches, {recorder.nbytes} octets")
+
+
+if __name__ == '__main__':
+    main()
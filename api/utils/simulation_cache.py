@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cache des simulations CBPWin (par processus).
+
+La suite des cycles carburation / diffusion / final ne dépend que de la
+"trajectoire" : température, flux, carbone max / min et carbone initial
+(plus carbone final et carbone effectif pour la phase finale). La
+profondeur cible ne fait qu'arrêter la boucle au premier cycle qui
+l'atteint : une simulation menée jusqu'à une profondeur donnée contient
+donc, en préfixe, celles de toutes les profondeurs inférieures.
+
+Une entrée garde la simulation la plus profonde calculée pour une
+trajectoire ; une demande moins profonde est servie par un préfixe.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from utils.cbpwin import CBPWIN_MAX_STEPS
+
+# Paramètres qui définissent une trajectoire (clé de routage entre réplicas)
+TRAJECTORY_FIELDS = ('temperature', 'carbon_flow', 'carbon_max', 'carbon_min', 'initial_carbon')
+TRAJECTORY_DEFAULTS = {
+    'temperature': 950.0,
+    'carbon_flow': 14.0,
+    'carbon_max': 1.8,
+    'carbon_min': 1.0,
+    'initial_carbon': 0.2,
+}
+
+# Arrondi des clés : 0.7 * 1.3 et 0.91 doivent donner la même trajectoire
+KEY_DECIMALS = 6
+
+
+def trajectory_key(params: dict) -> Tuple[float, ...]:
+    """
+    Clé canonique de trajectoire à partir des paramètres de calculate_recipe
+    (initial_carbon à plat) ou du moteur (steel['initial_carbon']).
+    """
+    values = []
+    for name in TRAJECTORY_FIELDS:
+        if name == 'initial_carbon' and 'steel' in params:
+            value = params['steel']['initial_carbon']
+        else:
+            value = params.get(name, TRAJECTORY_DEFAULTS[name])
+        values.append(round(float(value), KEY_DECIMALS))
+    return tuple(values)
+
+
+class SimulationCache:
+    """Cache LRU des résultats de simulation, partagé entre les threads du processus"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, params: dict, variant: tuple = ()) -> tuple:
+        """Clé d'entrée : trajectoire, seuils de la phase finale et variante du moteur"""
+        key = trajectory_key(params) + (
+            round(float(params.get('carbon_final', 0.7)), KEY_DECIMALS),
+            round(float(params.get('eff_carbon', 0.36)), KEY_DECIMALS),
+        ) + variant
+        if params.get('skip_final_phase'):
+            # Les steps sautés n'ont pas de profondeur : pas de préfixe possible
+            key += (round(float(params.get('target_depth', 2.1)), KEY_DECIMALS),)
+        return key
+
+    def get(self, params: dict, variant: tuple = ()) -> Optional[List[Tuple]]:
+        target_depth = params.get('target_depth', 2.1)
+        key = self.key(params, variant)
+        with self._lock:
+            results = self._entries.get(key)
+            found = results is not None and self._prefix_length(results, target_depth) is not None
+            if found:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not found:
+            return None
+        return results[:self._prefix_length(results, target_depth)]
+
+    def put(self, params: dict, results: List[Tuple], variant: tuple = ()):
+        if self.max_entries <= 0 or not results:
+            return
+        key = self.key(params, variant)
+        with self._lock:
+            current = self._entries.get(key)
+            # Garder la simulation la plus longue (elle contient les autres)
+            if current is None or len(results) > len(current):
+                self._entries[key] = list(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _prefix_length(results: List[Tuple], target_depth: float) -> Optional[int]:
+        for i, result in enumerate(results):
+            if result[3] is not None and result[3] >= target_depth:
+                return i + 1
+        if len(results) >= CBPWIN_MAX_STEPS:
+            return len(results)
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+            }
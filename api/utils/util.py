@@ -1,6 +1,37 @@
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Tuple, Union
 from utils.cbpwin import CBPWinSimulatorExact
+from utils.cbpwin_graded import CBPWinSimulatorGraded
+from utils.cbpwin_implicit import CBPWinSimulatorImplicit
+from utils.simulation_cache import KEY_DECIMALS, SimulationCache
+
+# Moteurs de simulation disponibles ('exact' = parité CBPWin)
+SIMULATION_ENGINES = {
+    'exact': CBPWinSimulatorExact,
+    'graded': CBPWinSimulatorGraded,
+    'implicit': CBPWinSimulatorImplicit,
+}
+
+# Pool de processus partagé pour les phases finales en pipeline
+SIMULATION_POOL_SIZE = int(os.environ.get('SIMULATION_POOL_SIZE', str(os.cpu_count() or 1)))
+_simulation_pool = None
+
+# Cache des simulations du processus (0 = désactivé)
+SIMULATION_CACHE_SIZE = int(os.environ.get('SIMULATION_CACHE_SIZE', '256'))
+simulation_cache = SimulationCache(SIMULATION_CACHE_SIZE)
+
+
+def get_simulation_pool() -> ProcessPoolExecutor:
+    global _simulation_pool
+    if _simulation_pool is None:
+        _simulation_pool = ProcessPoolExecutor(
+            max_workers=SIMULATION_POOL_SIZE,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _simulation_pool
 
 
 def get_eff_carbon(hardness_value):
@@ -17,12 +48,9 @@ def get_eff_carbon(hardness_value):
     else:
         return 0.36
     
-def calculate_recipe(predicted_params):
-    # Create an instance of the simulator
-    simulator = CBPWinSimulatorExact()
-    
-    # Extract predicted parameters
-    process_params = {
+def build_process_params(predicted_params):
+    """Flat predicted parameters -> process parameters of the simulator"""
+    return {
         'temperature': predicted_params.get('temperature', 950.0),
         'carbon_flow': predicted_params.get('carbon_flow', 14.0),
         'carbon_max': predicted_params.get('carbon_max', 1.8),
@@ -30,14 +58,121 @@ def calculate_recipe(predicted_params):
         'carbon_final': predicted_params.get('carbon_final', 0.7),
         'target_depth': predicted_params.get('target_depth', 2.1),
         'eff_carbon': predicted_params.get('eff_carbon', 0.36),
+        'skip_final_phase': predicted_params.get('skip_final_phase', False),
         'steel': {
             'name': predicted_params.get('steel_name', 'Predicted Steel'),
             'initial_carbon': predicted_params.get('initial_carbon', 0.2)
         }
     }
+
+
+def calculate_recipe(predicted_params, observers=(), checkpoint=None):
+    # Create an instance of the simulator (exact engine unless an approximate one is requested)
+    engine = predicted_params.get('engine', 'exact')
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Unknown simulation engine '{engine}'")
+    simulator = SIMULATION_ENGINES[engine]()
+    for observer in observers:
+        simulator.add_observer(observer)
+    
+    # Extract predicted parameters
+    process_params = build_process_params(predicted_params)
     
-    # Run the automatic simulation
-    return simulator.run_automatic_simulation(process_params)
+    # Same trajectory already simulated (as deep or deeper) by this process:
+    # serve it from the cache, unless observers need the simulation events
+    pipelined = predicted_params.get('pipelined', False)
+    use_cache = SIMULATION_CACHE_SIZE > 0 and not observers
+    variant = (engine, pipelined)
+    if use_cache:
+        cached = simulation_cache.get(process_params, variant)
+        if cached is not None:
+            return cached
+
+    # Run the automatic simulation (final phases on the shared pool if pipelined)
+    if pipelined:
+        results = simulator.run_pipelined_simulation(process_params, get_simulation_pool(),
+                                                     max_in_flight=2 * SIMULATION_POOL_SIZE)
+    elif checkpoint is not None and engine == 'exact':
+        results = simulator.run_automatic_simulation(process_params, checkpoint)
+    else:
+        results = simulator.run_automatic_simulation(process_params)
+    if use_cache:
+        simulation_cache.put(process_params, results, variant)
+    return results
+
+
+def _simulate_case(case):
+    # Exécuté dans un processus du pool : (paramètres, point de contrôle ou None)
+    return calculate_recipe(case[0], checkpoint=case[1])
+
+
+def _carburizing_key(process_params):
+    """Paramètres dont dépend la première carburation, hors carbon_max"""
+    return tuple(round(float(value), KEY_DECIMALS) for value in (
+        process_params['temperature'], process_params['carbon_flow'], process_params['steel']['initial_carbon']))
+
+
+def _carburizing_checkpoints(runs, process_params, variants):
+    """
+    Point de contrôle commun aux simulations exactes qui ne diffèrent que par
+    les seuils (carbon_max et les seuils qui en dérivent) : la première
+    carburation, jusqu'au plus petit carbon_max du groupe, est faite une fois.
+    """
+    groups = {}
+    for i in runs:
+        if variants[i][0] == 'exact':
+            groups.setdefault(_carburizing_key(process_params[i]), []).append(i)
+    checkpoints = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        first = min(members, key=lambda i: process_params[i]['carbon_max'])
+        checkpoint = CBPWinSimulatorExact().carburizing_checkpoint(
+            process_params[first], process_params[first]['carbon_max'])
+        checkpoints.update({i: checkpoint for i in members})
+    return checkpoints
+
+
+def calculate_recipes(predicted_params_list):
+    """
+    calculate_recipe sur une série de cas (sans observateurs ni pipeline :
+    le parallélisme se fait entre les cas).
+
+    Les cas de même trajectoire, qui ne diffèrent que par la profondeur
+    cible, partagent une seule simulation menée jusqu'à la cible la plus
+    profonde ; les autres en sont des préfixes (cf. simulation_cache). Les
+    trajectoires qui ne diffèrent que par carbon_max (et ses seuils)
+    partagent le début de la première carburation (carburizing_checkpoint).
+    Les trajectoires distinctes tournent en parallèle sur le pool partagé.
+    """
+    cases = [{**params, 'pipelined': False} for params in predicted_params_list]
+    variants = [(params.get('engine', 'exact'), False) for params in cases]
+    process_params = [build_process_params(params) for params in cases]
+
+    # Cas le plus profond de chaque trajectoire
+    batch = SimulationCache(len(cases))
+    deepest = {}
+    for i, (params, variant) in enumerate(zip(process_params, variants)):
+        key = batch.key(params, variant)
+        if key not in deepest or params['target_depth'] > process_params[deepest[key]]['target_depth']:
+            deepest[key] = i
+    checkpoints = _carburizing_checkpoints(list(deepest.values()), process_params, variants)
+    runs = [(cases[i], checkpoints.get(i)) for i in deepest.values()]
+
+    if len(runs) > 1 and SIMULATION_POOL_SIZE > 1:
+        results = list(get_simulation_pool().map(_simulate_case, runs))
+    else:
+        results = [_simulate_case(run) for run in runs]
+    for i, run_results in zip(deepest.values(), results):
+        batch.put(process_params[i], run_results, variants[i])
+        if SIMULATION_CACHE_SIZE > 0:
+            simulation_cache.put(process_params[i], run_results, variants[i])
+
+    # Une simulation arrêtée avant sa cible (sans préfixe) : cas simulé seul
+    return [
+        batch.get(params, variant) or calculate_recipe(case)
+        for case, params, variant in zip(cases, process_params, variants)
+    ]
 
 
 def extract_features(recipe: List[Tuple[int]]) -> Dict[str, Union[int, float]]:
@@ -3,10 +3,17 @@ const router = express.Router();
 const axios = require('axios');
 const { authenticate } = require('../middleware/auth');
 const logger = require('../utils/logger');
+const { PredictionSocketClient } = require('../services/predictionSocketClient');
 
 // URL de l'API Python (configurable via variable d'environnement)
 const PYTHON_API_URL = process.env.PYTHON_API_URL || 'http://localhost:8000';
 
+// Socket Unix du protocole binaire de l'API Python (optionnel, prioritaire sur HTTP)
+const PYTHON_API_SOCKET = process.env.PYTHON_API_SOCKET;
+const predictionClient = PYTHON_API_SOCKET
+  ? new PredictionSocketClient(PYTHON_API_SOCKET, { timeout: 120000 })
+  : null;
+
 /**
  * POST /api/recipe/predict
  * Proxy vers l'API Python FastAPI de prédiction de recette
@@ -123,37 +130,44 @@ router.post('/predict', authenticate, async (req, res, next) => {
     });
 
     // Appeler l'API Python avec timeout de 2 minutes (la simulation CBPWin peut être longue)
-    const response = await axios.post(
-      `${PYTHON_API_URL}/predict`,
-      req.body,
-      {
-        timeout: 120000, // 2 minutes
-        headers: {
-          'Content-Type': 'application/json'
+    // via le socket binaire s'il est configuré, sinon en HTTP/JSON
+    let data;
+    if (predictionClient) {
+      data = await predictionClient.predict(req.body);
+    } else {
+      const response = await axios.post(
+        `${PYTHON_API_URL}/predict`,
+        req.body,
+        {
+          timeout: 120000, // 2 minutes
+          headers: {
+            'Content-Type': 'application/json'
+          }
         }
-      }
-    );
+      );
+      data = response.data;
+    }
 
     logger.info('Recipe prediction successful', {
       userId: req.user?.id,
-      numCycles: response.data?.predicted_features?.res_num_cycles
+      numCycles: data?.predicted_features?.res_num_cycles
     });
 
     // Retourner la réponse de l'API Python
-    res.json(response.data);
+    res.json(data);
 
   } catch (error) {
     // Gestion des erreurs spécifiques
     if (error.code === 'ECONNREFUSED') {
       logger.error('Python API connection refused', {
-        url: PYTHON_API_URL,
+        url: PYTHON_API_SOCKET || PYTHON_API_URL,
         error: error.message
       });
 
       return res.status(503).json({
         error: 'L\'API de prédiction n\'est pas disponible',
         details: 'Vérifiez que le serveur Python est démarré',
-        apiUrl: PYTHON_API_URL
+        apiUrl: PYTHON_API_SOCKET || PYTHON_API_URL
       });
     }
 
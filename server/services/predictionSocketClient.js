@@ -0,0 +1,230 @@
+/**
+ * Client du protocole binaire de l'API Python de prédiction (socket Unix)
+ * Connexion persistante, requêtes pipelinées identifiées par un id
+ *
+ * Format des trames (little-endian), voir api/api/services/binary_transport.py :
+ *   requête : uint32 longueur | uint32 id | uint8 type (1 = predict) | 9 x float64
+ *   réponse : uint32 longueur | uint32 id | uint8 statut (0 = OK, 1 = erreur, 2 = entrée invalide)
+ *             OK : 10 x float64 (features prédites) | uint16 nb cycles | nb x (3 x int32)
+ *             erreur : message utf-8
+ */
+
+const net = require('net');
+
+const MSG_PREDICT = 1;
+const STATUS_OK = 0;
+const STATUS_INVALID = 2;
+
+// Même ordre que REQUEST_FIELDS / OUTPUT_NAMES côté Python
+const REQUEST_FIELDS = [
+  'hardness_value',
+  'target_depth',
+  'load_weight',
+  'weight',
+  'is_weight_unknown',
+  'recipe_temperature',
+  'recipe_carbon_max',
+  'recipe_carbon_flow',
+  'carbon_percentage'
+];
+
+const OUTPUT_NAMES = [
+  'res_first_carb',
+  'res_first_diff',
+  'res_second_carb',
+  'res_second_diff',
+  'res_last_carb',
+  'res_last_diff',
+  'res_final_time',
+  'res_num_cycles',
+  'total_carb_time',
+  'total_diff_time'
+];
+
+const HEADER_SIZE = 9;
+
+/**
+ * Encode une requête de prédiction
+ * @param {number} requestId - Identifiant de la requête (uint32)
+ * @param {Object} params - Les 9 paramètres de prédiction
+ * @returns {Buffer} Trame complète
+ */
+const encodeRequest = (requestId, params) => {
+  const frame = Buffer.alloc(HEADER_SIZE + REQUEST_FIELDS.length * 8);
+  frame.writeUInt32LE(frame.length - 4, 0);
+  frame.writeUInt32LE(requestId, 4);
+  frame.writeUInt8(MSG_PREDICT, 8);
+  REQUEST_FIELDS.forEach((field, i) => {
+    frame.writeDoubleLE(Number(params[field]), HEADER_SIZE + i * 8);
+  });
+  return frame;
+};
+
+/**
+ * Décode le corps d'une réponse OK au format de la route JSON /predict
+ * @param {Buffer} body - Corps de la trame (après id et statut)
+ * @returns {Object} { predicted_features, reconstructed_recipe }
+ */
+const decodeResponse = (body) => {
+  const predictedFeatures = {};
+  OUTPUT_NAMES.forEach((name, i) => {
+    predictedFeatures[name] = body.readDoubleLE(i * 8);
+  });
+
+  let offset = OUTPUT_NAMES.length * 8;
+  const numCycles = body.readUInt16LE(offset);
+  offset += 2;
+
+  const recipe = [];
+  for (let i = 0; i < numCycles; i++) {
+    const carb = body.readInt32LE(offset);
+    const diff = body.readInt32LE(offset + 4);
+    const final = body.readInt32LE(offset + 8);
+    recipe.push(final >= 0 ? [carb, diff, final] : [carb, diff]);
+    offset += 12;
+  }
+
+  return {
+    predicted_features: predictedFeatures,
+    reconstructed_recipe: recipe
+  };
+};
+
+class PredictionSocketClient {
+  /**
+   * @param {string} socketPath - Chemin du socket Unix (PREDICT_SOCKET_PATH côté Python)
+   * @param {Object} [options]
+   * @param {number} [options.timeout=120000] - Délai maximal d'une prédiction (ms)
+   */
+  constructor(socketPath, { timeout = 120000 } = {}) {
+    this.socketPath = socketPath;
+    this.timeout = timeout;
+    this.socket = null;
+    this.buffer = Buffer.alloc(0);
+    this.pending = new Map();
+    this.nextId = 0;
+  }
+
+  /**
+   * Prédiction sur la connexion persistante (ouverte au premier appel)
+   * Les erreurs reprennent les codes / champs d'axios pour que l'appelant
+   * les traite de la même façon (ECONNREFUSED, ETIMEDOUT, error.response)
+   * @param {Object} params - Les 9 paramètres de prédiction
+   * @returns {Promise<Object>} { predicted_features, reconstructed_recipe }
+   */
+  predict(params) {
+    return new Promise((resolve, reject) => {
+      const socket = this._connect();
+      this.nextId = (this.nextId + 1) >>> 0;
+      const requestId = this.nextId;
+
+      const timer = setTimeout(() => {
+        this.pending.delete(requestId);
+        const error = new Error(`Prediction timeout after ${this.timeout}ms`);
+        error.code = 'ETIMEDOUT';
+        reject(error);
+      }, this.timeout);
+
+      this.pending.set(requestId, { resolve, reject, timer });
+      socket.write(encodeRequest(requestId, params));
+    });
+  }
+
+  /**
+   * Ferme la connexion et rejette les requêtes en attente
+   */
+  close() {
+    if (this.socket) {
+      this.socket.destroy();
+    }
+    this._reset(new Error('Prediction socket closed'));
+  }
+
+  _connect() {
+    if (this.socket) {
+      return this.socket;
+    }
+
+    const socket = net.createConnection(this.socketPath);
+    socket.on('data', (chunk) => this._onData(chunk));
+    socket.on('error', (error) => {
+      // Socket absent ou API arrêtée : même traitement qu'un refus de connexion HTTP
+      if (error.code === 'ENOENT') {
+        error.code = 'ECONNREFUSED';
+      }
+      this._onSocketEnd(socket, error);
+    });
+    socket.on('close', () => this._onSocketEnd(socket, new Error('Prediction socket closed')));
+
+    this.socket = socket;
+    this.buffer = Buffer.alloc(0);
+    return socket;
+  }
+
+  /**
+   * Fin d'une connexion : un ancien socket qui se ferme après l'ouverture
+   * d'un nouveau ne doit pas rejeter les requêtes de ce dernier
+   */
+  _onSocketEnd(socket, error) {
+    if (socket === this.socket) {
+      this._reset(error);
+    }
+  }
+
+  _reset(error) {
+    this.socket = null;
+    for (const { reject, timer } of this.pending.values()) {
+      clearTimeout(timer);
+      reject(error);
+    }
+    this.pending.clear();
+  }
+
+  _onData(chunk) {
+    this.buffer = this.buffer.length ? Buffer.concat([this.buffer, chunk]) : chunk;
+
+    while (this.buffer.length >= 4) {
+      const length = this.buffer.readUInt32LE(0);
+      if (this.buffer.length < 4 + length) {
+        break;
+      }
+      const frame = this.buffer.subarray(4, 4 + length);
+      this.buffer = this.buffer.subarray(4 + length);
+      this._onFrame(frame);
+    }
+  }
+
+  _onFrame(frame) {
+    const requestId = frame.readUInt32LE(0);
+    const status = frame.readUInt8(4);
+    const body = frame.subarray(5);
+
+    const request = this.pending.get(requestId);
+    if (!request) {
+      return; // Requête expirée entre-temps
+    }
+    this.pending.delete(requestId);
+    clearTimeout(request.timer);
+
+    if (status === STATUS_OK) {
+      request.resolve(decodeResponse(body));
+      return;
+    }
+
+    const detail = body.toString('utf8');
+    const error = new Error(detail);
+    error.response = {
+      status: status === STATUS_INVALID ? 422 : 500,
+      data: { detail }
+    };
+    request.reject(error);
+  }
+}
+
+module.exports = {
+  PredictionSocketClient,
+  encodeRequest,
+  decodeResponse,
+  REQUEST_FIELDS,
+  OUTPUT_NAMES
+};
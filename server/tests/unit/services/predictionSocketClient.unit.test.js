@@ -0,0 +1,149 @@
+/**
+ * Tests unitaires pour le client du protocole binaire de prédiction
+ * Serveur factice sur un socket Unix temporaire, sans l'API Python
+ */
+
+const fs = require('fs');
+const net = require('net');
+const os = require('os');
+const path = require('path');
+
+const {
+  PredictionSocketClient,
+  encodeRequest,
+  decodeResponse,
+  REQUEST_FIELDS,
+  OUTPUT_NAMES
+} = require('../../../services/predictionSocketClient');
+
+const PARAMS = {
+  hardness_value: 550,
+  target_depth: 0.6,
+  load_weight: 100,
+  weight: 1,
+  is_weight_unknown: 0,
+  recipe_temperature: 940,
+  recipe_carbon_max: 1.3,
+  recipe_carbon_flow: 12,
+  carbon_percentage: 0.2
+};
+
+/**
+ * Construit une trame de réponse comme le serveur Python
+ */
+const buildResponse = (requestId, status, body) => {
+  const header = Buffer.alloc(9);
+  header.writeUInt32LE(5 + body.length, 0);
+  header.writeUInt32LE(requestId, 4);
+  header.writeUInt8(status, 8);
+  return Buffer.concat([header, body]);
+};
+
+const buildOkBody = (recipe) => {
+  const body = Buffer.alloc(OUTPUT_NAMES.length * 8 + 2 + recipe.length * 12);
+  OUTPUT_NAMES.forEach((name, i) => body.writeDoubleLE(i + 0.5, i * 8));
+  let offset = OUTPUT_NAMES.length * 8;
+  body.writeUInt16LE(recipe.length, offset);
+  offset += 2;
+  recipe.forEach((cycle) => {
+    body.writeInt32LE(cycle[0], offset);
+    body.writeInt32LE(cycle[1], offset + 4);
+    body.writeInt32LE(cycle.length > 2 ? cycle[2] : -1, offset + 8);
+    offset += 12;
+  });
+  return body;
+};
+
+describe('PredictionSocketClient - Unit Tests', () => {
+  describe('Encodage', () => {
+    test('devrait encoder les 9 paramètres en float64 little-endian', () => {
+      const frame = encodeRequest(7, PARAMS);
+
+      expect(frame.readUInt32LE(0)).toBe(frame.length - 4);
+      expect(frame.readUInt32LE(4)).toBe(7);
+      expect(frame.readUInt8(8)).toBe(1);
+      REQUEST_FIELDS.forEach((field, i) => {
+        expect(frame.readDoubleLE(9 + i * 8)).toBe(PARAMS[field]);
+      });
+    });
+
+    test('devrait décoder une réponse au format de la route JSON', () => {
+      const decoded = decodeResponse(buildOkBody([[60, 120], [50, 180, 300]]));
+
+      expect(decoded.predicted_features.res_first_carb).toBe(0.5);
+      expect(decoded.predicted_features.total_diff_time).toBe(9.5);
+      expect(decoded.reconstructed_recipe).toEqual([[60, 120], [50, 180, 300]]);
+    });
+  });
+
+  describe('Connexion', () => {
+    let server;
+    let socketPath;
+    let client;
+
+    beforeEach((done) => {
+      socketPath = path.join(fs.mkdtempSync(path.join(os.tmpdir(), 'predict-')), 'predict.sock');
+      // Répond aux requêtes dans l'ordre inverse pour vérifier l'appariement par id
+      server = net.createServer((connection) => {
+        let pending = [];
+        connection.on('data', (data) => {
+          for (let offset = 0; offset < data.length; offset += 4 + data.readUInt32LE(offset)) {
+            const requestId = data.readUInt32LE(offset + 4);
+            const depth = data.readDoubleLE(offset + 9 + 8);
+            pending.push(depth < 0
+              ? buildResponse(requestId, 2, Buffer.from('invalid depth'))
+              : buildResponse(requestId, 0, buildOkBody([[requestId, Math.round(depth * 100)]])));
+          }
+          if (pending.length >= 2 || pending.some((frame) => frame.readUInt8(8) !== 0)) {
+            pending.reverse().forEach((frame) => connection.write(frame));
+            pending = [];
+          }
+        });
+      });
+      server.listen(socketPath, done);
+      client = new PredictionSocketClient(socketPath, { timeout: 2000 });
+    });
+
+    afterEach((done) => {
+      client.close();
+      server.close(done);
+    });
+
+    test('devrait apparier les réponses pipelinées par identifiant', async () => {
+      const [first, second] = await Promise.all([
+        client.predict({ ...PARAMS, target_depth: 0.4 }),
+        client.predict({ ...PARAMS, target_depth: 0.9 })
+      ]);
+
+      expect(first.reconstructed_recipe[0][1]).toBe(40);
+      expect(second.reconstructed_recipe[0][1]).toBe(90);
+    });
+
+    test('devrait rejeter une entrée invalide avec un statut 422', async () => {
+      await expect(client.predict({ ...PARAMS, target_depth: -1 })).rejects.toMatchObject({
+        response: { status: 422, data: { detail: 'invalid depth' } }
+      });
+    });
+
+    test('ne devrait pas rejeter les requêtes du nouveau socket à la fermeture de l\'ancien', async () => {
+      const stale = client._connect();
+      stale.emit('error', new Error('connection reset'));
+
+      const answers = Promise.all([
+        client.predict({ ...PARAMS, target_depth: 0.4 }),
+        client.predict({ ...PARAMS, target_depth: 0.9 })
+      ]);
+      stale.destroy();
+
+      const [first, second] = await answers;
+      expect(first.reconstructed_recipe[0][1]).toBe(40);
+      expect(second.reconstructed_recipe[0][1]).toBe(90);
+    });
+
+    test('devrait signaler un socket absent comme un refus de connexion', async () => {
+      const missing = new PredictionSocketClient(path.join(os.tmpdir(), 'missing-predict.sock'));
+
+      await expect(missing.predict(PARAMS)).rejects.toMatchObject({ code: 'ECONNREFUSED' });
+    });
+  });
+});